@@ -22,16 +22,116 @@ class Settings(BaseSettings):
 
     ISSUE_LOG_PATH_PREFIX: str
     
+    # uploaded images: "jpg" | "webp" | "png" (the source JPEG is reused as-is for "jpg")
+    IMG_ENCODE_FORMAT: str = "jpg"
+    IMG_ENCODE_QUALITY: int = 90
+    
     PLATE_MODEL_PATH: str
     OCR_MODEL_PATH: str
     
+    # inference engine: "yolo" (PyTorch .pt) | "onnx" | "openvino"
     MODEL: str = "yolo"
+    # "fp32" | "int8" (int8 artifacts come from `python -m app.tools.quantize_models`)
+    MODEL_PRECISION: str = "fp32"
     
     YOLO_PLATE_CONF: float = 0.5
     YOLO_OCR_CONF: float = 0.7
     
     YOLO_IMGSZ: int = 640
     
+    # character model input: YOLO_OCR_IMGSZ wide, YOLO_OCR_HEIGHT high (0 = square)
+    # "stretch": squash the plate crop to that size (legacy, 640x640)
+    # "letterbox": aspect-preserving resize + pad, e.g. 320 x 160 for a wide plate
+    YOLO_OCR_IMGSZ: int = 640
+    YOLO_OCR_HEIGHT: int = 0
+    OCR_INPUT_MODE: str = "stretch"
+    
+    # "stretch": squash the frame to 640x640 and crop plates from it (legacy)
+    # "letterbox": one aspect-preserving resize, plates cropped from the full-res frame
+    PREPROCESS_MODE: str = "stretch"
+    # decode big JPEGs at 1/2, 1/4, 1/8 scale while the long side stays >= JPEG_REDUCED_MIN_SIDE.
+    # Trade-off: plate crops are then cut from the reduced frame, not the full-res one
+    # (the uploaded original is still the incoming JPEG)
+    JPEG_REDUCED_DECODE: bool = False
+    JPEG_REDUCED_MIN_SIDE: int = 1280
+    
+    # cross-request micro-batching for the plate detector
+    PLATE_BATCH_ENABLED: bool = False
+    PLATE_BATCH_WINDOW_MS: float = 10.0
+    PLATE_BATCH_MAX_SIZE: int = 8
+    
+    # batched character recognition (crops from one frame or many requests)
+    OCR_BATCH_ENABLED: bool = False
+    OCR_BATCH_WINDOW_MS: float = 10.0
+    OCR_BATCH_MAX_SIZE: int = 16
+    # read every plate in the frame, not only the most confident one
+    OCR_MULTI_PLATE: bool = False
+    OCR_MAX_PLATES: int = 4
+    
+    # per-camera cache of recent plate readings (skips OCR for near-identical crops)
+    CROP_CACHE_ENABLED: bool = False
+    CROP_CACHE_TTL_SEC: float = 10.0
+    CROP_CACHE_MAX_PER_CAMERA: int = 8
+    CROP_CACHE_MAX_CAMERAS: int = 256
+    CROP_CACHE_HASH_DISTANCE: int = 6
+    CROP_CACHE_MAX_SHIFT: float = 0.02
+    
+    # per-camera detection ROI (cameras.roiMode / cameras.roi)
+    ROI_PLATE_IMGSZ: int = 480
+    ROI_CONFIG_TTL_SEC: float = 60.0
+    ROI_AUTO_MIN_SAMPLES: int = 50
+    ROI_AUTO_COVERAGE: float = 0.98
+    ROI_AUTO_MARGIN: float = 0.15
+    ROI_AUTO_MAX_AREA: float = 0.8
+    
+    # image-quality gate before detection (per-camera overrides: cameras.quality)
+    QUALITY_GATE_ENABLED: bool = False
+    QUALITY_SAMPLE_SIZE: int = 256
+    QUALITY_MIN_BRIGHTNESS: float = 20.0
+    QUALITY_MAX_BRIGHTNESS: float = 240.0
+    QUALITY_MIN_CONTRAST: float = 10.0
+    QUALITY_MIN_SHARPNESS: float = 15.0
+    
+    # dummy forward passes per model / input size at startup (0 = no warm-up)
+    MODEL_WARMUP_RUNS: int = 2
+    
+    # inference admission: INFERENCE_THREADS frames run at once (threads, or frames in flight
+    # to the worker pool), up to INFERENCE_QUEUE_DEPTH wait; beyond that the policy applies:
+    # "reject" (503 + Retry-After), "drop_oldest" (oldest queued camera event), "block"
+    INFERENCE_THREADS: int = 4
+    INFERENCE_QUEUE_DEPTH: int = 32
+    INFERENCE_ADMISSION: str = "reject"
+    INFERENCE_RETRY_AFTER_SEC: int = 2
+    INFERENCE_BLOCK_TIMEOUT_SEC: float = 10.0
+    
+    # >0: run inference in this many worker processes instead of the thread pool
+    INFERENCE_WORKERS: int = 0
+    INFERENCE_TORCH_THREADS: int = 1
+    
+    # CPU profile of the PyTorch (.pt) models: Conv+BN fusion, channels_last weights,
+    # torch.compile; intra/inter-op threads (0 = one per pinned CPU / torch default) and
+    # CPU pinning, e.g. "0-7" (worker processes get equal slices of it).
+    # CPU_PROFILE_PATH, written by `python -m app.tools.autotune_cpu`, overrides these when present
+    CPU_FUSE: bool = True
+    CPU_CHANNELS_LAST: bool = False
+    CPU_COMPILE: bool = False
+    CPU_INTRA_OP_THREADS: int = 0
+    CPU_INTEROP_THREADS: int = 0
+    CPU_AFFINITY: str = ""
+    CPU_PROFILE_PATH: str = "cpu_profile.json"
+    
+    # logging: "text" | "json"; LOG_ASYNC writes from a background thread (QueueListener)
+    LOG_FORMAT: str = "text"
+    LOG_LEVEL: str = "INFO"
+    LOG_ASYNC: bool = True
+    # per-frame INFO/DEBUG lines of these loggers: kept fraction and max lines/sec per logger
+    LOG_SAMPLED_LOGGERS: list[str] = [
+        "ocr_service", "ocr_batching", "ocr_inference", "DO_service",
+        "app.services.ocr_camera", "app.routers.ocr",
+    ]
+    LOG_SAMPLE_RATE: float = 1.0
+    LOG_RATE_LIMIT_PER_SEC: float = 20.0
+    
     PLATE_MODEL_NAME: str
     OCR_MODEL_NAME: str
     
@@ -45,6 +145,51 @@ class Settings(BaseSettings):
     T_CLOSE_SEC: int = 60
     cooldown_sec: int = 3
     alarm_cooldown_sec: int = 3
+    # camera events (alarms) are worked from a bounded priority queue by EVENT_WORKERS tasks.
+    # Past EVENT_QUEUE_SIZE queued, the lowest priority is dropped; an alarm within
+    # EVENT_DEDUP_WINDOW_SEC of a queued one of the same camera is dropped. Priority:
+    # cameras.priority, else EVENT_DEFAULT_PRIORITY (lower runs first).
+    # EVENT_JOURNAL_PATH (SQLite file): queued events survive restarts and overflow spills to
+    # disk (up to EVENT_JOURNAL_MAX); events older than EVENT_MAX_AGE_SEC are not processed.
+    # Shutdown drains the queue for up to EVENT_DRAIN_TIMEOUT_SEC.
+    EVENT_WORKERS: int = 4
+    EVENT_QUEUE_SIZE: int = 64
+    EVENT_DEDUP_WINDOW_SEC: float = 2.0
+    EVENT_DEFAULT_PRIORITY: int = 5
+    EVENT_JOURNAL_PATH: str = ""
+    EVENT_JOURNAL_MAX: int = 10000
+    EVENT_MAX_AGE_SEC: float = 30.0
+    EVENT_DRAIN_TIMEOUT_SEC: float = 20.0
+    # cooldown table: at most COOLDOWN_MAX_CAMERAS cameras, idle ones dropped after the cooldowns
+    # (the same bound applies to the digest-auth state and the camera config cache);
+    # "memory" (per replica) | "mongo" (shared by all replicas, `cooldowns` collection)
+    COOLDOWN_MAX_CAMERAS: int = 4096
+    COOLDOWN_BACKEND: str = "memory"
+    # camera snapshots: at most SNAPSHOT_CONCURRENCY in flight over all cameras and
+    # SNAPSHOT_PER_CAMERA per camera, queued cameras served round-robin. Timeouts follow each
+    # camera's latency within [MIN, MAX]; SNAPSHOT_QUARANTINE_AFTER failures in a row skip the
+    # camera for SNAPSHOT_QUARANTINE_SEC, doubling per further failure up to MAX
+    SNAPSHOT_CONCURRENCY: int = 4
+    SNAPSHOT_PER_CAMERA: int = 1
+    SNAPSHOT_TIMEOUT_MIN_SEC: float = 0.5
+    SNAPSHOT_TIMEOUT_MAX_SEC: float = 6.0
+    SNAPSHOT_QUARANTINE_AFTER: int = 3
+    SNAPSHOT_QUARANTINE_SEC: float = 5.0
+    SNAPSHOT_QUARANTINE_MAX_SEC: float = 120.0
+    # snapshots per alarm (1 = single snapshot), read together and voted into one plate
+    BURST_FRAMES: int = 1
+    BURST_INTERVAL_MS: int = 120
+    # alarm frames: "snapshot" (one picture request per alarm) or a persistent per-camera
+    # source buffering the last FRAME_RING_SIZE frames: "mjpeg" (FRAME_STREAM_PATH) or
+    # "poll" (a picture every FRAME_POLL_INTERVAL_MS)
+    FRAME_SOURCE: str = "snapshot"
+    FRAME_STREAM_PATH: str = "/ISAPI/Streaming/channels/102/httpPreview"
+    FRAME_POLL_INTERVAL_MS: float = 200
+    FRAME_RING_SIZE: int = 8
+    # buffered frames further than this from the alarm are not used (snapshot instead)
+    FRAME_MAX_AGE_MS: float = 1000
+    # streams of cameras without an alarm for this long are closed
+    FRAME_IDLE_SEC: float = 600
 
     class Config:
         env_file = ".env"
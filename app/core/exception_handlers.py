@@ -13,6 +13,7 @@ async def app_error_handler(request: Request, exc: AppError):
             "code": exc.code,
             "extra": exc.extra,
         },
+        headers=getattr(exc, "headers", None),
     )
     
 
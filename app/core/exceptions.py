@@ -25,4 +25,13 @@ class MongoLogError(AppError):
 
 class OCRServiceError(AppError):
     status_code = 502
-    code = "OCR_ERROR"
\ No newline at end of file
+    code = "OCR_ERROR"
+
+
+class OverloadedError(AppError):
+    status_code = 503
+    code = "OVERLOADED"
+
+    def __init__(self, message: str, *, retry_after: int = 1, extra: dict | None = None):
+        super().__init__(message, extra=extra)
+        self.headers = {"Retry-After": str(retry_after)}
@@ -1,37 +1,146 @@
 # app/core/logging_config.py
+import atexit
+import json
 import logging
 import logging.config
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from app.core.config import get_settings
 
-LOGGING = {
-    "version": 1,
-    "disable_existing_loggers": False,
+settings = get_settings()
 
-    "formatters": {
-        "standard": {
-            "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+# one summary line per processed event, never sampled
+EVENTS_LOGGER = "lpr.events"
+
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `fields` passed via extra= are merged in."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """
+    Thin out per-frame chatter: INFO/DEBUG records pass with probability
+    `sample_rate` and at most `per_sec` per second (per logger it is attached to).
+    WARNING and above always pass.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, per_sec: float = 0.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.per_sec = per_sec
+        self._tokens = per_sec
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self.per_sec <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.per_sec, self._tokens + (now - self._last) * self.per_sec)
+            self._last = now
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+def build_config() -> dict:
+    return {
+        "version": 1,
+        "disable_existing_loggers": False,
+
+        "formatters": {
+            "standard": {
+                "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+            },
+            "json": {
+                "()": JsonFormatter,
+            },
         },
-    },
 
-    "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "standard",
+        "handlers": {
+            "console": {
+                "class": "logging.StreamHandler",
+                "formatter": "json" if settings.LOG_FORMAT == "json" else "standard",
+            },
         },
-    },
-
-    "root": {
-        "level": "INFO",
-        "handlers": ["console"],
-    },
-    "loggers": {
-        "apscheduler": {
-            "level": "WARNING",  
+
+        "root": {
+            "level": settings.LOG_LEVEL,
             "handlers": ["console"],
-            "propagate": False
         },
-        
+        "loggers": {
+            "apscheduler": {
+                "level": "WARNING",
+            },
+
+        }
     }
-}
+
 
 def setup_logging() -> None:
-    logging.config.dictConfig(LOGGING)
+    """
+    dictConfig + (LOG_ASYNC) every handler moved behind a queue, so the event
+    loop and the inference threads only enqueue records and a background
+    thread does the writing.
+    """
+    global _listener
+    logging.config.dictConfig(build_config())
+
+    for name in settings.LOG_SAMPLED_LOGGERS:
+        sampled = logging.getLogger(name)
+        for f in [f for f in sampled.filters if isinstance(f, SampleFilter)]:
+            sampled.removeFilter(f)
+        sampled.addFilter(SampleFilter(settings.LOG_SAMPLE_RATE, settings.LOG_RATE_LIMIT_PER_SEC))
+
+    if not settings.LOG_ASYNC:
+        return
+    stop_logging()
+
+    root = logging.getLogger()
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+    root.handlers = [QueueHandler(log_queue)]
+    _listener.start()
+
+
+@atexit.register
+def stop_logging() -> None:
+    """Write out what is still queued and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_event(kind: str, **fields) -> None:
+    """The one summary line of a processed event (camera alarm, API request)."""
+    fields = {"event": kind, **{k: v for k, v in fields.items() if v is not None}}
+    logging.getLogger(EVENTS_LOGGER).info(
+        " ".join(f"{k}={v}" for k, v in fields.items()),
+        extra={"fields": fields},
+    )
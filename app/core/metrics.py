@@ -0,0 +1,144 @@
+import time
+from prometheus_client import Counter, Gauge, Histogram
+
+# stage latencies range from ~1 ms (post-process) to seconds (uploads, cold Mongo)
+_STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = Histogram(
+    "lpr_stage_seconds",
+    "Duration of one pipeline stage (ocr_* are the stages inside OCRService)",
+    ["source", "stage", "camera", "direction", "read_status"],
+    buckets=_STAGE_BUCKETS,
+)
+EVENTS = Counter(
+    "lpr_events_total",
+    "Processed events (camera alarms, API requests) by outcome",
+    ["source", "camera", "direction", "read_status"],
+)
+IGNORED = Counter(
+    "lpr_ignored_total",
+    "Complete reads not logged, by reason",
+    ["source", "reason", "camera"],
+)
+SNAPSHOTS = Counter(
+    "lpr_snapshot_requests_total",
+    "Camera snapshot fetches by outcome",
+    ["outcome"],
+)
+UPLOAD_ERRORS = Counter(
+    "lpr_upload_errors_total",
+    "Failed uploads to Spaces",
+    ["operation"],
+)
+MONGO_ERRORS = Counter(
+    "lpr_mongo_errors_total",
+    "Failed Mongo operations",
+    ["operation"],
+)
+EVENT_QUEUE_DEPTH = Gauge(
+    "lpr_event_queue_depth",
+    "Camera events waiting, in memory or spilled to the journal",
+    ["where"],
+)
+EVENT_QUEUE_OLDEST_SECONDS = Gauge("lpr_event_queue_oldest_seconds", "Age of the oldest queued camera event")
+EVENT_QUEUE_WAIT_SECONDS = Histogram(
+    "lpr_event_queue_wait_seconds",
+    "Time a camera event spent queued before a worker took it",
+    buckets=_STAGE_BUCKETS,
+)
+EVENT_QUEUE_DROPPED = Counter(
+    "lpr_event_queue_dropped_total",
+    "Camera events not processed, by reason",
+    ["reason"],
+)
+COOLDOWN_SUPPRESSED = Counter(
+    "lpr_cooldown_suppressed_total",
+    "Alarms / snapshots skipped by the cooldown, by where it was decided (local table or shared backend)",
+    ["kind", "scope"],
+)
+COOLDOWN_CAMERAS = Gauge("lpr_cooldown_cameras", "Cameras in the cooldown table")
+SNAPSHOT_WAIT_SECONDS = Histogram(
+    "lpr_snapshot_wait_seconds",
+    "Time a snapshot request waited for its camera / global slot",
+    buckets=_STAGE_BUCKETS,
+)
+CAMERAS_QUARANTINED = Gauge("lpr_cameras_quarantined", "Cameras skipped after repeated snapshot failures")
+CAMERA_AUTH_CHALLENGES = Counter(
+    "lpr_camera_auth_challenges_total",
+    "Digest 401 challenges answered while fetching snapshots (first request per camera, stale nonces)",
+)
+FRAME_STREAM_ERRORS = Counter(
+    "lpr_frame_stream_errors_total",
+    "Persistent frame source failures (each followed by a reconnect)",
+    ["mode"],
+)
+FRAME_OFFSET_SECONDS = Histogram(
+    "lpr_frame_offset_seconds",
+    "Distance between the alarm time and the buffered frame used for it",
+    buckets=_STAGE_BUCKETS,
+)
+
+QUALITY_REJECTED = Counter(
+    "lpr_quality_rejected_total",
+    "Frames stopped by the quality gate before detection",
+    ["reason", "camera"],
+)
+
+INFERENCE_RUNNING = Gauge("lpr_inference_running", "Inference jobs running")
+INFERENCE_QUEUED = Gauge("lpr_inference_queued", "Inference jobs waiting for admission")
+INFERENCE_WAIT_SECONDS = Histogram(
+    "lpr_inference_wait_seconds",
+    "Time a job waited for an inference slot",
+    buckets=_STAGE_BUCKETS,
+)
+INFERENCE_REJECTED = Counter(
+    "lpr_inference_rejected_total",
+    "Inference jobs not admitted, by admission policy outcome",
+    ["reason"],
+)
+
+
+class PipelineTrack:
+    """
+    Labels and timings of one event through predict / snap_and_process,
+    filled in as they become known and recorded once by observe().
+    summary() is the event's log line content.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.started = time.perf_counter()
+        self.timings: dict = {}
+        self.ocr_stages: dict = {}
+        self.camera = "unknown"
+        self.direction = "unknown"
+        # stays "error" if the event fails before OCR returns
+        self.read_status = "error"
+        self.reg_num: str | None = None
+        self.ignored: str | None = None
+
+    def ignore(self, reason: str) -> None:
+        self.ignored = reason
+        IGNORED.labels(self.source, reason, self.camera).inc()
+
+    def summary(self) -> dict:
+        return {
+            "camera": self.camera,
+            "direction": self.direction,
+            "status": self.read_status,
+            "regNum": self.reg_num,
+            "ignored": self.ignored,
+            **{k: round(v, 1) if isinstance(v, float) else v for k, v in self.timings.items()},
+            **{f"ocr_{k}": round(v, 1) for k, v in self.ocr_stages.items()},
+        }
+
+    def observe(self) -> None:
+        # early returns / errors never reached the end of the pipeline
+        self.timings.setdefault("total_ms", int((time.perf_counter() - self.started) * 1000))
+        labels = (self.camera, self.direction, self.read_status)
+        EVENTS.labels(self.source, *labels).inc()
+        for name, ms in self.timings.items():
+            if name.endswith("_ms"):
+                STAGE_SECONDS.labels(self.source, name[:-3], *labels).observe(ms / 1000)
+        for name, ms in self.ocr_stages.items():
+            STAGE_SECONDS.labels(self.source, f"ocr_{name.removesuffix('_ms')}", *labels).observe(ms / 1000)
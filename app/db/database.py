@@ -5,6 +5,7 @@ from app.models.user_org import User
 from app.models.ocr_log import OCRLog
 from app.models.cameras import cameras
 from app.models.vehicle_session import VehicleSession
+from app.models.cooldowns import Cooldown
 import logging
 
 logger = logging.getLogger("MongoDB_service") 
@@ -23,7 +24,8 @@ async def init_db():
             OCRLog,
             User,
             cameras,
-            VehicleSession
+            VehicleSession,
+            Cooldown,
         ],  
     )
     
@@ -6,9 +6,10 @@ from app.services.ocr_camera import HikSnapshotService
 setup_logging()
 logger = logging.getLogger(__name__)
 
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.core.config import get_settings  
 from app.core.exceptions import AppError
 from app.core.exception_handlers import app_error_handler, unhandled_error_handler
@@ -16,6 +17,12 @@ from app.db.database import  init_db
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from app.services.ocr_session_jobs import cleanup_sessions_job
 from app.routers import ocr
+from app.services import ocr_inference
+from app.services.ocr_models import model_registry
+from app.services.ocr_frames import FrameSourceManager
+from app.services.ocr_camera_auth import CameraAuthCache
+from app.services.ocr_event_queue import EventQueue
+from app.core import metrics
 
 
 settings = get_settings()
@@ -23,20 +30,61 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     # ⭐ Startup
     await init_db()
+    
+    # load + warm up the models (in worker processes when INFERENCE_WORKERS > 0)
+    await ocr_inference.start()
 
     # create http client in lifespan
     app.state.http_client = httpx.AsyncClient(
         timeout=httpx.Timeout(connect=3.0, read=6.0, write=6.0, pool=6.0),
-        limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+        # the snapshot scheduler keeps at most SNAPSHOT_CONCURRENCY of these busy
+        limits=httpx.Limits(max_connections=max(10, settings.SNAPSHOT_CONCURRENCY), max_keepalive_connections=5),
+    )
+    
+    # digest auth state per camera, shared by snapshots and frame streams
+    camera_auth = CameraAuthCache(
+        settings.HIK_CAMERA_USER, settings.HIK_CAMERA_PASSWORD, max_cameras=settings.COOLDOWN_MAX_CAMERAS,
     )
     
+    # persistent per-camera frame streams, on their own client so they never
+    # hold the snapshot / upload connections
+    app.state.frame_source = None
+    if settings.FRAME_SOURCE != "snapshot":
+        app.state.frame_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(connect=3.0, read=6.0, write=6.0, pool=6.0),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=None),
+        )
+        app.state.frame_source = FrameSourceManager(
+            app.state.frame_client,
+            camera_auth,
+            mode=settings.FRAME_SOURCE,
+        )
+    
     # create HikSnapshotService in lifespan
     app.state.hik_snapshot_service = HikSnapshotService(
         client=app.state.http_client,
         username=settings.HIK_CAMERA_USER,
         password=settings.HIK_CAMERA_PASSWORD,
+        frame_source=app.state.frame_source,
+        auth=camera_auth,
     )
     
+    # bounded camera-event queue in front of snap_and_process
+    app.state.event_queue = EventQueue(
+        app.state.hik_snapshot_service.process_event,
+        workers=settings.EVENT_WORKERS,
+        max_size=settings.EVENT_QUEUE_SIZE,
+        dedup_window_sec=settings.EVENT_DEDUP_WINDOW_SEC,
+        journal_path=settings.EVENT_JOURNAL_PATH or None,
+        journal_max=settings.EVENT_JOURNAL_MAX,
+        max_age_sec=settings.EVENT_MAX_AGE_SEC,
+    )
+    queue = app.state.event_queue
+    metrics.EVENT_QUEUE_DEPTH.labels("memory").set_function(lambda: len(queue))
+    metrics.EVENT_QUEUE_DEPTH.labels("journal").set_function(lambda: queue.spilled)
+    metrics.EVENT_QUEUE_OLDEST_SECONDS.set_function(queue.oldest_age)
+    queue.start()
+    
 
     # create scheduler in lifespan 
     app.state.scheduler = AsyncIOScheduler(timezone="UTC")
@@ -52,6 +100,17 @@ async def lifespan(app: FastAPI):
         misfire_grace_time=30,
     )
 
+    if app.state.frame_source is not None:
+        app.state.scheduler.add_job(
+            app.state.frame_source.prune,
+            trigger="interval",
+            minutes=1,
+            id="prune_frame_streams",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
     app.state.scheduler.start()
     logger.info(
         "✅ APScheduler started: cleanup_sessions_job every %s minute(s)",
@@ -62,6 +121,12 @@ async def lifespan(app: FastAPI):
         yield
     finally:
         # ⭐ Shutdown 
+        # finish queued camera events first, they still need inference / Mongo / Spaces
+        try:
+            await app.state.event_queue.stop(settings.EVENT_DRAIN_TIMEOUT_SEC)
+        except Exception:
+            logger.exception("event queue drain failed")
+        
         # shutdown scheduler
         sch = getattr(app.state, "scheduler", None)
         if sch:
@@ -73,6 +138,22 @@ async def lifespan(app: FastAPI):
         
         app.state.hik_snapshot_service = None 
         
+        # close camera frame streams
+        frame_source = getattr(app.state, "frame_source", None)
+        if frame_source:
+            try:
+                await frame_source.close()
+                await app.state.frame_client.aclose()
+            except Exception:
+                logger.exception("frame source shutdown failed")
+            app.state.frame_source = None
+        
+        # stop inference worker processes
+        try:
+            ocr_inference.stop()
+        except Exception:
+            logger.exception("inference pool shutdown failed")
+        
         # close http client
         client = getattr(app.state, "http_client", None)
         if client:
@@ -114,14 +195,33 @@ logger.info("🚀 App starting up...")
 
 # Health check endpoint
 @app.get("/health",status_code=200, tags=["health"])
-async def health_check():
+async def health_check(request: Request, response: Response):
+    models = model_registry.status()
+    if not models["ready"]:
+        # models still loading / warming up, keep traffic away from this worker
+        response.status_code = 503
+    frame_source = getattr(request.app.state, "frame_source", None)
+    snapshots = getattr(request.app.state, "hik_snapshot_service", None)
+    event_queue = getattr(request.app.state, "event_queue", None)
     return {
-        "status": "ok",
+        "status": "ok" if models["ready"] else "not ready",
         "env": settings.APP_ENV,
         "app_name": settings.APP_NAME,
+        "models": models,
+        "inference": ocr_inference.executor.stats(),
+        "snapshots": snapshots.scheduler.stats() if snapshots else None,
+        "cooldowns": snapshots.cooldowns.stats() if snapshots else None,
+        "events": event_queue.stats() if event_queue else None,
+        "frames": frame_source.stats() if frame_source else None,
 }
     
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @api_router.get("/")
 async def Who():
     return {"message": "Who are you?"}
@@ -2,11 +2,27 @@ from beanie import Document
 from typing import Optional, Literal
 
 CameraDirection = Literal["IN", "OUT"]
+# off: full frame, static: `roi` below, auto: learned from plate positions
+RoiMode = Literal["off", "static", "auto"]
 class cameras(Document):
     camId: str
     organization: str
     direction: Optional[CameraDirection] = None
     
+    # detection region, relative [x, y] points: 2 points = rect corners, 3+ = polygon
+    roiMode: RoiMode = "off"
+    roi: Optional[list[list[float]]] = None
+    
+    # quality gate overrides: enabled, min_brightness, max_brightness, min_contrast, min_sharpness
+    quality: Optional[dict[str, float]] = None
+    
+    # event queue priority, lower runs first (default: EVENT_DEFAULT_PRIORITY)
+    priority: Optional[int] = None
+    
+    # camera login for snapshots / streams (default: HIK_CAMERA_USER / HIK_CAMERA_PASSWORD)
+    username: Optional[str] = None
+    password: Optional[str] = None
+    
     class Settings:
         name = "cameras"
         indexes = [
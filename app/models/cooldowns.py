@@ -0,0 +1,16 @@
+from datetime import datetime
+from beanie import Document
+from pymongo import IndexModel
+
+
+class Cooldown(Document):
+    """Shared alarm / snapshot cooldown of one camera, "<kind>:<ip>" -> end of the cooldown."""
+    id: str
+    until: datetime
+
+    class Settings:
+        name = "cooldowns"
+        indexes = [
+            # Mongo drops documents once `until` has passed
+            IndexModel([("until", 1)], expireAfterSeconds=0),
+        ]
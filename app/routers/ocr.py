@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Body, HTTPException, Depends, Request,requests
-from fastapi.concurrency import run_in_threadpool
+from fastapi import APIRouter, Body, HTTPException, Request,requests
 from fastapi.responses import Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
 from datetime import datetime
 from app.core.config import get_settings 
+from app.core import metrics
+from app.core.logging_config import log_event
 from app.services.ocr_service import OCRService
+from app.services import ocr_inference
+from app.services.ocr_roi import roi_manager
+from app.services.ocr_camera_config import camera_configs, quality_thresholds
 from app.services.ocr_mongo_service import OcrMongoService
 from app.services.do_space import DOService
-from app.schemas.ocr import ImgBody 
+from app.schemas.ocr import ImgBody, MlCheckBody
 from app.core.exceptions import BusinessLogicError
-from functools import lru_cache
 import time
 
 import logging
@@ -28,10 +33,6 @@ router = APIRouter(
 
 do_service = DOService()
 mongo_service = OcrMongoService()
-ocr_service_instance = OCRService()
-@lru_cache
-def get_ocr_service():
-    return ocr_service_instance
 
 
 def next_id():
@@ -49,9 +50,78 @@ def _ms(t0: float) -> int:
     return int((time.perf_counter() - t0) * 1000)   
 
 
+# request body docs for endpoints that take an image as JSON, multipart or raw bytes
+IMAGE_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"type": "object", "properties": {
+                "camId": {"type": "string"}, "imgBase64": {"type": "string"}}}},
+            "multipart/form-data": {"schema": {"type": "object", "properties": {
+                "camId": {"type": "string"}, "file": {"type": "string", "format": "binary"}}}},
+            "application/octet-stream": {"schema": {"type": "string", "format": "binary"}},
+        },
+    },
+    "parameters": [{"name": "camId", "in": "query", "required": False, "schema": {"type": "string"},
+                    "description": "camera id for application/octet-stream uploads"}],
+}
+
+
+async def read_image_payload(request: Request, schema: type[BaseModel] = ImgBody) -> tuple[str | None, str | bytes]:
+    """
+    Return (camId, image) from one of:
+      - application/json         {"camId": ..., "imgBase64": ...}  -> image is the base64 str
+      - multipart/form-data      camId + file                      -> image is the raw file bytes
+      - application/octet-stream body, camId in ?camId= or X-Cam-Id -> image is the raw body
+    """
+    content_type = request.headers.get("content-type", "").lower()
+
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file") or form.get("image")
+        if upload is None or isinstance(upload, str):
+            raise BusinessLogicError("Missing image file field 'file'")
+        return form.get("camId"), await upload.read()
+
+    if content_type.startswith(("application/octet-stream", "image/")):
+        cam_id = request.query_params.get("camId") or request.headers.get("X-Cam-Id")
+        body = await request.body()
+        if not body:
+            raise BusinessLogicError("Empty image body")
+        return cam_id, body
+
+    try:
+        payload = schema.model_validate(await request.json())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors()) from e
+    except ValueError as e:
+        raise BusinessLogicError(f"Invalid JSON body: {e}") from e
+    return getattr(payload, "camId", None), payload.imgBase64
+
+
+async def run_ocr(image: str | bytes, cam_id: str | None = None) -> dict:
+    # detection ROI for this camera (static or learned), None = full frame
+    roi = await roi_manager.region(cam_id)
+    quality = await quality_thresholds(cam_id)
+    if isinstance(image, str):
+        result = await ocr_inference.predict_base64(image, cam_id, roi, quality=quality)
+    else:
+        result = await ocr_inference.predict_bytes(image, cam_id, roi, quality=quality)
+    roi_manager.observe(cam_id, result.get("plateBox"))
+    return result
+
+
+def count_quality_reject(result: dict, camera: str = "unknown") -> None:
+    """QUALITY_REJECTED for a low_quality result. `camera` only once it is known to exist (label cardinality)."""
+    if result.get("readStatus") == "low_quality":
+        metrics.QUALITY_REJECTED.labels(result["quality"]["reason"], camera).inc()
+
+
 # for Hikvision alarm webhook
 @router.post("/hik/alarm")
 async def hik_alarm(request: Request):
+    # the frame source picks the buffered frame closest to this
+    event_ts = time.time()
 
     # get form data
     form = await request.form()
@@ -77,9 +147,14 @@ async def hik_alarm(request: Request):
         ip = alarm.get("ip")
         if not ip:
             return Response(status_code=200)
-        # check alarm cooldown
+        # check alarm cooldown, then queue the event for the camera workers
         if await svc.should_trigger(ip):
-            svc.create_task(svc.snap_and_process(ip, alarm["macAddress"]))
+            mac = alarm["macAddress"]
+            # cached per camera, only the first alarm (or one after the TTL) reads Mongo
+            camera = await camera_configs.get(mac)
+            priority = camera.priority if camera is not None and camera.priority is not None \
+                else settings.EVENT_DEFAULT_PRIORITY
+            request.app.state.event_queue.put(ip, mac, event_ts, priority)
 
     else:
         logger.warning("NO XML FILE, RAW FORM: %s", form)
@@ -88,22 +163,36 @@ async def hik_alarm(request: Request):
 
 
 # api test endpoint
-@router.post("/predict",status_code=201)
-async def predict(payload: ImgBody, ocr_service: OCRService = Depends(get_ocr_service)):
+@router.post("/predict",status_code=201, openapi_extra=IMAGE_UPLOAD_OPENAPI)
+async def predict(request: Request):
+    track = metrics.PipelineTrack("api")
+    try:
+        return await _predict(request, track)
+    finally:
+        track.observe()
+        log_event("api", **track.summary())
+
+
+async def _predict(request: Request, track: metrics.PipelineTrack):
 
     url = None
     db = None
     session = None
-    timings: dict[str, int] = {}
+    timings: dict[str, int] = track.timings
     t_req = time.perf_counter()
     
-    print("\n\n")
-    logger.info("OCR Predict Start!!!")
+    logger.debug("OCR Predict Start")
     
     # -------call OCR service in thread pool -------
     t0 = time.perf_counter()
-    result =  await run_in_threadpool(ocr_service.predict, payload.imgBase64)
+    # full queue -> 503 before the body is even read
+    ocr_inference.executor.check_admission()
+    camId, image = await read_image_payload(request, ImgBody)
+    result = await run_ocr(image, camId)
     timings["ocr_ms"] = _ms(t0)
+    track.read_status = result.get("readStatus") or "error"
+    track.reg_num = result.get("regNum")
+    track.ocr_stages = result.get("stages") or {}
     
     # ------- destructure result -------
     ocr_data = {
@@ -125,13 +214,18 @@ async def predict(payload: ImgBody, ocr_service: OCRService = Depends(get_ocr_se
     
     # ------- fetch camera data -------
     t0 = time.perf_counter()
-    camerasData = await mongo_service.mapCamId(payload.camId)
+    camerasData = await mongo_service.mapCamId(camId)
     timings["mongo_mapCamId_ms"] = _ms(t0)
 
+    # metric labels only for cameras that exist, request camIds are arbitrary
+    if camerasData:
+        track.camera = camId
+    count_quality_reject(result, track.camera)
     if not camerasData:
-        raise BusinessLogicError(f"Camera ID '{payload.camId}' not found")
+        raise BusinessLogicError(f"Camera ID '{camId}' not found")
 
     organization, direction = camerasData
+    track.direction = direction or "unknown"
     
     # ------- fetch subId -------
     t0 = time.perf_counter()
@@ -139,15 +233,15 @@ async def predict(payload: ImgBody, ocr_service: OCRService = Depends(get_ocr_se
     timings["mongo_get_UID_ms"] = _ms(t0)
     
     if not organization or not subId or not direction:
-        raise BusinessLogicError(f"Organization for Camera ID '{payload.camId}' not found")
+        raise BusinessLogicError(f"Organization for Camera ID '{camId}' not found")
     
     # ------- prepare DO image paths -------
     ts = next_id()
 
     # create do paths
-    orig_path = f"{settings.ORI_IMG_LOG_PATH_PREFIX}/{ts}.jpg".replace("subId", subId)
-    crop_path = f"{settings.PRO_IMG_LOG_PATH_PREFIX}/cropped_{ts}.jpg".replace("subId", subId)
-    issue_pro_path = f"{settings.ISSUE_LOG_PATH_PREFIX}/{ts}.jpg".replace("subId", subId)
+    orig_path = f"{settings.ORI_IMG_LOG_PATH_PREFIX}/{ts}.{settings.IMG_ENCODE_FORMAT}".replace("subId", subId)
+    crop_path = f"{settings.PRO_IMG_LOG_PATH_PREFIX}/cropped_{ts}.{settings.IMG_ENCODE_FORMAT}".replace("subId", subId)
+    issue_pro_path = f"{settings.ISSUE_LOG_PATH_PREFIX}/{ts}.{settings.IMG_ENCODE_FORMAT}".replace("subId", subId)
     
     # ------- process according to readStatus -------
     read_status = result.get("readStatus")
@@ -165,7 +259,8 @@ async def predict(payload: ImgBody, ocr_service: OCRService = Depends(get_ocr_se
             # lock check
             if latest and latest.get("lockedUntil") and now < latest["lockedUntil"]:
                 # LOCKED -> ignore
-                logger.info("IGNORE %s org=%s reg=%s", "LOCKED", organization, ocr_data["regNum"])
+                logger.debug("IGNORE %s org=%s reg=%s", "LOCKED", organization, ocr_data["regNum"])
+                track.ignore("LOCKED")
                 return {
                         "ocr-response": ocr_data,
                         "do-service": None,
@@ -185,7 +280,8 @@ async def predict(payload: ImgBody, ocr_service: OCRService = Depends(get_ocr_se
                 if open_doc:
                     entry_time = (open_doc.get("entry") or {}).get("time")
                     if entry_time and (now - entry_time).total_seconds() < settings.MIN_DURATION_SEC:
-                        logger.info("IGNORE %s org=%s reg=%s", "MIN_DURATION", organization, ocr_data["regNum"])
+                        logger.debug("IGNORE %s org=%s reg=%s", "MIN_DURATION", organization, ocr_data["regNum"])
+                        track.ignore("MIN_DURATION")
                         return {
                             "ocr-response": ocr_data,
                             "do-service": None,
@@ -211,7 +307,7 @@ async def predict(payload: ImgBody, ocr_service: OCRService = Depends(get_ocr_se
             
             # insert session
             t0 = time.perf_counter()
-            session = await mongo_service.resolve_session_from_log(db,direction, payload.camId)
+            session = await mongo_service.resolve_session_from_log(db,direction, camId)
             timings["session_ms"] = _ms(t0)
             
         case "no_text" | "short_text":
@@ -229,6 +325,11 @@ async def predict(payload: ImgBody, ocr_service: OCRService = Depends(get_ocr_se
             db = None
             session = None
 
+        case "low_quality":
+            # frame could never be read, nothing worth storing
+            db = None
+            session = None
+
         case "no_plate":
             # send only originalImage to issue pro path
             if not image_bytes.get("originalImage"):
@@ -248,7 +349,6 @@ async def predict(payload: ImgBody, ocr_service: OCRService = Depends(get_ocr_se
             raise BusinessLogicError(f"Unknown readStatus '{read_status}'")
     
     timings["total_ms"] = _ms(t_req)
-    logger.info("timings=%s", timings)
 
     
     return {
@@ -262,18 +362,20 @@ async def predict(payload: ImgBody, ocr_service: OCRService = Depends(get_ocr_se
 
 # base64 to image size test endpoint
 @router.post("/base64-to-img",status_code=201)
-async def decoded(payload: ImgBody, ocr_service: OCRService = Depends(get_ocr_service)):
-    # OCRService()                               
-    result = ocr_service.decode_base64(payload.imgBase64)
+async def decoded(payload: ImgBody):
+    result = OCRService.decode_base64(payload.imgBase64)
     if result is None:
         raise BusinessLogicError("Invalid base64 image")
     return {"response": len(result)}  
 
 # ml check endpoint
-@router.post("/ml-check",status_code=200)
-async def ml_check(imgBase64: str = Body(..., embed=True), ocr_service: OCRService = Depends(get_ocr_service)):
+@router.post("/ml-check",status_code=200, openapi_extra=IMAGE_UPLOAD_OPENAPI)
+async def ml_check(request: Request):
     # call OCR service in thread pool
-    result =  await run_in_threadpool(ocr_service.predict, imgBase64)
+    ocr_inference.executor.check_admission()
+    _, image = await read_image_payload(request, MlCheckBody)
+    result = await run_ocr(image)
+    count_quality_reject(result)
     ocr_data = {
             "regNum": result.get("regNum"),
             "province": result.get("province"),
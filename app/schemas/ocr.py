@@ -2,4 +2,8 @@ from pydantic import BaseModel
 
 class ImgBody(BaseModel):
     camId: str | None 
-    imgBase64: str
\ No newline at end of file
+    imgBase64: str
+
+
+class MlCheckBody(BaseModel):
+    imgBase64: str
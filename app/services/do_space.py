@@ -3,7 +3,10 @@ import aioboto3
 import logging
 from botocore.config import Config
 from app.core.config import get_settings 
+from app.core import metrics
 from functools import lru_cache
+from fastapi.concurrency import run_in_threadpool
+from app.services.ocr_images import LazyImage
 from app.core.exceptions import StorageServiceError, BusinessLogicError
 
 logger = logging.getLogger("DO_service") 
@@ -32,10 +35,15 @@ class DOService:
     def get_session(self):
         return aioboto3.Session()
     
-    async def upload_image(self, image: bytes, image_path: str, content_type="image/jpeg"):
+    async def upload_image(self, image: bytes | LazyImage, image_path: str, content_type="image/jpeg"):
         try:
             if not self.key or not self.secret or not self.bucket:
                 raise BusinessLogicError("DO Spaces credentials or bucket not configured")
+            
+            # lazy OCR images are encoded here, off the event loop
+            if isinstance(image, LazyImage):
+                content_type = image.content_type
+                image = image.encode() if image.is_encoded else await run_in_threadpool(image.encode)
         
             session = self.get_session()
 
@@ -61,12 +69,13 @@ class DOService:
             raise
         except Exception as e:
             logger.exception("Error uploading to DO Spaces (key=%s)", image_path)
+            metrics.UPLOAD_ERRORS.labels("upload_image").inc()
             raise StorageServiceError(f"DO Spaces upload failed: {e}") from e
         
     async def upload_two_images(
         self,
-        original_bytes: bytes,
-        cropped_bytes: bytes,
+        original_bytes: bytes | LazyImage,
+        cropped_bytes: bytes | LazyImage,
         path_original: str,
         path_cropped: str,
     ):
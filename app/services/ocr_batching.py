@@ -0,0 +1,134 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+logger = logging.getLogger("ocr_batching")
+
+# run_batch(items, key) -> one result per item (same order)
+BatchFn = Callable[[list[Any], Hashable], list[Any]]
+
+_STOP = object()
+
+
+class BatchScheduler:
+    """
+    Collect items submitted from many threads and run them as one batch.
+
+    The first item opens a window of `window_ms`; everything that arrives with
+    the same key before the window closes (or until `max_batch` is reached)
+    goes into the same `run_batch` call. Each caller gets a Future resolved
+    with its own result.
+    """
+
+    def __init__(self, name: str, run_batch: BatchFn, max_batch: int = 8, window_ms: float = 10.0):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max(1, int(max_batch))
+        self.window_sec = max(0.0, window_ms) / 1000.0
+
+        self._queue: queue.Queue = queue.Queue()
+        # nothing is queued behind _STOP, so no job is left unresolved by close()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name=f"{name}-batcher", daemon=True)
+        self._thread.start()
+
+        logger.info(
+            "✅ BatchScheduler[%s] started (max_batch=%d, window=%.1f ms)",
+            name, self.max_batch, self.window_sec * 1000,
+        )
+
+    def submit(self, item: Any, key: Hashable = None) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            if self._closed:
+                fut.set_exception(RuntimeError(f"BatchScheduler[{self.name}] is closed"))
+                return fut
+            self._queue.put((key, item, fut))
+        return fut
+
+    def run(self, item: Any, key: Hashable = None) -> Any:
+        """Submit and block until the batch containing `item` is done."""
+        return self.submit(item, key).result()
+
+    def close(self) -> None:
+        """Stop taking items; the ones already submitted still run."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+    def _loop(self) -> None:
+        # jobs that arrived during a window but belong to another key
+        carry: list[tuple] = []
+
+        while True:
+            first = carry.pop(0) if carry else self._queue.get()
+            if first is _STOP:
+                return
+
+            key = first[0]
+            batch = [first]
+
+            # same-key leftovers from the previous window go first
+            for job in list(carry):
+                if len(batch) >= self.max_batch:
+                    break
+                if job[0] == key:
+                    batch.append(job)
+                    carry.remove(job)
+
+            deadline = time.monotonic() + self.window_sec
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    self._run(key, batch)
+                    self._run_carried(carry)
+                    return
+                if job[0] == key:
+                    batch.append(job)
+                else:
+                    carry.append(job)
+
+            self._run(key, batch)
+
+    def _run_carried(self, carry: list[tuple]) -> None:
+        """At close: run the other keys' jobs still waiting for their own batch."""
+        while carry:
+            key = carry[0][0]
+            batch = [job for job in carry if job[0] == key][:self.max_batch]
+            for job in batch:
+                carry.remove(job)
+            self._run(key, batch)
+
+    def _run(self, key: Hashable, batch: list[tuple]) -> None:
+        # drop callers that gave up before we started
+        batch = [job for job in batch if job[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            results = self.run_batch([job[1] for job in batch], key)
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"{self.name} batch returned {len(results)} results for {len(batch)} items"
+                )
+        except Exception as e:
+            logger.exception("BatchScheduler[%s] batch of %d failed", self.name, len(batch))
+            for _, _, fut in batch:
+                fut.set_exception(e)
+            return
+
+        for (_, _, fut), res in zip(batch, results):
+            fut.set_result(res)
@@ -1,14 +1,20 @@
 import httpx
-import base64
 import asyncio, time, logging
 from datetime import datetime
 import xml.etree.ElementTree as ET
-from functools import lru_cache
-from fastapi.concurrency import run_in_threadpool
 from app.core.config import get_settings 
-from app.services.ocr_service import OCRService
+from app.core import metrics
+from app.core.logging_config import log_event
+from app.services import ocr_inference
+from app.services.ocr_roi import roi_manager
+from app.services.ocr_camera_config import quality_thresholds
+from app.services.ocr_frames import FrameSourceManager
+from app.services.ocr_camera_auth import CameraAuthCache
+from app.services.ocr_cooldown import CooldownTable, MongoCooldownBackend
+from app.services.ocr_snapshot_scheduler import CameraQuarantinedError, SnapshotScheduler
 from app.services.ocr_mongo_service import OcrMongoService
 from app.services.do_space import DOService
+from app.core.exceptions import OverloadedError
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +24,6 @@ _counter = 0
 do_service = DOService()
 settings = get_settings()
 mongo_service = OcrMongoService()
-ocr_service_instance = OCRService()
-
-@lru_cache
-def get_ocr_service():
-    return ocr_service_instance
 
 
 class HikSnapshotService:
@@ -33,31 +34,43 @@ class HikSnapshotService:
         password: str,
         cooldown_sec: float = settings.cooldown_sec,
         alarm_cooldown_sec: float = settings.alarm_cooldown_sec,
-        max_concurrent: int = 2,
         retries: int = 2,
         backoff_base: float = 0.2,
+        frame_source: FrameSourceManager | None = None,
+        auth: CameraAuthCache | None = None,
+        scheduler: SnapshotScheduler | None = None,
+        cooldowns: CooldownTable | None = None,
     ):
         self.client = client
-        self.username = username
-        self.password = password
+        # digest auth state per camera (default credentials: username / password)
+        self.auth = auth or CameraAuthCache(username, password)
 
         self.cooldown_sec = cooldown_sec
         self.alarm_cooldown_sec = alarm_cooldown_sec
         self.retries = retries
         self.backoff_base = backoff_base
+        # persistent per-camera frames (FRAME_SOURCE), None = a snapshot per alarm
+        self.frame_source = frame_source
 
-        self._last_shot: dict[str, float] = {}
-        self._last_alarm: dict[str, float] = {}
-        self._ip_locks: dict[str, asyncio.Lock] = {}
-        self._sem = asyncio.Semaphore(max_concurrent)
+        # last alarm / snapshot per camera
+        self.cooldowns = cooldowns or CooldownTable(
+            ttl_sec=max(cooldown_sec, alarm_cooldown_sec),
+            max_entries=settings.COOLDOWN_MAX_CAMERAS,
+            backend=MongoCooldownBackend(mongo_service) if settings.COOLDOWN_BACKEND == "mongo" else None,
+        )
+        metrics.COOLDOWN_CAMERAS.set_function(lambda: len(self.cooldowns))
+        # per-camera queues / limits / timeouts / quarantine for picture requests
+        self.scheduler = scheduler or SnapshotScheduler(
+            global_limit=settings.SNAPSHOT_CONCURRENCY,
+            per_camera_limit=settings.SNAPSHOT_PER_CAMERA,
+            min_timeout=settings.SNAPSHOT_TIMEOUT_MIN_SEC,
+            max_timeout=settings.SNAPSHOT_TIMEOUT_MAX_SEC,
+            quarantine_after=settings.SNAPSHOT_QUARANTINE_AFTER,
+            quarantine_sec=settings.SNAPSHOT_QUARANTINE_SEC,
+            quarantine_max_sec=settings.SNAPSHOT_QUARANTINE_MAX_SEC,
+        )
+        metrics.CAMERAS_QUARANTINED.set_function(lambda: self.scheduler.quarantined)
 
-    def _get_lock(self, ip: str) -> asyncio.Lock:
-        lock = self._ip_locks.get(ip)
-        if lock is None:
-            lock = asyncio.Lock()
-            self._ip_locks[ip] = lock
-        return lock
-    
     def _ms(self, t0: float) -> int:
         return int((time.perf_counter() - t0) * 1000)   
     
@@ -73,73 +86,119 @@ class HikSnapshotService:
         return f"{ms}{_counter:03d}" 
 
     async def should_trigger(self, ip: str) -> bool:
-        """check alarm cooldown"""
-        now = time.monotonic()
-        async with self._get_lock(ip):
-            # get last alarm time
-            last = self._last_alarm.get(ip, 0.0)
-            # check cooldown
-            if now - last < self.alarm_cooldown_sec:
-                return False
-            self._last_alarm[ip] = now
-            return True
+        """check (and start) the alarm cooldown"""
+        return await self.cooldowns.allow(ip, "alarm", self.alarm_cooldown_sec)
 
-    def create_task(self, coro):
-        t = asyncio.create_task(coro)
-        def _cb(task: asyncio.Task):
-            try:
-                task.result()
-            except Exception as e:
-                logger.exception("snapshot task failed: %s", e)
-        t.add_done_callback(_cb)
-        return t
+    async def in_shot_cooldown(self, ip: str) -> bool:
+        """ check (and start) the snapshot cooldown """
+        if await self.cooldowns.allow(ip, "shot", self.cooldown_sec):
+            return False
+        logger.debug("SHOT SKIP cooldown ip=%s", ip)
+        metrics.SNAPSHOTS.labels("cooldown").inc()
+        return True
     
     async def fetch_snapshot(self, ip: str) -> bytes | None:
         """ check snapshot cooldown and fetch snapshot image """
-        
-        # check cooldown
-        now = time.monotonic()
-        last = self._last_shot.get(ip, 0.0)
-        if now - last < self.cooldown_sec:
-            logger.debug("SHOT SKIP cooldown ip=%s", ip)
+        if await self.in_shot_cooldown(ip):
             return None
-        self._last_shot[ip] = now
-
+        return await self.get_picture(ip)
+    
+    async def get_picture(self, ip: str) -> bytes | None:
+        """ fetch one snapshot (no cooldown check) """
         url = f"http://{ip}/ISAPI/Streaming/channels/101/picture"
 
-        async with self._sem:
-            # try multiple times
-            for attempt in range(self.retries):
-                try:
-                    r = await self.client.get(
-                        url,
-                        auth=httpx.DigestAuth(self.username, self.password),
-                    )
-                    if r.status_code == 200:
-                        logger.info("SNAPSHOT OK size=%d", len(r.content))
-                        return r.content
-                    
-                    elif r.status_code == 401:
-                        logger.warning("SNAPSHOT 401 challenge attempt=%d", attempt+1)
-                        continue
-                    elif r.status_code == 403:
-                        logger.warning("SNAPSHOT 403 forbidden")
-                        return None
-                    
-                    elif r.status_code == 503:
-                        logger.warning("SNAPSHOT 503 (camera busy) attempt=%d", attempt+1)
-                    else:
-                        
-                        logger.warning("SNAPSHOT FAIL %s", r.status_code)
-                        return None
+        # try multiple times
+        for attempt in range(self.retries):
+            try:
+                # a slot per attempt, the backoff below does not hold one
+                async with self.scheduler.slot(ip) as timeout:
+                    t0 = time.perf_counter()
+                    try:
+                        r = await self.client.get(
+                            url,
+                            auth=self.auth.get(ip),
+                            timeout=httpx.Timeout(timeout, pool=6.0),
+                        )
+                    except httpx.TimeoutException:
+                        self.scheduler.record(ip, ok=False, timed_out=True)
+                        raise
+                    except httpx.TransportError:
+                        self.scheduler.record(ip, ok=False)
+                        raise
+                    # any answer means the camera is reachable
+                    self.scheduler.record(ip, ok=True, seconds=time.perf_counter() - t0)
+                
+                if r.history:
+                    # 401 challenge(s) answered on the way: first request or stale nonce
+                    metrics.CAMERA_AUTH_CHALLENGES.inc(len(r.history))
+                if r.status_code == 200:
+                    logger.debug("SNAPSHOT OK size=%d", len(r.content))
+                    metrics.SNAPSHOTS.labels("ok").inc()
+                    return r.content
+                
+                elif r.status_code == 401:
+                    # the challenge was already answered, so the credentials are wrong
+                    logger.warning("SNAPSHOT 401 unauthorized ip=%s (check camera credentials)", ip)
+                    metrics.SNAPSHOTS.labels("unauthorized").inc()
+                    self.auth.invalidate(ip)
+                    return None
+                elif r.status_code == 403:
+                    logger.warning("SNAPSHOT 403 forbidden")
+                    metrics.SNAPSHOTS.labels("forbidden").inc()
+                    return None
+                
+                elif r.status_code == 503:
+                    logger.warning("SNAPSHOT 503 (camera busy) attempt=%d", attempt+1)
+                    metrics.SNAPSHOTS.labels("busy").inc()
+                else:
                     
-                except (httpx.ReadTimeout, httpx.ConnectTimeout):
-                    logger.warning("SNAPSHOT TIMEOUT attempt=%d", attempt+1)
+                    logger.warning("SNAPSHOT FAIL %s", r.status_code)
+                    metrics.SNAPSHOTS.labels("error").inc()
+                    return None
+                
+            except CameraQuarantinedError as e:
+                logger.debug("SNAPSHOT SKIP %s", e.message)
+                metrics.SNAPSHOTS.labels("quarantined").inc()
+                return None
+            except httpx.TimeoutException:
+                logger.warning("SNAPSHOT TIMEOUT ip=%s attempt=%d", ip, attempt+1)
+                metrics.SNAPSHOTS.labels("timeout").inc()
+            except httpx.TransportError as e:
+                logger.warning("SNAPSHOT CONNECT FAIL ip=%s attempt=%d: %s", ip, attempt+1, e)
+                metrics.SNAPSHOTS.labels("unreachable").inc()
 
-                await asyncio.sleep(self.backoff_base * (attempt + 1))
+            await asyncio.sleep(self.backoff_base * (attempt + 1))
 
         return None
     
+    async def fetch_burst(self, ip: str, event_ts: float | None = None) -> list[bytes]:
+        """
+        fetch_snapshot() followed by BURST_FRAMES-1 more snapshots, BURST_INTERVAL_MS apart.
+        With a frame source, the buffered frames closest to `event_ts` (time.time() of the
+        alarm) instead, falling back to snapshots when none is close enough.
+        """
+        if self.frame_source is None or event_ts is None:
+            first = await self.fetch_snapshot(ip)
+        elif await self.in_shot_cooldown(ip):
+            return []
+        else:
+            frames = await self.frame_source.frames(ip, event_ts, settings.BURST_FRAMES)
+            if frames:
+                metrics.SNAPSHOTS.labels("stream").inc()
+                return frames
+            metrics.SNAPSHOTS.labels("stream_miss").inc()
+            first = await self.get_picture(ip)
+        if not first:
+            return []
+        
+        frames = [first]
+        for _ in range(settings.BURST_FRAMES - 1):
+            await asyncio.sleep(settings.BURST_INTERVAL_MS / 1000)
+            img = await self.get_picture(ip)
+            if img:
+                frames.append(img)
+        return frames
+    
     async def parse_alarm_xml(self, xml_text: str):
         ns = {"h": "http://www.hikvision.com/ver20/XMLSchema"}
         root = ET.fromstring(xml_text)
@@ -156,33 +215,70 @@ class HikSnapshotService:
         }
         return data
 
-    async def snap_and_process(self, ip: str, macAddress: str):
+    async def process_event(self, event: dict):
+        """ EventQueue handler: one queued alarm """
+        queue_ms = int((time.time() - event["queued_at"]) * 1000)
+        await self.snap_and_process(event["ip"], event["mac"], event["event_ts"], queue_ms)
+    
+    async def snap_and_process(self, ip: str, macAddress: str, event_ts: float | None = None,
+                               queue_ms: int | None = None):
+        track = metrics.PipelineTrack("camera")
+        track.camera = macAddress or "unknown"
+        if queue_ms is not None:
+            track.timings["queue_ms"] = queue_ms
+        try:
+            await self._snap_and_process(ip, macAddress, track, event_ts)
+        finally:
+            track.observe()
+            log_event("camera", ip=ip, **track.summary())
+    
+    async def _snap_and_process(self, ip: str, macAddress: str, track: metrics.PipelineTrack,
+                                event_ts: float | None = None):
         
         url = None
         db = None
         session = None
-        timings: dict[str, int] = {}
+        timings: dict[str, int] = track.timings
         t_req = time.perf_counter()
         
-        print("\n\n")
-        logger.info("Process Start!!!")
+        logger.debug("Process Start ip=%s", ip)
         
-        # fetch snapshot
+        # fetch snapshot (or a burst of them)
         t0 = time.perf_counter()
-        img = await self.fetch_snapshot(ip)
+        await self.auth.resolve(ip, macAddress)
+        frames = await self.fetch_burst(ip, event_ts)
         timings["fetch_ms"] = self._ms(t0)
+        timings["frames"] = len(frames)
         
-        if not img:
+        if not frames:
             logger.error("No snapshot image fetched ip=%s", ip)
+            track.read_status = "no_snapshot"
             return
         
-        # img encode base64
-        img_b64 = base64.b64encode(img).decode("utf-8")
-        
-        # -------call OCR service in thread pool -------
+        # -------call OCR service on the raw JPEG bytes -------
         t0 = time.perf_counter()
-        result =  await run_in_threadpool(ocr_service_instance.predict, img_b64)
+        roi = await roi_manager.region(macAddress)
+        quality = await quality_thresholds(macAddress)
+        try:
+            if len(frames) == 1:
+                result = await ocr_inference.predict_bytes(frames[0], macAddress, roi, kind="camera", quality=quality)
+            else:
+                # one batch for all frames, per-character vote, best frame uploaded
+                result = await ocr_inference.predict_burst(frames, macAddress, roi, kind="camera", quality=quality)
+        except OverloadedError as e:
+            # inference is saturated, the event is dropped (not retried)
+            logger.warning("EVENT SKIP %s ip=%s mac=%s", e.code, ip, macAddress)
+            track.read_status = "overloaded"
+            return
+        roi_manager.observe(macAddress, result.get("plateBox"))
         timings["ocr_ms"] = self._ms(t0)
+        track.read_status = result.get("readStatus") or "error"
+        track.reg_num = result.get("regNum")
+        if result.get("readStatus") == "low_quality":
+            # nothing to upload or log
+            metrics.QUALITY_REJECTED.labels(result["quality"]["reason"], macAddress or "unknown").inc()
+            return
+        track.ocr_stages = result.get("stages") or {}
         
         # ------- destructure result -------
         ocr_data = {
@@ -212,6 +308,7 @@ class HikSnapshotService:
             return
 
         organization, direction = camerasData
+        track.direction = direction or "unknown"
         
         # ------- fetch subId -------
         t0 = time.perf_counter()
@@ -226,9 +323,9 @@ class HikSnapshotService:
         ts = self.next_id()
         
         # create do paths
-        orig_path = f"{settings.ORI_IMG_LOG_PATH_PREFIX}/{ts}.jpg".replace("subId", subId)
-        crop_path = f"{settings.PRO_IMG_LOG_PATH_PREFIX}/cropped_{ts}.jpg".replace("subId", subId)
-        issue_pro_path = f"{settings.ISSUE_LOG_PATH_PREFIX}/{ts}.jpg".replace("subId", subId)
+        orig_path = f"{settings.ORI_IMG_LOG_PATH_PREFIX}/{ts}.{settings.IMG_ENCODE_FORMAT}".replace("subId", subId)
+        crop_path = f"{settings.PRO_IMG_LOG_PATH_PREFIX}/cropped_{ts}.{settings.IMG_ENCODE_FORMAT}".replace("subId", subId)
+        issue_pro_path = f"{settings.ISSUE_LOG_PATH_PREFIX}/{ts}.{settings.IMG_ENCODE_FORMAT}".replace("subId", subId)
 
         # ------- process according to readStatus -------
         read_status = result.get("readStatus")
@@ -250,7 +347,8 @@ class HikSnapshotService:
                 # lock check
                 if latest and latest.get("lockedUntil") and now < latest["lockedUntil"]:
                     # LOCKED -> ignore
-                    logger.info("IGNORE %s org=%s reg=%s", "LOCKED", organization, ocr_data["regNum"])
+                    logger.debug("IGNORE %s org=%s reg=%s", "LOCKED", organization, ocr_data["regNum"])
+                    track.ignore("LOCKED")
                     return 
             
                 # out duration check
@@ -265,7 +363,8 @@ class HikSnapshotService:
                         entry_time = (open_doc.get("entry") or {}).get("time")
                         
                         if entry_time and (now - entry_time).total_seconds() < settings.MIN_DURATION_SEC:
-                            logger.info("IGNORE %s org=%s reg=%s", "MIN_DURATION", organization, ocr_data["regNum"])
+                            logger.debug("IGNORE %s org=%s reg=%s", "MIN_DURATION", organization, ocr_data["regNum"])
+                            track.ignore("MIN_DURATION")
                             return 
             
                 
@@ -326,15 +425,6 @@ class HikSnapshotService:
                 return  
             
         timings["total_ms"] = self._ms(t_req)
-        logger.info("timings=%s", timings)
-
-        logger.info(
-            "PIPELINE DONE ip=%s plate=%s status=%s timings=%s",
-            ip,
-            ocr_data.get("regNum"),
-            ocr_data.get("readStatus"),
-            timings
-        )
     
         
         
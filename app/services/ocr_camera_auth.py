@@ -0,0 +1,65 @@
+import logging
+from collections import OrderedDict
+import httpx
+from app.core.config import get_settings
+from app.services.ocr_camera_config import CameraConfigCache, camera_configs
+
+logger = logging.getLogger("camera_auth")
+settings = get_settings()
+
+
+class CameraAuthCache:
+    """
+    One httpx.DigestAuth per camera ip, kept across requests. The instance
+    remembers the camera's last challenge (realm / nonce / opaque) and answers
+    the next request with a precomputed Authorization header and the next nonce
+    count, so only the first request, or one after a stale nonce, pays the
+    401 round trip.
+
+    Credentials are the camera's cameras.username / cameras.password when set,
+    else HIK_CAMERA_USER / HIK_CAMERA_PASSWORD.
+
+    At most `max_cameras` cameras are kept (LRU); an evicted camera just pays
+    the 401 round trip again on its next request.
+    """
+
+    def __init__(self, username: str, password: str, configs: CameraConfigCache = camera_configs,
+                 max_cameras: int = 4096):
+        self.default = (username, password)
+        self.configs = configs
+        self.max_cameras = max(1, max_cameras)
+        self._auth: OrderedDict[str, tuple[tuple[str, str], httpx.DigestAuth]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._auth)
+
+    def _for(self, ip: str, credentials: tuple[str, str]) -> httpx.DigestAuth:
+        entry = self._auth.get(ip)
+        if entry is None or entry[0] != credentials:
+            if entry is not None:
+                logger.info("camera credentials changed ip=%s, new auth state", ip)
+            entry = (credentials, httpx.DigestAuth(*credentials))
+            self._auth[ip] = entry
+            if len(self._auth) > self.max_cameras:
+                self._auth.popitem(last=False)
+        self._auth.move_to_end(ip)
+        return entry[1]
+
+    def get(self, ip: str) -> httpx.DigestAuth:
+        """Auth state for `ip` as last resolved (default credentials if never resolved)."""
+        entry = self._auth.get(ip)
+        if entry is None:
+            return self._for(ip, self.default)
+        self._auth.move_to_end(ip)
+        return entry[1]
+
+    async def resolve(self, ip: str, cam_id: str | None) -> httpx.DigestAuth:
+        """Auth state for `ip` with the credentials of camera `cam_id` (cached cameras document)."""
+        doc = await self.configs.get(cam_id)
+        if doc is not None and doc.username:
+            return self._for(ip, (doc.username, doc.password or ""))
+        return self._for(ip, self.default)
+
+    def invalidate(self, ip: str) -> None:
+        """Forget the challenge, the next request starts with a fresh 401."""
+        self._auth.pop(ip, None)
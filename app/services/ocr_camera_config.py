@@ -0,0 +1,71 @@
+import logging
+import time
+from collections import OrderedDict
+from app.core.config import get_settings
+from app.core.exceptions import MongoLogError
+from app.models.cameras import cameras
+from app.services.ocr_mongo_service import OcrMongoService
+from app.services.ocr_quality import merge_thresholds
+
+logger = logging.getLogger("camera_config")
+settings = get_settings()
+
+
+class CameraConfigCache:
+    """
+    Per-camera settings (cameras documents) cached for `ttl_sec`, so the hot path
+    does not hit Mongo on every event. A failed lookup serves the last known
+    document (or None) instead of failing the event.
+
+    camIds come from requests, so unknown ones are cached (as None) too: at most
+    `max_entries` are kept (LRU), and expired entries are swept out once per `ttl_sec`.
+    """
+
+    def __init__(self, mongo: OcrMongoService, ttl_sec: float = 60.0, max_entries: int = 4096):
+        self.mongo = mongo
+        self.ttl_sec = ttl_sec
+        self.max_entries = max(1, max_entries)
+        self._docs: OrderedDict[str, tuple[float, cameras | None]] = OrderedDict()
+        self._last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _store(self, cam_id: str, expires: float, doc: cameras | None) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep >= self.ttl_sec:
+            self._last_sweep = now
+            for key in [key for key, entry in self._docs.items() if entry[0] <= now]:
+                del self._docs[key]
+        self._docs[cam_id] = (expires, doc)
+        self._docs.move_to_end(cam_id)
+        while len(self._docs) > self.max_entries:
+            self._docs.popitem(last=False)
+
+    async def get(self, cam_id: str | None) -> cameras | None:
+        if not cam_id:
+            return None
+        now = time.monotonic()
+        entry = self._docs.get(cam_id)
+        if entry and entry[0] > now:
+            self._docs.move_to_end(cam_id)
+            return entry[1]
+
+        try:
+            doc = await self.mongo.get_camera(cam_id)
+        except MongoLogError:
+            logger.warning("camera config lookup failed camId=%s, using cached value", cam_id)
+            doc = entry[1] if entry else None
+        self._store(cam_id, now + self.ttl_sec, doc)
+        return doc
+
+
+camera_configs = CameraConfigCache(
+    OcrMongoService(), ttl_sec=settings.ROI_CONFIG_TTL_SEC, max_entries=settings.COOLDOWN_MAX_CAMERAS,
+)
+
+
+async def quality_thresholds(cam_id: str | None) -> dict[str, float] | None:
+    """Quality-gate thresholds for this camera (settings + cameras.quality), None = gate off."""
+    doc = await camera_configs.get(cam_id)
+    return merge_thresholds(doc.quality if doc else None)
@@ -0,0 +1,114 @@
+import heapq
+import logging
+import time
+from abc import ABC, abstractmethod
+from app.core import metrics
+from app.core.exceptions import MongoLogError
+from app.services.ocr_mongo_service import OcrMongoService
+
+logger = logging.getLogger("cooldown")
+
+KINDS = ("alarm", "shot")
+
+
+class CooldownBackend(ABC):
+    """Shared cooldown store for several replicas; acquire() must be atomic across them."""
+
+    @abstractmethod
+    async def acquire(self, key: str, cooldown_sec: float) -> bool:
+        """Start the cooldown of `key` unless one is running. True = started (not suppressed)."""
+
+
+class MongoCooldownBackend(CooldownBackend):
+    """Cooldowns in the `cooldowns` collection, expired by a TTL index."""
+
+    def __init__(self, mongo: OcrMongoService):
+        self.mongo = mongo
+
+    async def acquire(self, key: str, cooldown_sec: float) -> bool:
+        return await self.mongo.acquire_cooldown(key, cooldown_sec)
+
+
+class CooldownTable:
+    """
+    Alarm and snapshot cooldowns of every camera in one table:
+    ip -> [last alarm, last snapshot, expiry] (time.monotonic()).
+
+    allow() is a test-and-set with no await between test and set, so no
+    locks are needed. Entries expire `ttl_sec` after their last use, via a
+    heap of expiry times (stale heap entries are skipped when popped). Past
+    `max_entries`, the least recently used camera is dropped even if not
+    expired yet.
+
+    With a `backend`, a camera that passes the local check must also win the
+    shared cooldown, so replicas behind a load balancer throttle together.
+    A failing backend lets the event through (local cooldown only).
+    """
+
+    def __init__(self, ttl_sec: float, max_entries: int = 4096, backend: CooldownBackend | None = None):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max(1, max_entries)
+        self.backend = backend
+        self._slots: dict[str, list[float]] = {}
+        self._expiry: list[tuple[float, str]] = []
+        self.suppressed = {kind: 0 for kind in KINDS}
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _evict(self, now: float) -> None:
+        while self._expiry and (self._expiry[0][0] <= now or len(self._slots) > self.max_entries):
+            expires, ip = heapq.heappop(self._expiry)
+            slot = self._slots.get(ip)
+            if slot is None or slot[2] != expires:
+                # touched again since, a newer heap entry exists
+                continue
+            del self._slots[ip]
+            if expires > now:
+                self.evicted += 1
+        if len(self._expiry) > 2 * len(self._slots) + 64:
+            # mostly stale entries, rebuild
+            self._expiry = [(slot[2], ip) for ip, slot in self._slots.items()]
+            heapq.heapify(self._expiry)
+
+    def hit(self, ip: str, kind: str, cooldown_sec: float) -> bool:
+        """Local check-and-start of `kind`'s cooldown for `ip`. True = allowed."""
+        index = KINDS.index(kind)
+        now = time.monotonic()
+        slot = self._slots.get(ip)
+        if slot is not None and now - slot[index] < cooldown_sec:
+            self.suppressed[kind] += 1
+            metrics.COOLDOWN_SUPPRESSED.labels(kind, "local").inc()
+            return False
+        if slot is None:
+            slot = self._slots[ip] = [float("-inf"), float("-inf"), 0.0]
+        slot[index] = now
+        slot[2] = now + self.ttl_sec
+        heapq.heappush(self._expiry, (slot[2], ip))
+        self._evict(now)
+        return True
+
+    async def allow(self, ip: str, kind: str, cooldown_sec: float) -> bool:
+        if not self.hit(ip, kind, cooldown_sec):
+            return False
+        if self.backend is None:
+            return True
+        try:
+            if await self.backend.acquire(f"{kind}:{ip}", cooldown_sec):
+                return True
+        except MongoLogError:
+            logger.warning("shared cooldown unavailable, local cooldown only ip=%s kind=%s", ip, kind)
+            return True
+        # another replica took it
+        self.suppressed[kind] += 1
+        metrics.COOLDOWN_SUPPRESSED.labels(kind, "shared").inc()
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "cameras": len(self._slots),
+            "suppressed": dict(self.suppressed),
+            "evicted": self.evicted,
+            "shared": self.backend is not None,
+        }
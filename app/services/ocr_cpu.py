@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+from pathlib import Path
+from app.core.config import get_settings
+
+logger = logging.getLogger("ocr_cpu")
+settings = get_settings()
+
+PROFILE_KEYS = ("fuse", "channels_last", "compile", "intra_op_threads", "interop_threads", "affinity")
+
+
+def default_profile() -> dict:
+    return {
+        "fuse": settings.CPU_FUSE,
+        "channels_last": settings.CPU_CHANNELS_LAST,
+        "compile": settings.CPU_COMPILE,
+        "intra_op_threads": settings.CPU_INTRA_OP_THREADS,
+        "interop_threads": settings.CPU_INTEROP_THREADS,
+        "affinity": settings.CPU_AFFINITY,
+    }
+
+
+def load_profile(path: str | None = None) -> dict:
+    """The CPU_* settings, overridden by the autotuned profile file when it exists."""
+    profile = default_profile()
+    path = settings.CPU_PROFILE_PATH if path is None else path
+    if not path or not Path(path).is_file():
+        return profile
+    try:
+        tuned = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring CPU profile %s: %s", path, e)
+        return profile
+    profile.update({k: tuned[k] for k in PROFILE_KEYS if k in tuned})
+    logger.info("⚙️  CPU profile from %s: %s", path, profile)
+    return profile
+
+
+def parse_cpus(spec: str) -> list[int]:
+    """"0-3,8" -> [0, 1, 2, 3, 8]; empty -> []."""
+    cpus: list[int] = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return sorted(set(cpus))
+
+
+def worker_cpus(spec: str, index: int, workers: int) -> list[int]:
+    """Worker `index` of `workers` gets its own equal slice of the CPUs in `spec`."""
+    cpus = parse_cpus(spec)
+    if not cpus or workers <= 1:
+        return cpus
+    per_worker = max(1, len(cpus) // workers)
+    start = (index * per_worker) % len(cpus)
+    return cpus[start:start + per_worker]
+
+
+def apply_threads(profile: dict, cpus: list[int] | None = None) -> dict:
+    """
+    Pin this process to `cpus` (default: the profile's affinity) and size
+    torch's intra/inter-op pools. Process-wide, so call it once, before the
+    models run. intra_op_threads 0 = one thread per pinned CPU, or torch's default.
+    """
+    import torch
+
+    cpus = parse_cpus(profile.get("affinity") or "") if cpus is None else cpus
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    intra = profile.get("intra_op_threads") or len(cpus)
+    if intra:
+        torch.set_num_threads(intra)
+    interop = profile.get("interop_threads")
+    if interop:
+        try:
+            torch.set_num_interop_threads(interop)
+        except RuntimeError:
+            # only settable before the first parallel work in this process
+            logger.warning("inter-op threads already fixed at %d", torch.get_num_interop_threads())
+
+    applied = {
+        "cpus": sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None,
+        "intra_op_threads": torch.get_num_threads(),
+        "interop_threads": torch.get_num_interop_threads(),
+    }
+    logger.info("⚙️  CPU threads: %s", applied)
+    return applied
+
+
+def optimize_model(model, profile: dict) -> list[str]:
+    """
+    Graph-level options for a PyTorch (.pt) model, applied in place: Conv+BN
+    fusion, channels_last weights, torch.compile of the forward pass. Exported
+    engines (onnx / openvino) are optimized by their own runtime and skipped.
+    Returns the options applied.
+    """
+    import torch
+
+    net = getattr(model, "model", None)
+    if not isinstance(net, torch.nn.Module):
+        return []
+
+    applied = []
+    net.eval()
+    if profile.get("fuse"):
+        # ultralytics fuses on the first predict too; doing it here keeps it out of warm-up / compile
+        model.fuse()
+        applied.append("fuse")
+    if profile.get("channels_last"):
+        net.to(memory_format=torch.channels_last)
+        applied.append("channels_last")
+    if profile.get("compile"):
+        # compiled lazily on the first forward (the warm-up); dynamic for the batchers' varying sizes
+        net.forward = torch.compile(net.forward, dynamic=True)
+        applied.append("compile")
+    return applied
@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("ocr_crop_cache")
+
+
+def dhash(img: np.ndarray) -> int:
+    """64-bit difference hash of a BGR/gray crop (robust to small light and JPEG changes)."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class PlateCropCache:
+    """
+    Per-camera cache of recent plate readings, keyed by a perceptual hash of the
+    crop plus the box position. A stopped car producing alarm after alarm hits the
+    cache and skips the OCR model.
+
+    Each camera holds at most `max_per_camera` entries (LRU), entries expire after
+    `ttl_sec`, and at most `max_cameras` cameras are tracked (LRU).
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float = 10.0,
+        max_per_camera: int = 8,
+        max_cameras: int = 256,
+        max_hash_distance: int = 6,
+        max_shift: float = 0.02,
+    ):
+        self.ttl_sec = ttl_sec
+        self.max_per_camera = max_per_camera
+        self.max_cameras = max_cameras
+        self.max_hash_distance = max_hash_distance
+        self.max_shift = max_shift
+
+        # camId -> OrderedDict[entry_id -> (expires_at, hash, box, reading)]
+        self._cameras: OrderedDict[str, OrderedDict[int, tuple]] = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def box_geometry(xyxy, width: int, height: int) -> tuple[float, float, float, float]:
+        """Box as (cx, cy, w, h) relative to the image it was cut from."""
+        x1, y1, x2, y2 = map(float, xyxy)
+        return ((x1 + x2) / 2 / width, (y1 + y2) / 2 / height, (x2 - x1) / width, (y2 - y1) / height)
+
+    def _same_box(self, a: tuple, b: tuple) -> bool:
+        return all(abs(p - q) <= self.max_shift for p, q in zip(a, b))
+
+    def get(self, cam_id: str, crop_hash: int, box: tuple) -> dict | None:
+        now = time.monotonic()
+        with self._lock:
+            entries = self._cameras.get(cam_id)
+            if entries:
+                for entry_id, (expires_at, h, b, reading) in list(entries.items()):
+                    if expires_at <= now:
+                        del entries[entry_id]
+                        self.evictions += 1
+                        continue
+                    if (h ^ crop_hash).bit_count() <= self.max_hash_distance and self._same_box(b, box):
+                        entries.move_to_end(entry_id)
+                        self._cameras.move_to_end(cam_id)
+                        self.hits += 1
+                        return reading
+            self.misses += 1
+            return None
+
+    def put(self, cam_id: str, crop_hash: int, box: tuple, reading: dict) -> None:
+        with self._lock:
+            entries = self._cameras.get(cam_id)
+            if entries is None:
+                entries = self._cameras[cam_id] = OrderedDict()
+                while len(self._cameras) > self.max_cameras:
+                    _, dropped = self._cameras.popitem(last=False)
+                    self.evictions += len(dropped)
+            self._cameras.move_to_end(cam_id)
+
+            entries[self._next_id] = (time.monotonic() + self.ttl_sec, crop_hash, box, reading)
+            self._next_id += 1
+            while len(entries) > self.max_per_camera:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "cameras": len(self._cameras),
+                "entries": sum(len(e) for e in self._cameras.values()),
+            }
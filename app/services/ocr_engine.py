@@ -0,0 +1,159 @@
+import logging
+import tempfile
+from pathlib import Path
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from app.utils.image import letterbox
+
+logger = logging.getLogger("ocr_engine")
+
+# settings.MODEL -> ultralytics export format ("yolo" is the original PyTorch .pt)
+ENGINES = {
+    "yolo": None,
+    "onnx": "onnx",
+    "openvino": "openvino",
+}
+PRECISIONS = ("fp32", "int8")
+
+
+def check_engine(engine: str) -> str:
+    engine = engine.lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown inference engine '{engine}' (expected one of {', '.join(ENGINES)})")
+    return engine
+
+
+def check_precision(engine: str, precision: str) -> str:
+    precision = precision.lower()
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown model precision '{precision}' (expected one of {', '.join(PRECISIONS)})")
+    if precision == "int8" and engine == "yolo":
+        raise ValueError("int8 precision needs MODEL=onnx or MODEL=openvino")
+    return precision
+
+
+def artifact_path(pt_path: str, engine: str, precision: str = "fp32") -> str:
+    """
+    Where the exported model for `engine` lives, next to the .pt weights.
+    Follows ultralytics' own export naming so `YOLO.export()` output can be used as-is.
+    """
+    engine = check_engine(engine)
+    precision = check_precision(engine, precision)
+    p = Path(pt_path)
+    suffix = "_int8" if precision == "int8" else ""
+    if engine == "onnx":
+        return str(p.with_name(f"{p.stem}{suffix}.onnx"))
+    if engine == "openvino":
+        return str(p.with_name(f"{p.stem}{suffix}_openvino_model"))
+    return str(p)
+
+
+def load_model(pt_path: str, engine: str, precision: str = "fp32") -> YOLO:
+    path = artifact_path(pt_path, engine, precision)
+    if not Path(path).exists():
+        tool = "quantize_models" if precision == "int8" else "export_models"
+        raise FileNotFoundError(
+            f"{engine}/{precision} model not found at {path} (run `python -m app.tools.{tool} --engine {engine}`)"
+        )
+    logger.info("Loading %s/%s model: %s", engine, precision, path)
+    # exported formats carry no task metadata we can rely on
+    return YOLO(path, task="detect")
+
+
+def export_model(pt_path: str, engine: str, imgsz: int | tuple[int, int]) -> str:
+    """Export `pt_path` to `engine` format and return the artifact path."""
+    engine = check_engine(engine)
+    if engine == "yolo":
+        return pt_path
+
+    model = YOLO(pt_path)
+    # dynamic batch so the micro-batchers can send more than one image
+    out = model.export(format=ENGINES[engine], imgsz=imgsz, dynamic=True, half=False)
+    logger.info("Exported %s -> %s", pt_path, out)
+    return str(out)
+
+
+def _calibration_images(calib_dir: str) -> list[Path]:
+    exts = {".jpg", ".jpeg", ".png", ".bmp"}
+    images = sorted(p for p in Path(calib_dir).rglob("*") if p.suffix.lower() in exts)
+    if not images:
+        raise FileNotFoundError(f"No calibration images found in {calib_dir}")
+    return images
+
+
+def _quantize_onnx(pt_path: str, calib_dir: str, imgsz: int | tuple[int, int]) -> str:
+    # optional deps, only needed on the box that produces the artifacts
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    fp32_path = artifact_path(pt_path, "onnx")
+    if not Path(fp32_path).exists():
+        export_model(pt_path, "onnx", imgsz)
+    out_path = artifact_path(pt_path, "onnx", "int8")
+
+    input_name = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    images = _calibration_images(calib_dir)
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(images)
+
+        def get_next(self):
+            for path in self._it:
+                img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+                if img is None:
+                    continue
+                # same input as ultralytics AutoBackend: RGB, CHW, 0..1
+                blob = letterbox(img, imgsz)[0][:, :, ::-1].transpose(2, 0, 1)
+                blob = np.ascontiguousarray(blob, dtype=np.float32)[None] / 255.0
+                return {input_name: blob}
+            return None
+
+    quantize_static(
+        fp32_path,
+        out_path,
+        _Reader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+
+    # keep ultralytics metadata (names, stride, imgsz) so YOLO() can load the int8 file
+    src = onnx.load(fp32_path)
+    dst = onnx.load(out_path)
+    del dst.metadata_props[:]
+    dst.metadata_props.extend(src.metadata_props)
+    onnx.save(dst, out_path)
+    return out_path
+
+
+def _quantize_openvino(pt_path: str, calib_dir: str, imgsz: int | tuple[int, int]) -> str:
+    model = YOLO(pt_path)
+    names = "\n".join(f"  {i}: '{n}'" for i, n in model.names.items())
+    with tempfile.TemporaryDirectory() as tmp:
+        # ultralytics/NNCF calibrate from a dataset yaml; labels are not needed
+        data_yaml = Path(tmp) / "calib.yaml"
+        data_yaml.write_text(
+            f"path: {Path(calib_dir).resolve()}\ntrain: .\nval: .\nnames:\n{names}\n",
+            encoding="utf-8",
+        )
+        out = model.export(format="openvino", int8=True, data=str(data_yaml), imgsz=imgsz, dynamic=True)
+    return str(out)
+
+
+def quantize_model(pt_path: str, engine: str, calib_dir: str, imgsz: int | tuple[int, int]) -> str:
+    """
+    Build the INT8 artifact for `engine`, statically calibrated on the images in `calib_dir`.
+    Returns the artifact path (same as artifact_path(pt_path, engine, "int8")).
+    """
+    engine = check_engine(engine)
+    check_precision(engine, "int8")
+    if engine == "onnx":
+        out = _quantize_onnx(pt_path, calib_dir, imgsz)
+    else:
+        out = _quantize_openvino(pt_path, calib_dir, imgsz)
+    logger.info("Quantized %s -> %s (calibration: %s)", pt_path, out, calib_dir)
+    return out
@@ -0,0 +1,315 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import sqlite3
+import time
+from typing import Awaitable, Callable
+from app.core import metrics
+
+logger = logging.getLogger("event_queue")
+
+EventHandler = Callable[[dict], Awaitable[None]]
+
+
+class EventJournal:
+    """
+    SQLite file holding every accepted event until it has been processed.
+    `loaded` = 0 rows are spilled: accepted while the in-memory queue was full.
+    Synchronous and called from the event loop; rows are tiny and the file is local.
+    """
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY, ip TEXT, mac TEXT, event_ts REAL, priority INTEGER,"
+            " queued_at REAL, loaded INTEGER NOT NULL DEFAULT 0)"
+        )
+
+    def add(self, event: dict, loaded: bool) -> int:
+        cur = self.db.execute(
+            "INSERT INTO events (ip, mac, event_ts, priority, queued_at, loaded) VALUES (?, ?, ?, ?, ?, ?)",
+            (event["ip"], event["mac"], event["event_ts"], event["priority"], event["queued_at"], int(loaded)),
+        )
+        return cur.lastrowid
+
+    def remove(self, event_id: int) -> None:
+        self.db.execute("DELETE FROM events WHERE id = ?", (event_id,))
+
+    def unload(self, event_id: int) -> None:
+        """Send a queued event back to disk, to make room for a more urgent one."""
+        self.db.execute("UPDATE events SET loaded = 0 WHERE id = ?", (event_id,))
+
+    def unload_all(self) -> None:
+        """At startup everything in the file is waiting on disk."""
+        self.db.execute("UPDATE events SET loaded = 0")
+
+    def take(self, n: int) -> list[dict]:
+        """Load the `n` most urgent spilled events."""
+        rows = self.db.execute(
+            "SELECT id, ip, mac, event_ts, priority, queued_at FROM events WHERE loaded = 0"
+            " ORDER BY priority, id LIMIT ?",
+            (n,),
+        ).fetchall()
+        self.db.executemany("UPDATE events SET loaded = 1 WHERE id = ?", [(row[0],) for row in rows])
+        keys = ("id", "ip", "mac", "event_ts", "priority", "queued_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def spilled(self) -> list[dict]:
+        """Every spilled event, without loading it."""
+        rows = self.db.execute(
+            "SELECT id, ip, mac, event_ts, priority, queued_at FROM events WHERE loaded = 0"
+        ).fetchall()
+        keys = ("id", "ip", "mac", "event_ts", "priority", "queued_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class EventQueue:
+    """
+    Bounded priority queue of camera events, worked by `workers` tasks.
+
+    put() never blocks the webhook. An event is dropped when
+      duplicate  the same camera already has a queued event within `dedup_window_sec`
+      full       `max_size` events are queued and none has a lower priority
+                 (otherwise the lowest-priority queued event is dropped instead)
+      draining   stop() has been called
+    With a journal, a full queue spills to disk (up to `journal_max`) instead:
+    the new event, or the lowest-priority queued event if the new one is more
+    urgent. Spilled events count for dedup like queued ones. Every event stays
+    in the file until processed, so a restart replays what was queued or
+    running. Replayed events older than `max_age_sec` are dropped as "expired".
+
+    Lower priority numbers run first; equal priorities in arrival order.
+    """
+
+    def __init__(
+        self,
+        handler: EventHandler,
+        workers: int = 4,
+        max_size: int = 64,
+        dedup_window_sec: float = 2.0,
+        journal_path: str | None = None,
+        journal_max: int = 10000,
+        max_age_sec: float = 30.0,
+    ):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_size = max(1, max_size)
+        self.dedup_window_sec = dedup_window_sec
+        self.journal_max = journal_max
+        self.max_age_sec = max_age_sec
+        self.journal = EventJournal(journal_path) if journal_path else None
+
+        self._heap: list[tuple[int, int, dict]] = []
+        self._seq = itertools.count()
+        # camera -> its queued or spilled (not yet started) events, for dedup
+        self._pending: dict[str, list[dict]] = {}
+        self._spilled = 0
+        self._running = 0
+        self._has_work = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks: list[asyncio.Task] = []
+        self._draining = False
+
+        self.accepted = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    @property
+    def spilled(self) -> int:
+        return self._spilled
+
+    def oldest_age(self) -> float:
+        if not self._heap:
+            return 0.0
+        return time.time() - min(event["queued_at"] for _, _, event in self._heap)
+
+    # ---- producer side ----
+
+    def _drop(self, reason: str, event: dict) -> None:
+        self.dropped[reason] = self.dropped.get(reason, 0) + 1
+        metrics.EVENT_QUEUE_DROPPED.labels(reason).inc()
+        logger.warning("EVENT DROP %s ip=%s mac=%s", reason, event["ip"], event["mac"])
+
+    def _pend(self, event: dict) -> None:
+        self._pending.setdefault(event["mac"] or event["ip"], []).append(event)
+        self._idle.clear()
+
+    def _push(self, event: dict) -> None:
+        heapq.heappush(self._heap, (event["priority"], next(self._seq), event))
+        self._pend(event)
+
+    def _unpend(self, event: dict) -> None:
+        """Forget `event` for dedup; a spilled event reloaded from the journal is matched by id."""
+        key = event["mac"] or event["ip"]
+        pending = self._pending.get(key, [])
+        for i, queued in enumerate(pending):
+            if queued is event or (event["id"] is not None and queued["id"] == event["id"]):
+                del pending[i]
+                break
+        if not pending:
+            self._pending.pop(key, None)
+
+    def _spill(self, event: dict) -> None:
+        event["id"] = self.journal.add(event, loaded=False)
+        self._spilled += 1
+        self._pend(event)
+
+    def _is_duplicate(self, event: dict) -> bool:
+        return any(
+            abs(queued["event_ts"] - event["event_ts"]) <= self.dedup_window_sec
+            for queued in self._pending.get(event["mac"] or event["ip"], ())
+        )
+
+    def put(self, ip: str, mac: str | None, event_ts: float, priority: int) -> bool:
+        """Queue an alarm of camera `ip` / `mac`. False = dropped (see class docstring)."""
+        event = {"id": None, "ip": ip, "mac": mac, "event_ts": event_ts, "priority": priority, "queued_at": time.time()}
+        if self._draining:
+            self._drop("draining", event)
+            return False
+        if self._is_duplicate(event):
+            self._drop("duplicate", event)
+            return False
+
+        if len(self._heap) >= self.max_size:
+            # the newest of the lowest-priority events
+            worst = max(self._heap, key=lambda entry: (entry[0], entry[1]))
+            if self.journal is not None and self._spilled < self.journal_max:
+                if worst[0] <= priority:
+                    self._spill(event)
+                    self.accepted += 1
+                    return True
+                # the new event is more urgent: the worst queued one waits on disk instead
+                self._heap.remove(worst)
+                heapq.heapify(self._heap)
+                self.journal.unload(worst[2]["id"])
+                self._spilled += 1
+            elif worst[0] <= priority:
+                self._drop("full", event)
+                return False
+            else:
+                # make room: drop the worst queued event
+                self._heap.remove(worst)
+                heapq.heapify(self._heap)
+                self._unpend(worst[2])
+                self._finish(worst[2])
+                self._drop("full", worst[2])
+
+        if self.journal is not None:
+            event["id"] = self.journal.add(event, loaded=True)
+        self._push(event)
+        self.accepted += 1
+        self._has_work.set()
+        return True
+
+    # ---- consumer side ----
+
+    def _refill(self) -> None:
+        """Move spilled events from the journal back into memory as room frees up."""
+        if self.journal is None or not self._spilled or len(self._heap) >= self.max_size:
+            return
+        for event in self.journal.take(self.max_size - len(self._heap)):
+            self._spilled -= 1
+            # replaces its spilled twin in _pending
+            self._unpend(event)
+            self._push(event)
+
+    def _finish(self, event: dict) -> None:
+        if self.journal is not None and event.get("id") is not None:
+            self.journal.remove(event["id"])
+
+    def _check_idle(self) -> None:
+        if not self._heap and not self._running and not self._spilled:
+            self._idle.set()
+
+    async def _next(self) -> dict:
+        while True:
+            self._refill()
+            if self._heap:
+                _, _, event = heapq.heappop(self._heap)
+                self._unpend(event)
+                return event
+            self._check_idle()
+            self._has_work.clear()
+            await self._has_work.wait()
+
+    async def _worker(self) -> None:
+        while True:
+            event = await self._next()
+            age = time.time() - event["queued_at"]
+            if age > self.max_age_sec:
+                self._finish(event)
+                self._drop("expired", event)
+                self._check_idle()
+                continue
+            metrics.EVENT_QUEUE_WAIT_SECONDS.observe(age)
+            self._running += 1
+            try:
+                await self.handler(event)
+                self.processed += 1
+            except asyncio.CancelledError:
+                # shutdown deadline: the journal row stays and is replayed next start
+                raise
+            except Exception:
+                self.failed += 1
+                logger.exception("camera event failed ip=%s mac=%s", event["ip"], event["mac"])
+            finally:
+                self._running -= 1
+            self._finish(event)
+            self._check_idle()
+
+    def start(self) -> None:
+        if self.journal is not None:
+            self.journal.unload_all()
+            spilled = self.journal.spilled()
+            for event in spilled:
+                self._pend(event)
+            self._spilled = len(spilled)
+            if self._spilled:
+                logger.info("📥 Replaying %d journaled camera events", self._spilled)
+                self._refill()
+        self._tasks = [asyncio.create_task(self._worker(), name=f"camera-event-{i}") for i in range(self.workers)]
+        logger.info("✅ Camera event queue started: %d workers, max %d queued", self.workers, self.max_size)
+
+    async def stop(self, timeout: float) -> None:
+        """Stop taking events, finish the queued ones for at most `timeout` seconds, then cancel the rest."""
+        self._draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            left = len(self._heap) + self._running + self._spilled
+            if self.journal is not None:
+                logger.warning("drain deadline hit, %d camera events kept in the journal", left)
+            else:
+                logger.warning("drain deadline hit, %d camera events dropped", left)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.journal is not None:
+            self.journal.close()
+        logger.info("Camera event queue stopped")
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": len(self._heap),
+            "spilled": self._spilled,
+            "running": self._running,
+            "oldest_age_s": round(self.oldest_age(), 3),
+            "accepted": self.accepted,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": dict(self.dropped),
+        }
@@ -0,0 +1,202 @@
+import asyncio
+import functools
+import logging
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+from app.core import metrics
+from app.core.exceptions import OverloadedError
+
+logger = logging.getLogger("ocr_executor")
+
+POLICIES = ("reject", "drop_oldest", "block")
+
+
+class EventDroppedError(OverloadedError):
+    """A queued camera event was dropped to make room for a newer one (drop_oldest)."""
+    code = "EVENT_DROPPED"
+
+
+class InferenceExecutor:
+    """
+    Dedicated threads for inference with admission control.
+
+    At most `workers` jobs run at once and at most `queue_depth` wait. When the
+    queue is full, `policy` decides:
+      reject      the new job fails with OverloadedError (503 + Retry-After)
+      drop_oldest the oldest queued camera event fails with EventDroppedError
+                  and the new job takes its place (requests are never dropped;
+                  with no camera event queued the new job is rejected)
+      block       the new job waits anyway, for at most `block_timeout_sec`
+
+    A slot is held until the job itself finishes, not until its caller stops
+    waiting: a cancelled request (client gone, timeout) whose job already
+    runs keeps counting against `workers`.
+
+    All bookkeeping happens on the event loop, so no locks are needed.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        queue_depth: int = 32,
+        policy: str = "reject",
+        retry_after_sec: int = 2,
+        block_timeout_sec: float = 10.0,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown admission policy {policy!r}, expected one of {POLICIES}")
+        self.workers = max(1, workers)
+        self.queue_depth = max(0, queue_depth)
+        self.policy = policy
+        self.retry_after_sec = retry_after_sec
+        self.block_timeout_sec = block_timeout_sec
+        self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+
+        self._running = 0
+        # (future resolved when a slot is handed over, kind)
+        self._waiting: deque[tuple[asyncio.Future, str]] = deque()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.completed = 0
+        self._waits_ms: deque[float] = deque(maxlen=1024)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    def check_admission(self) -> None:
+        """Fail fast (before reading a request body) when a new job would be rejected anyway."""
+        if self.policy == "reject" and self._running >= self.workers and len(self._waiting) >= self.queue_depth:
+            self.rejected += 1
+            metrics.INFERENCE_REJECTED.labels("queue_full").inc()
+            raise self._overloaded()
+
+    def _overloaded(self) -> OverloadedError:
+        return OverloadedError(
+            "Inference queue is full, retry later",
+            retry_after=self.retry_after_sec,
+            extra={"running": self._running, "queued": len(self._waiting)},
+        )
+
+    def _drop_oldest_camera_event(self) -> bool:
+        for entry in self._waiting:
+            waiter, kind = entry
+            if kind == "camera" and not waiter.done():
+                self._waiting.remove(entry)
+                waiter.set_exception(EventDroppedError("Dropped for a newer event", retry_after=self.retry_after_sec))
+                self.dropped += 1
+                metrics.INFERENCE_REJECTED.labels("dropped").inc()
+                return True
+        return False
+
+    async def _acquire(self, kind: str) -> None:
+        if self._running < self.workers and not self._waiting:
+            self._running += 1
+            return
+
+        timeout = None
+        if len(self._waiting) >= self.queue_depth:
+            if self.policy == "block":
+                timeout = self.block_timeout_sec
+            elif self.policy != "drop_oldest" or not self._drop_oldest_camera_event():
+                self.rejected += 1
+                metrics.INFERENCE_REJECTED.labels("queue_full").inc()
+                raise self._overloaded()
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (waiter, kind)
+        self._waiting.append(entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._waiting.remove(entry)
+                waiter.cancel()
+                self.rejected += 1
+                metrics.INFERENCE_REJECTED.labels("block_timeout").inc()
+                raise self._overloaded()
+            # the slot arrived together with the timeout, keep it
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # a slot was handed to us, pass it on
+                self._release()
+            elif entry in self._waiting:
+                self._waiting.remove(entry)
+            waiter.cancel()
+            raise
+
+    def _release(self) -> None:
+        while self._waiting:
+            waiter, _ = self._waiting.popleft()
+            if not waiter.done():
+                # the running count stays, the slot changes hands
+                waiter.set_result(None)
+                return
+        self._running -= 1
+
+    def _done(self) -> None:
+        self.completed += 1
+        self._release()
+
+    async def submit(self, start: Callable[[], Future], kind: str = "request") -> Any:
+        """
+        Once admitted, call `start()` to submit the job (thread, worker process)
+        and await its result. kind is "request" or "camera".
+        """
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        await self._acquire(kind)
+        waited = time.perf_counter() - t0
+        self._waits_ms.append(waited * 1000)
+        metrics.INFERENCE_WAIT_SECONDS.observe(waited)
+        self.admitted += 1
+        try:
+            fut = start()
+        except BaseException:
+            self._done()
+            raise
+
+        def _finished(_: Future) -> None:
+            try:
+                loop.call_soon_threadsafe(self._done)
+            except RuntimeError:
+                # loop already closed at shutdown
+                pass
+
+        # cancelling the await cancels a job that has not started yet; a running one keeps its slot
+        fut.add_done_callback(_finished)
+        return await asyncio.wrap_future(fut)
+
+    async def run(self, fn: Callable[..., Any], *args, kind: str = "request", **kwargs) -> Any:
+        """fn(*args, **kwargs) on an inference thread, once admitted."""
+        return await self.submit(lambda: self._threads.submit(functools.partial(fn, *args, **kwargs)), kind)
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits_ms)
+
+        def pct(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 2) if waits else 0.0
+
+        return {
+            "policy": self.policy,
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "running": self._running,
+            "queued": len(self._waiting),
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "wait_ms": {"p50": pct(0.50), "p95": pct(0.95), "max": round(waits[-1], 2) if waits else 0.0},
+        }
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+import httpx
+from app.core import metrics
+from app.core.config import get_settings
+from app.services.ocr_camera_auth import CameraAuthCache
+
+logger = logging.getLogger("ocr_frames")
+settings = get_settings()
+
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+_CONTENT_LENGTH = re.compile(rb"content-length:\s*(\d+)", re.IGNORECASE)
+
+
+class FrameRing:
+    """The last `size` frames of one camera as (wall-clock time, JPEG bytes), oldest first."""
+
+    def __init__(self, size: int = 8):
+        self._frames: deque[tuple[float, bytes]] = deque(maxlen=max(1, size))
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def push(self, ts: float, jpeg: bytes) -> None:
+        self._frames.append((ts, jpeg))
+
+    def latest(self) -> tuple[float, bytes] | None:
+        return self._frames[-1] if self._frames else None
+
+    def closest(self, ts: float) -> tuple[float, bytes] | None:
+        if not self._frames:
+            return None
+        return min(self._frames, key=lambda frame: abs(frame[0] - ts))
+
+    def after(self, ts: float, n: int) -> list[tuple[float, bytes]]:
+        """Up to `n` frames taken after `ts`."""
+        return [frame for frame in self._frames if frame[0] > ts][:n]
+
+
+class MjpegParser:
+    """
+    Splits a multipart/x-mixed-replace (MJPEG) byte stream into JPEG frames.
+    A part's Content-Length is used when the camera sends one; otherwise the
+    frame is cut at the JPEG end marker. Boundaries and other part headers,
+    whatever the camera calls them, are skipped.
+    """
+
+    def __init__(self, max_frame_bytes: int = 8 * 2**20):
+        self.max_frame_bytes = max_frame_bytes
+        self._buf = bytearray()
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        self._buf += chunk
+        frames = []
+        while True:
+            start = self._buf.find(SOI)
+            if start < 0:
+                # part headers so far (and maybe the first half of a marker)
+                del self._buf[:-4096]
+                return frames
+            match = _CONTENT_LENGTH.search(self._buf, 0, start)
+            if match:
+                end = start + int(match.group(1))
+                if len(self._buf) < end:
+                    return frames
+            else:
+                # frames with an EXIF thumbnail need the Content-Length path
+                end = self._buf.find(EOI, start + 2)
+                if end < 0:
+                    if len(self._buf) - start > self.max_frame_bytes:
+                        logger.warning("MJPEG frame over %d bytes, resyncing", self.max_frame_bytes)
+                        self._buf.clear()
+                    return frames
+                end += 2
+            frames.append(bytes(self._buf[start:end]))
+            del self._buf[:end]
+
+
+class CameraStream:
+    """
+    Keeps one camera's recent frames in a FrameRing, from a persistent
+    MJPEG stream ("mjpeg") or a snapshot polling loop ("poll"), reconnecting
+    with backoff until stop().
+    """
+
+    def __init__(
+        self,
+        ip: str,
+        client: httpx.AsyncClient,
+        auth: CameraAuthCache,
+        mode: str = "mjpeg",
+        ring_size: int = 8,
+        poll_interval_ms: float = 200,
+    ):
+        if mode not in ("mjpeg", "poll"):
+            raise ValueError(f"Unknown frame source mode {mode!r}, expected 'mjpeg' or 'poll'")
+        self.ip = ip
+        self.client = client
+        self.auth = auth
+        self.mode = mode
+        self.poll_interval_ms = poll_interval_ms
+        self.ring = FrameRing(ring_size)
+        self.last_used = time.monotonic()
+        self.frames = 0
+        self.errors = 0
+        self._new_frame = asyncio.Condition()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name=f"frames-{self.ip}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _push(self, jpeg: bytes) -> None:
+        self.ring.push(time.time(), jpeg)
+        self.frames += 1
+        async with self._new_frame:
+            self._new_frame.notify_all()
+
+    async def _run(self) -> None:
+        backoff = 0.5
+        while True:
+            try:
+                if self.mode == "mjpeg":
+                    await self._read_mjpeg()
+                else:
+                    await self._poll()
+                backoff = 0.5
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                metrics.FRAME_STREAM_ERRORS.labels(self.mode).inc()
+                logger.warning("frame stream %s ip=%s failed: %s (retry in %.1fs)", self.mode, self.ip, e, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def _read_mjpeg(self) -> None:
+        url = f"http://{self.ip}{settings.FRAME_STREAM_PATH}"
+        parser = MjpegParser()
+        # no read timeout on the open stream, a stalled camera shows up as a stale ring
+        timeout = httpx.Timeout(connect=3.0, read=None, write=6.0, pool=6.0)
+        async with self.client.stream("GET", url, auth=self.auth.get(self.ip), timeout=timeout) as r:
+            r.raise_for_status()
+            logger.info("📹 MJPEG stream open ip=%s", self.ip)
+            async for chunk in r.aiter_bytes():
+                for jpeg in parser.feed(chunk):
+                    await self._push(jpeg)
+        raise ConnectionError("stream closed by camera")
+
+    async def _poll(self) -> None:
+        url = f"http://{self.ip}/ISAPI/Streaming/channels/101/picture"
+        while True:
+            t0 = time.perf_counter()
+            r = await self.client.get(url, auth=self.auth.get(self.ip))
+            if r.status_code == 200:
+                await self._push(r.content)
+            elif r.status_code != 503:
+                # 503 = camera busy, just try again next tick
+                r.raise_for_status()
+            await asyncio.sleep(max(0.0, self.poll_interval_ms / 1000 - (time.perf_counter() - t0)))
+
+    def frame_at(self, ts: float, max_age_ms: float) -> tuple[float, bytes] | None:
+        """The ring frame closest to `ts`, if one is within `max_age_ms` of it."""
+        self.last_used = time.monotonic()
+        frame = self.ring.closest(ts)
+        if frame is None or abs(frame[0] - ts) * 1000 > max_age_ms:
+            return None
+        metrics.FRAME_OFFSET_SECONDS.observe(abs(frame[0] - ts))
+        return frame
+
+    async def frames_after(self, ts: float, n: int, timeout: float) -> list[bytes]:
+        """Up to `n` frames taken after `ts`, waiting at most `timeout` seconds for them to arrive."""
+        deadline = time.monotonic() + timeout
+        async with self._new_frame:
+            while len(self.ring.after(ts, n)) < n:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._new_frame.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+        return [jpeg for _, jpeg in self.ring.after(ts, n)]
+
+    def stats(self) -> dict:
+        latest = self.ring.latest()
+        return {
+            "mode": self.mode,
+            "running": self.running,
+            "frames": self.frames,
+            "errors": self.errors,
+            "buffered": len(self.ring),
+            "latest_age_ms": round((time.time() - latest[0]) * 1000, 1) if latest else None,
+        }
+
+
+class FrameSourceManager:
+    """
+    One CameraStream per camera ip, started on the camera's first alarm (alarms
+    are how cameras are discovered) and stopped after FRAME_IDLE_SEC without one.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, auth: CameraAuthCache, mode: str = "mjpeg"):
+        self.client = client
+        self.auth = auth
+        self.mode = mode
+        self.streams: dict[str, CameraStream] = {}
+
+    def stream(self, ip: str) -> CameraStream:
+        stream = self.streams.get(ip)
+        if stream is None:
+            stream = CameraStream(
+                ip, self.client, self.auth, self.mode,
+                ring_size=settings.FRAME_RING_SIZE,
+                poll_interval_ms=settings.FRAME_POLL_INTERVAL_MS,
+            )
+            self.streams[ip] = stream
+        stream.start()
+        return stream
+
+    async def frames(self, ip: str, event_ts: float, count: int = 1) -> list[bytes]:
+        """
+        The buffered frame closest to `event_ts` plus the next `count`-1 frames
+        (BURST_INTERVAL_MS apart at most). Empty when the ring has nothing close
+        enough, e.g. right after the stream was started; the caller then falls
+        back to a snapshot.
+        """
+        stream = self.stream(ip)
+        first = stream.frame_at(event_ts, settings.FRAME_MAX_AGE_MS)
+        if first is None:
+            return []
+        if count <= 1:
+            return [first[1]]
+        more = await stream.frames_after(first[0], count - 1, (count - 1) * settings.BURST_INTERVAL_MS / 1000)
+        return [first[1], *more]
+
+    async def prune(self) -> None:
+        idle = [ip for ip, s in self.streams.items() if time.monotonic() - s.last_used > settings.FRAME_IDLE_SEC]
+        for ip in idle:
+            logger.info("📹 frame stream idle, stopping ip=%s", ip)
+            await self.streams.pop(ip).stop()
+
+    async def close(self) -> None:
+        for stream in self.streams.values():
+            await stream.stop()
+        self.streams.clear()
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "cameras": {ip: s.stats() for ip, s in self.streams.items()}}
@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+from app.core.config import get_settings
+
+settings = get_settings()
+
+FORMATS = {
+    "jpg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+    "png": (".png", "image/png", None),
+}
+
+# frames bigger than this are encoded before crossing a process boundary
+_PICKLE_RAW_MAX_BYTES = 1 << 20
+
+
+def is_jpeg(data: bytes | memoryview) -> bool:
+    return len(data) > 3 and data[0] == 0xFF and data[1] == 0xD8
+
+
+class LazyImage:
+    """
+    Image handle returned by OCRService.predict.
+
+    Either wraps encoded bytes that can be uploaded as-is (the source JPEG when
+    no transform was applied), or an ndarray that is only encoded when
+    `encode()` is called, i.e. when an upload actually happens.
+    """
+
+    __slots__ = ("_array", "_data", "_from_source", "fmt", "quality")
+
+    def __init__(self, array: np.ndarray | None = None, data: bytes | memoryview | None = None,
+                 fmt: str | None = None, quality: int | None = None, from_source: bool = False):
+        self._array = array
+        self._data = data
+        self._from_source = from_source
+        self.fmt = fmt or settings.IMG_ENCODE_FORMAT
+        self.quality = quality or settings.IMG_ENCODE_QUALITY
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> "LazyImage":
+        return cls(array=array)
+
+    @classmethod
+    def from_source(cls, data: bytes | memoryview) -> "LazyImage":
+        """The request's own JPEG bytes, kept by reference (no decode, no re-encode)."""
+        return cls(data=data, fmt="jpg", from_source=True)
+
+    @property
+    def ext(self) -> str:
+        return FORMATS[self.fmt][0]
+
+    @property
+    def content_type(self) -> str:
+        return FORMATS[self.fmt][1]
+
+    @property
+    def is_encoded(self) -> bool:
+        return self._data is not None
+
+    @property
+    def needs_source(self) -> bool:
+        """Source-backed handle that lost its bytes crossing a process boundary."""
+        return self._from_source and self._data is None
+
+    def attach_source(self, data: bytes | memoryview) -> None:
+        self._data = data
+
+    def encode(self) -> bytes:
+        if self._data is None:
+            if self._array is None:
+                return b""
+            _, _, quality_flag = FORMATS[self.fmt]
+            params = [quality_flag, int(self.quality)] if quality_flag is not None else []
+            ok, buf = cv2.imencode(self.ext, self._array, params)
+            self._data = buf.tobytes() if ok else b""
+            # the frame is no longer needed once encoded
+            self._array = None
+        elif not isinstance(self._data, bytes):
+            # memoryview / shared buffer -> own copy for the uploader
+            self._data = bytes(self._data)
+        return self._data
+
+    def __getstate__(self):
+        data, array = self._data, self._array
+        if self._from_source:
+            # the caller still has the source bytes; don't ship them back (see attach_sources)
+            data = None
+        elif data is None and array is not None and array.nbytes > _PICKLE_RAW_MAX_BYTES:
+            data, array = self.encode(), None
+        elif data is not None and not isinstance(data, bytes):
+            data = bytes(data)
+        return (array, data, self._from_source, self.fmt, self.quality)
+
+    def __setstate__(self, state):
+        self._array, self._data, self._from_source, self.fmt, self.quality = state
+
+
+def attach_sources(result: dict, source: bytes | memoryview) -> dict:
+    """Give source-backed handles in a worker result their bytes back."""
+    for value in result.values():
+        if isinstance(value, LazyImage) and value.needs_source:
+            value.attach_source(source)
+    return result
@@ -0,0 +1,95 @@
+import logging
+import time
+from fastapi.concurrency import run_in_threadpool
+from app.core import metrics
+from app.core.config import get_settings
+from app.core.exceptions import BusinessLogicError
+from app.services.ocr_service import OCRService
+from app.services.ocr_cpu import apply_threads, load_profile
+from app.services.ocr_models import model_registry
+from app.services.ocr_executor import InferenceExecutor
+from app.services.ocr_pool import InferencePool
+from app.services.ocr_images import attach_sources
+
+logger = logging.getLogger("ocr_inference")
+settings = get_settings()
+
+# process pool, only when INFERENCE_WORKERS > 0 (set up in lifespan)
+pool: InferencePool | None = None
+
+# admission control in front of both paths; its threads run in-process inference
+executor = InferenceExecutor(
+    workers=settings.INFERENCE_THREADS,
+    queue_depth=settings.INFERENCE_QUEUE_DEPTH,
+    policy=settings.INFERENCE_ADMISSION,
+    retry_after_sec=settings.INFERENCE_RETRY_AFTER_SEC,
+    block_timeout_sec=settings.INFERENCE_BLOCK_TIMEOUT_SEC,
+)
+metrics.INFERENCE_RUNNING.set_function(lambda: executor.running)
+metrics.INFERENCE_QUEUED.set_function(lambda: executor.queued)
+
+
+async def start() -> None:
+    """
+    Load and warm up the models before traffic arrives: in the worker
+    processes when INFERENCE_WORKERS > 0, else in this process.
+    """
+    global pool
+    t0 = time.perf_counter()
+    if settings.INFERENCE_WORKERS <= 0:
+        apply_threads(load_profile())
+        await run_in_threadpool(model_registry.load)
+        return
+    pool = InferencePool(settings.INFERENCE_WORKERS, settings.INFERENCE_TORCH_THREADS)
+    workers = await pool.start()
+    model_registry.mark_ready({"workers": workers, "total_ms": round((time.perf_counter() - t0) * 1000, 1)})
+
+
+def stop() -> None:
+    global pool
+    if pool is not None:
+        pool.shutdown()
+        pool = None
+    executor.shutdown()
+
+
+async def predict_bytes(img_bytes: bytes | memoryview, cam_id: str | None = None, roi: dict | None = None,
+                        kind: str = "request", quality: dict | None = None) -> dict:
+    """
+    Run OCR on an encoded image, in the worker pool if there is one, else on an
+    inference thread. kind ("request" | "camera") matters for the drop_oldest policy.
+    Raises OverloadedError when the executor does not admit the job.
+    """
+    if pool is not None:
+        result = await executor.submit(lambda: pool.submit(img_bytes, cam_id, roi, quality), kind)
+        # the original image comes back as a reference to the bytes we already hold
+        return attach_sources(result, img_bytes)
+    return await executor.run(
+        model_registry.get().predict_bytes, img_bytes, cam_id=cam_id, roi=roi, quality=quality, kind=kind,
+    )
+
+
+async def predict_burst(frames: list[bytes | memoryview], cam_id: str | None = None, roi: dict | None = None,
+                        kind: str = "camera", quality: dict | None = None) -> dict:
+    """Several frames of one event, read together and voted into one result."""
+    if pool is not None:
+        result = await executor.submit(lambda: pool.submit_burst(frames, cam_id, roi, quality), kind)
+        return attach_sources(result, frames[result.get("bestFrame", 0)])
+    return await executor.run(
+        model_registry.get().predict_burst, frames, cam_id=cam_id, roi=roi, quality=quality, kind=kind,
+    )
+
+
+async def predict_base64(img_base64: str, cam_id: str | None = None, roi: dict | None = None,
+                         kind: str = "request", quality: dict | None = None) -> dict:
+    if pool is None:
+        return await executor.run(
+            model_registry.get().predict, img_base64, cam_id=cam_id, roi=roi, quality=quality, kind=kind,
+        )
+
+    decoded = await run_in_threadpool(OCRService.decode_base64, img_base64)
+    if decoded is None:
+        logger.warning("[OCR] invalid_image: base64 decode failed")
+        raise BusinessLogicError("Invalid base64 image")
+    result = await executor.submit(lambda: pool.submit(decoded, cam_id, roi, quality), kind)
+    return attach_sources(result, decoded)
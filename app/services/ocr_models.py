@@ -0,0 +1,52 @@
+import logging
+import threading
+import time
+from app.services.ocr_service import OCRService
+
+logger = logging.getLogger("ocr_models")
+
+
+class ModelRegistry:
+    """
+    The process-wide OCRService: models are loaded once, on first use or at
+    startup (load()), and every router / service shares the same instance.
+    `ready` turns True once the models are loaded and warmed up (or, with an
+    inference pool, once every worker is).
+    """
+
+    def __init__(self):
+        self._service: OCRService | None = None
+        self._lock = threading.Lock()
+        self.ready = False
+        self.timings: dict = {}
+
+    def get(self) -> OCRService:
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    self._service = OCRService()
+        return self._service
+
+    def load(self, warm_up: bool = True) -> OCRService:
+        """Load (if needed) and warm up the in-process models. Blocking."""
+        t0 = time.perf_counter()
+        service = self.get()
+        if warm_up:
+            service.warm_up()
+        self.mark_ready({**service.timings, "total_ms": round((time.perf_counter() - t0) * 1000, 1)})
+        return service
+
+    def mark_ready(self, timings: dict) -> None:
+        self.timings = timings
+        self.ready = True
+        logger.info("✅ Models ready: %s", timings)
+
+    def status(self) -> dict:
+        return {"ready": self.ready, "timings": self.timings}
+
+
+model_registry = ModelRegistry()
+
+
+def get_ocr_service() -> OCRService:
+    return model_registry.get()
@@ -2,12 +2,15 @@ from app.models.user_org import User, UserPublic
 from app.models.ocr_log import OCRDetectionMetrics, OCRRecognitionMetrics, OCRMetrics, OCRLogImages, OCRLogContent, OCRLogMessage,OCRLog
 from app.models.cameras import cameras
 from app.models.vehicle_session import VehicleSession, SessionPoint
+from app.models.cooldowns import Cooldown
 from app.core.exceptions import MongoLogError, BusinessLogicError
 from app.services.ocr_labelMapping import province_to_iso
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
 from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from app.core.config import get_settings 
+from app.core import metrics
 import logging
 
 logger = logging.getLogger("MONGO_service")
@@ -24,7 +27,40 @@ class OcrMongoService:
             return (data.organization, data.direction)
         except Exception as e:
             logger.exception("mapCamId query failed")
+            metrics.MONGO_ERRORS.labels("mapCamId").inc()
             raise MongoLogError(f"mapCamId query failed: {e}") from e
+    
+    async def get_camera(self, camid: str) -> Optional[cameras]:
+        """Full camera document (per-camera settings such as the detection ROI)."""
+        try:
+            return await cameras.find_one(cameras.camId == camid)
+        except Exception as e:
+            logger.exception("get_camera query failed")
+            metrics.MONGO_ERRORS.labels("get_camera").inc()
+            raise MongoLogError(f"get_camera query failed: {e}") from e
+    
+    async def acquire_cooldown(self, key: str, cooldown_sec: float) -> bool:
+        """
+        Start the shared cooldown `key` unless one is running (atomic across replicas).
+        True = started; False = still cooling down.
+        """
+        now = datetime.utcnow()
+        try:
+            col = Cooldown.get_pymongo_collection()
+            # matches only an expired cooldown; a running one makes the upsert collide on _id
+            await col.update_one(
+                {"_id": key, "until": {"$lte": now}},
+                {"$set": {"until": now + timedelta(seconds=cooldown_sec)}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            logger.exception("acquire_cooldown failed")
+            metrics.MONGO_ERRORS.labels("acquire_cooldown").inc()
+            raise MongoLogError(f"acquire_cooldown failed: {e}") from e
+    
     #2
     async def get_UID_by_organize(self, organize: Optional[str]) -> Optional[str]:
         try:
@@ -34,6 +70,7 @@ class OcrMongoService:
             return str(user.id)
         except Exception as e:
             logger.exception("get_UID_by_organize query failed")
+            metrics.MONGO_ERRORS.labels("get_UID_by_organize").inc()
             raise MongoLogError(f"get_UID_by_organize query failed: {e}") from e
     
     async def latest_session(self, org:str, subId:str, regNum:str):
@@ -54,6 +91,7 @@ class OcrMongoService:
             return doc
         except Exception as e:
             logger.exception("latest_session query failed")
+            metrics.MONGO_ERRORS.labels("latest_session").inc()
             raise MongoLogError(f"latest_session query failed: {e}") from e
     
     async def open_session(self, org: str, subId: str, regNum: str,
@@ -85,6 +123,7 @@ class OcrMongoService:
             return doc
         except Exception as e:
             logger.exception("open_session query failed")
+            metrics.MONGO_ERRORS.labels("open_session").inc()
             raise MongoLogError(f"open_session query failed: {e}") from e
 
     
@@ -150,6 +189,7 @@ class OcrMongoService:
 
             except Exception as e:
                 logger.exception("Mongo insert error")
+                metrics.MONGO_ERRORS.labels("log_ocr").inc()
                 raise MongoLogError(f"Mongo insert failed: {e}") from e
         
         except BusinessLogicError:
@@ -158,6 +198,7 @@ class OcrMongoService:
             raise  
         except Exception as e:
             logger.exception("Mongo failed")
+            metrics.MONGO_ERRORS.labels("log_ocr").inc()
             raise MongoLogError(f"Mongo failed: {e}") from e
         
     
@@ -296,5 +337,6 @@ class OcrMongoService:
         except Exception as e:
             # (E) “DB fail” should map  MongoLogError (not BusinessLogicError)
             logger.exception("Mongo operation failed in resolve_session_from_log")
+            metrics.MONGO_ERRORS.labels("resolve_session_from_log").inc()
             raise MongoLogError(f"Mongo operation failed: {e}") from e
         return None
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from app.services.ocr_images import attach_sources
+
+logger = logging.getLogger("ocr_pool")
+
+# one OCRService per worker process, created by _init_worker
+_worker_service = None
+
+
+def _init_worker(torch_threads: int, counter, workers: int) -> None:
+    global _worker_service
+
+    from app.core.logging_config import setup_logging
+    from app.services.ocr_cpu import apply_threads, load_profile, worker_cpus
+
+    setup_logging()
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    # pin the intra-op pool before any model is loaded, N workers x 1 thread
+    # scales better than one process fighting over every core
+    profile = load_profile()
+    profile["intra_op_threads"] = profile["intra_op_threads"] or torch_threads
+    profile["interop_threads"] = profile["interop_threads"] or 1
+    os.environ["OMP_NUM_THREADS"] = str(profile["intra_op_threads"])
+    applied = apply_threads(profile, worker_cpus(profile["affinity"], index, workers))
+
+    from app.services.ocr_service import OCRService
+
+    _worker_service = OCRService(cpu_profile=profile)
+    _worker_service.warm_up()
+    logger.info("✅ Inference worker #%d pid=%d ready (%s)", index, os.getpid(), applied)
+
+
+def _ping() -> tuple[int, dict]:
+    return os.getpid(), _worker_service.timings
+
+
+def _predict_shm(shm_name: str, size: int, cam_id: str | None = None, roi: dict | None = None,
+                 quality: dict | None = None) -> dict:
+    # the parent owns and unlinks the block (and its resource tracker, which spawned
+    # workers share, cleans up after a crash); the worker only closes its mapping
+    shm = SharedMemory(name=shm_name)
+    view = shm.buf[:size]
+    try:
+        return _worker_service.predict_bytes(view, cam_id=cam_id, roi=roi, quality=quality)
+    finally:
+        try:
+            view.release()
+            shm.close()
+        except BufferError:
+            # a traceback still references the decoded buffer; the parent unlinks anyway
+            logger.warning("shared memory %s still referenced in worker", shm_name)
+
+
+def _predict_burst_shm(shm_name: str, sizes: list[int], cam_id: str | None = None,
+                       roi: dict | None = None, quality: dict | None = None) -> dict:
+    """Like _predict_shm, the frames are laid out back to back in one block."""
+    shm = SharedMemory(name=shm_name)
+    views, offset = [], 0
+    for size in sizes:
+        views.append(shm.buf[offset:offset + size])
+        offset += size
+    try:
+        return _worker_service.predict_burst(views, cam_id=cam_id, roi=roi, quality=quality)
+    finally:
+        try:
+            for view in views:
+                view.release()
+            shm.close()
+        except BufferError:
+            logger.warning("shared memory %s still referenced in worker", shm_name)
+
+
+def _release(shm: SharedMemory) -> None:
+    try:
+        shm.close()
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class InferencePool:
+    """
+    N worker processes, each with its own OCRService and its own GIL.
+    Encoded frames are handed over through shared memory; only the (small)
+    result dict is pickled back.
+    """
+
+    def __init__(self, workers: int, torch_threads: int = 1):
+        self.workers = workers
+        self.torch_threads = torch_threads
+        # fork would copy the parent's torch thread pool state
+        ctx = mp.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            # worker index for the CPU affinity slice
+            initargs=(torch_threads, ctx.Value("i", 0), workers),
+        )
+
+    async def start(self) -> dict[int, dict]:
+        """Spawn every worker and wait until its models are loaded and warm. Returns timings per pid."""
+        workers: dict[int, dict] = {}
+        # a worker that finished its initializer first can answer several pings
+        # while the others still load their models, so ping until every pid answered
+        while len(workers) < self.workers:
+            futures = [asyncio.wrap_future(self._executor.submit(_ping)) for _ in range(self.workers - len(workers))]
+            workers.update(await asyncio.gather(*futures))
+            if len(workers) < self.workers:
+                await asyncio.sleep(0.1)
+        logger.info("✅ InferencePool started: %d workers (pids=%s)", self.workers, sorted(workers))
+        return workers
+
+    def submit(self, img_bytes: bytes | memoryview, cam_id: str | None = None, roi: dict | None = None,
+               quality: dict | None = None) -> Future:
+        size = len(img_bytes)
+        shm = SharedMemory(create=True, size=max(1, size))
+        try:
+            shm.buf[:size] = img_bytes
+            fut = self._executor.submit(_predict_shm, shm.name, size, cam_id, roi, quality)
+        except Exception:
+            _release(shm)
+            raise
+        # free the block once the worker is done with it, even if the caller went away
+        fut.add_done_callback(lambda _: _release(shm))
+        return fut
+
+    def submit_burst(self, frames: list[bytes | memoryview], cam_id: str | None = None,
+                     roi: dict | None = None, quality: dict | None = None) -> Future:
+        sizes = [len(f) for f in frames]
+        shm = SharedMemory(create=True, size=max(1, sum(sizes)))
+        try:
+            offset = 0
+            for frame, size in zip(frames, sizes):
+                shm.buf[offset:offset + size] = frame
+                offset += size
+            fut = self._executor.submit(_predict_burst_shm, shm.name, sizes, cam_id, roi, quality)
+        except Exception:
+            _release(shm)
+            raise
+        fut.add_done_callback(lambda _: _release(shm))
+        return fut
+
+    async def predict_bytes(self, img_bytes: bytes | memoryview, cam_id: str | None = None,
+                            roi: dict | None = None, quality: dict | None = None) -> dict:
+        result = await asyncio.wrap_future(self.submit(img_bytes, cam_id, roi, quality))
+        # the original image comes back as a reference to the bytes we already hold
+        return attach_sources(result, img_bytes)
+
+    async def predict_burst(self, frames: list[bytes | memoryview], cam_id: str | None = None,
+                            roi: dict | None = None, quality: dict | None = None) -> dict:
+        result = await asyncio.wrap_future(self.submit_burst(frames, cam_id, roi, quality))
+        return attach_sources(result, frames[result.get("bestFrame", 0)])
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        logger.info("InferencePool stopped")
@@ -0,0 +1,36 @@
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# per-camera overrides (cameras.quality) may set any of these, plus "enabled"
+THRESHOLD_KEYS = ("min_brightness", "max_brightness", "min_contrast", "min_sharpness")
+
+
+def default_thresholds() -> dict[str, float]:
+    return {
+        "min_brightness": settings.QUALITY_MIN_BRIGHTNESS,
+        "max_brightness": settings.QUALITY_MAX_BRIGHTNESS,
+        "min_contrast": settings.QUALITY_MIN_CONTRAST,
+        "min_sharpness": settings.QUALITY_MIN_SHARPNESS,
+    }
+
+
+def merge_thresholds(overrides: dict | None) -> dict[str, float] | None:
+    """Thresholds for one camera, None when the gate is off for it."""
+    overrides = overrides or {}
+    if not overrides.get("enabled", settings.QUALITY_GATE_ENABLED):
+        return None
+    return {**default_thresholds(), **{k: float(overrides[k]) for k in THRESHOLD_KEYS if k in overrides}}
+
+
+def check_quality(measured: dict[str, float], thresholds: dict[str, float]) -> str | None:
+    """Reject reason for frame_quality() output, None if the frame is good enough."""
+    if measured["brightness"] < thresholds["min_brightness"]:
+        return "dark"
+    if measured["brightness"] > thresholds["max_brightness"]:
+        return "overexposed"
+    if measured["contrast"] < thresholds["min_contrast"]:
+        return "low_contrast"
+    if measured["sharpness"] < thresholds["min_sharpness"]:
+        return "blurred"
+    return None
@@ -0,0 +1,124 @@
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services.ocr_camera_config import CameraConfigCache, camera_configs
+
+logger = logging.getLogger("ocr_roi")
+settings = get_settings()
+
+
+class RoiLearner:
+    """
+    Running histogram of where plates show up, per camera. Box extents are
+    accumulated into X and Y marginal histograms (with decay, so a moved camera
+    re-learns), and the learned region is the band holding `coverage` of the
+    mass, plus a margin.
+    """
+
+    def __init__(
+        self,
+        bins: int = 64,
+        decay: float = 0.995,
+        min_samples: int = 50,
+        coverage: float = 0.98,
+        margin: float = 0.15,
+        max_area: float = 0.8,
+        max_cameras: int = 1024,
+    ):
+        self.bins = bins
+        self.decay = decay
+        self.min_samples = min_samples
+        self.coverage = coverage
+        self.margin = margin
+        self.max_area = max_area
+        self.max_cameras = max_cameras
+        # camId -> [hist_x, hist_y, samples]
+        self._hist: OrderedDict[str, list] = OrderedDict()
+
+    def observe(self, cam_id: str, box: list[float]) -> None:
+        """Add one plate box (x1, y1, x2, y2 relative to the full frame)."""
+        entry = self._hist.get(cam_id)
+        if entry is None:
+            entry = self._hist[cam_id] = [np.zeros(self.bins), np.zeros(self.bins), 0]
+            while len(self._hist) > self.max_cameras:
+                self._hist.popitem(last=False)
+        self._hist.move_to_end(cam_id)
+
+        hist_x, hist_y, _ = entry
+        hist_x *= self.decay
+        hist_y *= self.decay
+        x1, y1, x2, y2 = (min(max(int(v * self.bins), 0), self.bins - 1) for v in box)
+        hist_x[x1:x2 + 1] += 1.0
+        hist_y[y1:y2 + 1] += 1.0
+        entry[2] += 1
+
+    def _band(self, hist: np.ndarray) -> tuple[float, float]:
+        cdf = np.cumsum(hist) / hist.sum()
+        tail = (1.0 - self.coverage) / 2
+        lo = int(np.searchsorted(cdf, tail))
+        hi = int(np.searchsorted(cdf, 1.0 - tail))
+        lo_f, hi_f = lo / self.bins, (hi + 1) / self.bins
+        pad = (hi_f - lo_f) * self.margin
+        return max(0.0, lo_f - pad), min(1.0, hi_f + pad)
+
+    def region(self, cam_id: str) -> tuple[float, float, float, float] | None:
+        entry = self._hist.get(cam_id)
+        if entry is None or entry[2] < self.min_samples:
+            return None
+        x1, x2 = self._band(entry[0])
+        y1, y2 = self._band(entry[1])
+        if (x2 - x1) * (y2 - y1) > self.max_area:
+            # not worth cropping
+            return None
+        return (x1, y1, x2, y2)
+
+    def stats(self, cam_id: str) -> dict:
+        entry = self._hist.get(cam_id)
+        return {"samples": entry[2] if entry else 0, "region": self.region(cam_id)}
+
+
+class RoiManager:
+    """Detection region per camera, from the cameras document or learned (roiMode)."""
+
+    def __init__(self, configs: CameraConfigCache, learner: RoiLearner):
+        self.configs = configs
+        self.learner = learner
+
+    async def region(self, cam_id: str | None) -> dict | None:
+        """ROI for OCRService.predict: {"rect": (x1, y1, x2, y2), "polygon": [...] | None} or None."""
+        doc = await self.configs.get(cam_id)
+        if doc is None or doc.roiMode == "off":
+            return None
+
+        if doc.roiMode == "static":
+            points = doc.roi or []
+            if len(points) < 2:
+                return None
+            xs = [p[0] for p in points]
+            ys = [p[1] for p in points]
+            return {
+                "rect": (min(xs), min(ys), max(xs), max(ys)),
+                "polygon": points if len(points) >= 3 else None,
+            }
+
+        rect = self.learner.region(cam_id)
+        return {"rect": rect, "polygon": None} if rect else None
+
+    def observe(self, cam_id: str | None, plate_box: list[float] | None) -> None:
+        """Feed a detected plate position back (any roiMode, so switching to auto starts warm)."""
+        if cam_id and plate_box:
+            self.learner.observe(cam_id, plate_box)
+
+
+roi_manager = RoiManager(
+    camera_configs,
+    RoiLearner(
+        min_samples=settings.ROI_AUTO_MIN_SAMPLES,
+        coverage=settings.ROI_AUTO_COVERAGE,
+        margin=settings.ROI_AUTO_MARGIN,
+        max_area=settings.ROI_AUTO_MAX_AREA,
+    ),
+)
@@ -3,25 +3,86 @@ import base64
 import logging
 import numpy as np
 import time
-from ultralytics import YOLO
 from app.services.ocr_labelMapping import label_dict, province_map
+from app.services.ocr_batching import BatchScheduler
+from app.services.ocr_engine import load_model
+from app.services.ocr_cpu import load_profile, optimize_model
+from app.utils.image import crop_region, decode_image, frame_quality, letterbox
+from app.services.ocr_quality import check_quality
+from app.services.ocr_images import LazyImage, is_jpeg
+from app.services.ocr_crop_cache import PlateCropCache, dhash
 from app.core.config import get_settings  
 from app.core.exceptions import OCRServiceError, BusinessLogicError
 
 logger = logging.getLogger("ocr_service") 
 settings = get_settings()
+
+
+def add_stage(stages: dict | None, name: str, t0: float) -> None:
+    """Add the time since perf_counter() `t0` (ms) to stages[name], if stages are collected."""
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
 class OCRService:
        
-    def __init__(self):
+    def __init__(self, engine: str | None = None, precision: str | None = None, cpu_profile: dict | None = None):
         try:
+            self.engine = engine or settings.MODEL
+            self.precision = precision or settings.MODEL_PRECISION
+            self.cpu_profile = load_profile() if cpu_profile is None else cpu_profile
 
             logger.info("==============================================") 
             logger.info("✅ Initializing OCR Service")
+            logger.info("⚙️  Inference engine: %s (%s)", self.engine, self.precision)
+            # load / warm-up durations, reported by /health
+            self.timings: dict[str, float] = {}
+            
             logger.info("🔎 Loading plate model from: %s", settings.PLATE_MODEL_PATH)
-            self.plate_model = YOLO(settings.PLATE_MODEL_PATH)  
+            t0 = time.perf_counter()
+            self.plate_model = load_model(settings.PLATE_MODEL_PATH, self.engine, self.precision)
+            optimizations = optimize_model(self.plate_model, self.cpu_profile)
+            self.timings["plate_model_load_ms"] = round((time.perf_counter() - t0) * 1000, 1)
             
             logger.info("🔤 Loading OCR model from:   %s", settings.OCR_MODEL_PATH)
-            self.ocr_model = YOLO(settings.OCR_MODEL_PATH) 
+            t0 = time.perf_counter()
+            self.ocr_model = load_model(settings.OCR_MODEL_PATH, self.engine, self.precision)
+            optimize_model(self.ocr_model, self.cpu_profile)
+            self.timings["ocr_model_load_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            if optimizations:
+                logger.info("⚙️  Model optimizations: %s", ", ".join(optimizations))
+            self.build_label_lookup()
+            self.set_ocr_input(settings.YOLO_OCR_IMGSZ, settings.YOLO_OCR_HEIGHT, settings.OCR_INPUT_MODE)
+            
+            # frames from concurrent requests share one detector forward pass
+            self.plate_batcher: BatchScheduler | None = None
+            if settings.PLATE_BATCH_ENABLED:
+                self.plate_batcher = BatchScheduler(
+                    "plate",
+                    self.detect_plate_batch,
+                    max_batch=settings.PLATE_BATCH_MAX_SIZE,
+                    window_ms=settings.PLATE_BATCH_WINDOW_MS,
+                )
+            
+            # recent readings per camera, skips the OCR model for repeated alarms
+            self.crop_cache: PlateCropCache | None = None
+            if settings.CROP_CACHE_ENABLED:
+                self.crop_cache = PlateCropCache(
+                    ttl_sec=settings.CROP_CACHE_TTL_SEC,
+                    max_per_camera=settings.CROP_CACHE_MAX_PER_CAMERA,
+                    max_cameras=settings.CROP_CACHE_MAX_CAMERAS,
+                    max_hash_distance=settings.CROP_CACHE_HASH_DISTANCE,
+                    max_shift=settings.CROP_CACHE_MAX_SHIFT,
+                )
+            
+            # plate crops (one or many per frame) share one OCR forward pass
+            self.ocr_batcher: BatchScheduler | None = None
+            if settings.OCR_BATCH_ENABLED:
+                self.ocr_batcher = BatchScheduler(
+                    "ocr",
+                    self.run_ocr_model_batch,
+                    max_batch=settings.OCR_BATCH_MAX_SIZE,
+                    window_ms=settings.OCR_BATCH_WINDOW_MS,
+                )
         
             logger.info("✅ OCR Service initialized successfully")
             logger.info("=============================================="+"\n") 
@@ -29,17 +90,68 @@ class OCRService:
             logger.error(f"Error initializing OCR Service: {e}")
             raise OCRServiceError(f"Failed to initialize OCR models: {e}")
 
+    def warm_up(self, runs: int | None = None) -> dict[str, float]:
+        """
+        Push dummy batches through both models so graph setup / allocation happens
+        now, not on the first real request. Covers every detector input size
+        (full frame, ROI) and batch size 1 plus the batcher maximum.
+        """
+        runs = settings.MODEL_WARMUP_RUNS if runs is None else runs
+        if runs <= 0:
+            return self.timings
+        
+        plate_sizes = {settings.YOLO_IMGSZ, settings.ROI_PLATE_IMGSZ}
+        plate_batches = {1, settings.PLATE_BATCH_MAX_SIZE if settings.PLATE_BATCH_ENABLED else 1}
+        ocr_batches = {1, settings.OCR_BATCH_MAX_SIZE if settings.OCR_BATCH_ENABLED else 1}
+        
+        t0 = time.perf_counter()
+        for imgsz in sorted(plate_sizes):
+            dummy = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+            for batch in sorted(plate_batches):
+                for _ in range(runs):
+                    self.detect_plate_batch([dummy] * batch, imgsz)
+        self.timings["plate_model_warmup_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        
+        t0 = time.perf_counter()
+        dummy = np.full((*self.ocr_imgsz, 3), 114, dtype=np.uint8)
+        for batch in sorted(ocr_batches):
+            for _ in range(runs):
+                self.run_ocr_model_batch([dummy] * batch)
+        self.timings["ocr_model_warmup_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        
+        logger.info("🔥 Models warmed up: %s", self.timings)
+        return self.timings
+
     def resize_image(self, image: np.ndarray, target_size=(640, 640)) -> np.ndarray:
         return cv2.resize(image, target_size)
     
-    def img_to_jpeg_bytes(self, img: np.ndarray) -> bytes:
-        ok, buf = cv2.imencode(".jpg", img)
-        if not ok:
-            return b""
-        return buf.tobytes()
+    def set_ocr_input(self, width: int, height: int = 0, mode: str = "stretch") -> None:
+        """Character model input size (height 0 = square) and how crops are fitted into it."""
+        if mode not in ("stretch", "letterbox"):
+            raise ValueError(f"Unknown OCR input mode {mode!r}, expected 'stretch' or 'letterbox'")
+        # (height, width), as ultralytics takes a rectangular imgsz
+        self.ocr_imgsz = (height or width, width)
+        self.ocr_input_mode = mode
+    
+    def ocr_input(self, cropped_plate: np.ndarray) -> np.ndarray:
+        """Plate crop -> character model input of ocr_imgsz."""
+        if self.ocr_input_mode == "letterbox":
+            return letterbox(cropped_plate, self.ocr_imgsz)[0]
+        h, w = self.ocr_imgsz
+        return self.resize_image(cropped_plate, target_size=(w, h))
+    
+    def original_image(self, img_bytes: bytes | memoryview, frame: np.ndarray) -> LazyImage:
+        """
+        Reuse the incoming JPEG, full resolution even after a reduced decode (plate
+        boxes are relative to the frame); other inputs encode the frame lazily.
+        """
+        if settings.IMG_ENCODE_FORMAT == "jpg" and is_jpeg(img_bytes):
+            return LazyImage.from_source(img_bytes)
+        return LazyImage.from_array(frame)
 
     # 1
-    def decode_base64(self, img_base64: str) -> bytes | None:
+    @staticmethod
+    def decode_base64(img_base64: str) -> bytes | None:
         try:
             
             # cut prefix (data:image/jpeg;base64,)
@@ -56,186 +168,374 @@ class OCRService:
             return None
     
     # 2
-    def preProcess(self, img_bytes: bytes) -> tuple[np.ndarray, np.ndarray] | None:
+    def preProcess(self, img_bytes: bytes | memoryview, roi: dict | None = None,
+                   stages: dict | None = None) -> tuple[np.ndarray, np.ndarray, dict] | None:
         """
         Change raw image bytes to numpy array (BGR) for OpenCV/YOLO usage.
+        Returns (frame, detector_input, meta), see detector_input() for meta.
+        With a camera `roi` ({"rect": (x1, y1, x2, y2), "polygon": [...] | None}, relative
+        coords) only that region of the frame goes to the detector, at ROI_PLATE_IMGSZ.
+        `stages` (optional) receives decode_ms / preprocess_ms.
         """
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        t0 = time.perf_counter()
+        min_side = settings.JPEG_REDUCED_MIN_SIDE if settings.JPEG_REDUCED_DECODE else None
+        frame, factor = decode_image(img_bytes, min_side=min_side)
+        add_stage(stages, "decode_ms", t0)
         if frame is None:
             return None
         
-        resized = self.resize_image(frame, target_size=(640, 640))
-        return frame, resized
+        t0 = time.perf_counter()
+        if roi:
+            region, offset = crop_region(frame, roi["rect"], roi.get("polygon"))
+            resized, meta = self.detector_input(region, settings.ROI_PLATE_IMGSZ, settings.ROI_PLATE_IMGSZ)
+        else:
+            region, offset = frame, (0, 0)
+            resized, meta = self.detector_input(frame, settings.YOLO_IMGSZ, 640)
+        
+        meta.update(decode_factor=factor, offset=offset, roi=region is not frame)
+        add_stage(stages, "preprocess_ms", t0)
+        return frame, resized, meta
+    
+    def detector_input(self, region: np.ndarray, imgsz: int, stretch_size: int) -> tuple[np.ndarray, dict]:
+        """
+        Resize `region` for the detector. meta:
+          transform   (scale, (pad_x, pad_y)) detector -> region coords (letterbox), None (stretch)
+          source      image the plates are cropped from (full-res region, or the stretched input)
+          region_size (w, h) of the region
+          imgsz       detector input size
+        """
+        h, w = region.shape[:2]
+        if settings.PREPROCESS_MODE == "letterbox":
+            # one aspect-preserving resize; ultralytics has nothing left to resize
+            resized, scale, pad = letterbox(region, imgsz)
+            return resized, {"transform": (scale, pad), "source": region, "region_size": (w, h), "imgsz": imgsz}
+        
+        resized = self.resize_image(region, target_size=(stretch_size, stretch_size))
+        return resized, {"transform": None, "source": resized, "region_size": (w, h), "imgsz": imgsz}
+    
+    def plate_box_in_frame(self, xyxy, frame: np.ndarray, meta: dict) -> list[float]:
+        """Detector box -> (x1, y1, x2, y2) relative to the full frame."""
+        x1, y1, x2, y2 = map(float, xyxy)
+        if meta["transform"] is not None:
+            scale, (pad_x, pad_y) = meta["transform"]
+            xs = [(x1 - pad_x) / scale, (x2 - pad_x) / scale]
+            ys = [(y1 - pad_y) / scale, (y2 - pad_y) / scale]
+        else:
+            src_h, src_w = meta["source"].shape[:2]
+            region_w, region_h = meta["region_size"]
+            xs = [x1 * region_w / src_w, x2 * region_w / src_w]
+            ys = [y1 * region_h / src_h, y2 * region_h / src_h]
+        
+        fh, fw = frame.shape[:2]
+        off_x, off_y = meta["offset"]
+        xs = [min(max((v + off_x) / fw, 0.0), 1.0) for v in xs]
+        ys = [min(max((v + off_y) / fh, 0.0), 1.0) for v in ys]
+        return [round(xs[0], 4), round(ys[0], 4), round(xs[1], 4), round(ys[1], 4)]
+    
+    def quality_gate(self, frame: np.ndarray, thresholds: dict | None,
+                     stages: dict | None = None) -> dict | None:
+        """None if the frame passes (or there are no thresholds), else {"reason", brightness, contrast, sharpness}."""
+        if not thresholds:
+            return None
+        t0 = time.perf_counter()
+        measured = frame_quality(frame, settings.QUALITY_SAMPLE_SIZE)
+        reason = check_quality(measured, thresholds)
+        add_stage(stages, "quality_ms", t0)
+        if reason is None:
+            return None
+        logger.info("[OCR] low_quality: %s %s", reason, {k: round(v, 1) for k, v in measured.items()})
+        return {"reason": reason, **{k: round(v, 2) for k, v in measured.items()}}
     
     # 3
-    def detect_plate(self, img: np.ndarray):
+    def detect_plate_batch(self, imgs: list[np.ndarray], imgsz: int | None = None) -> list:
+        """Run the plate detector once over a list of frames, return boxes per frame."""
         plate_results = self.plate_model.predict(
-            img, 
+            imgs, 
             conf=settings.YOLO_PLATE_CONF, 
             save=False, 
             verbose=False,
-            imgsz=settings.YOLO_IMGSZ
+            imgsz=imgsz or settings.YOLO_IMGSZ
         )
+        return [r.boxes for r in plate_results]
+    
+    def detect_plates(self, img: np.ndarray, imgsz: int | None = None):
+        """All plate boxes in the frame, highest confidence first."""
+        imgsz = imgsz or settings.YOLO_IMGSZ
+        if self.plate_batcher is not None:
+            # frames are only batched with frames of the same input size
+            boxes = self.plate_batcher.run(img, key=imgsz)
+        else:
+            boxes = self.detect_plate_batch([img], imgsz)[0]
                 
-        # Choose first image 
-        boxes = plate_results[0].boxes
+        return self.sort_plate_boxes(boxes)
+    
+    @staticmethod
+    def sort_plate_boxes(boxes):
+        """Highest confidence first, None when there are no boxes."""
         if boxes is None or len(boxes) == 0:
             return None
         
+        order = boxes.conf.argsort(descending=True)
+        return boxes[order]
+    
+    def detect_plate(self, img: np.ndarray):
+        boxes = self.detect_plates(img)
+        if boxes is None:
+            return None
+        
         # choose box with highest confidence
-        best_idx = int(boxes.conf.argmax())
-
-        return boxes[best_idx:best_idx + 1]
+        return boxes[0:1]
     
     # 4
-    def crop_plate(self, resized_decoded: np.ndarray, plate_boxes) -> tuple[np.ndarray, np.ndarray] | None:
+    def crop_plate(self, image: np.ndarray, plate_boxes, transform: tuple | None = None) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        Cut the plate out of `image`. With a letterbox `transform` the box is mapped back
+        from detector coords, so `image` is the decoded frame (full resolution unless
+        JPEG_REDUCED_DECODE reduced it).
+        Returns (crop, character model input), see ocr_input().
+        """
+        x1, y1, x2, y2 = map(float, plate_boxes.xyxy[0])
+        if transform is not None:
+            scale, (pad_x, pad_y) = transform
+            h, w = image.shape[:2]
+            x1, x2 = [min(max((v - pad_x) / scale, 0), w) for v in (x1, x2)]
+            y1, y2 = [min(max((v - pad_y) / scale, 0), h) for v in (y1, y2)]
         
         # crop plate from original resized image
-        x1, y1, x2, y2 = map(int, plate_boxes.xyxy[0])
-        cropped_plate = resized_decoded[y1:y2, x1:x2]
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        cropped_plate = image[y1:y2, x1:x2]
+        if cropped_plate.size == 0:
+            return None
         
         # debug img
         # cv2.imwrite("debug_cropped_plate.jpg", cropped_plate)
         
-        resized_cropped_plate = self.resize_image(cropped_plate, target_size=(640, 640))
-        return cropped_plate, resized_cropped_plate
+        return cropped_plate, self.ocr_input(cropped_plate)
     
     # 5
-    def run_ocr_model(self, plate_img: np.ndarray):
+    def run_ocr_model_batch(self, plate_imgs: list[np.ndarray], key=None) -> list:
+        """Run the OCR model once over a list of plate crops, return boxes (or None) per crop."""
         results = self.ocr_model.predict(
-            plate_img, 
+            plate_imgs, 
             conf=settings.YOLO_OCR_CONF, 
             save=False, 
             save_txt=False, 
             verbose=False,
-            imgsz=settings.YOLO_IMGSZ
+            imgsz=self.ocr_imgsz
         )
         
-        # Choose first image
-        boxes = results[0].boxes
-        if boxes is None or boxes.cls is None or len(boxes) == 0:
-            return None
-        return boxes
+        out = []
+        for r in results:
+            boxes = r.boxes
+            if boxes is None or boxes.cls is None or len(boxes) == 0:
+                out.append(None)
+            else:
+                out.append(boxes)
+        return out
     
-    # 6
-    def build_detections(self, boxes) -> list[dict]:
+    def run_ocr_model(self, plate_img: np.ndarray):
+        return self.run_ocr_models([plate_img])[0]
+    
+    def run_ocr_models(self, plate_imgs: list[np.ndarray]) -> list:
+        if not plate_imgs:
+            return []
+        if self.ocr_batcher is None:
+            return self.run_ocr_model_batch(plate_imgs)
         
-        # get class ids and x/y centers
-        cls_list = boxes.cls.cpu().numpy()
-       
-        # [x_center, y_center, width, height]
-        xywh = boxes.xywh.cpu().numpy()
-        confs = boxes.conf.cpu().numpy()
+        # every crop goes into the same window, so they share one forward pass
+        futures = [self.ocr_batcher.submit(img) for img in plate_imgs]
+        return [f.result() for f in futures]
+    
+    def recognize_plates(self, plate_imgs: list[np.ndarray], stages: dict | None = None) -> list[dict | None]:
+        """
+        Read several plate crops with one OCR model call.
+        Returns decode_plate_text() output per crop, or None when no characters were found.
+        `stages` (optional) receives ocr_ms / postprocess_ms.
+        """
+        t0 = time.perf_counter()
+        ocr_boxes = self.run_ocr_models(plate_imgs)
+        add_stage(stages, "ocr_ms", t0)
         
+        t0 = time.perf_counter()
+        readings: list[dict | None] = []
+        for boxes in ocr_boxes:
+            if boxes is None:
+                readings.append(None)
+                continue
+            readings.append(self.postprocess(boxes))
+        add_stage(stages, "postprocess_ms", t0)
+        return readings
+    
+    # 6
+    def build_label_lookup(self) -> None:
+        """class id -> character / province name, and which ids are province codes (built once)."""
+        names = self.ocr_model.names
+        size = max(int(i) for i in names) + 1 if names else 0
+        self.char_lut = np.empty(size, dtype=object)
+        self.province_mask = np.zeros(size, dtype=bool)
+        for cls_id, name in names.items():
+            self.char_lut[int(cls_id)] = label_dict.get(name, f"[{name}]")
+            self.province_mask[int(cls_id)] = name in province_map
+    
+    def build_detections(self, boxes) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(xywh, cls, conf) arrays; float64 so comparisons match plain Python floats."""
+        # [x_center, y_center, width, height]
+        xywh = boxes.xywh.cpu().numpy().astype(np.float64)
+        cls_ids = boxes.cls.cpu().numpy().astype(np.int64)
+        confs = boxes.conf.cpu().numpy().astype(np.float64)
+        return xywh, cls_ids, confs
+
+    # 7
+    def group_and_sort_detections(self, xywh: np.ndarray) -> np.ndarray:
+        """
+        Reading order as detection indices: lines top to bottom, characters left to right.
+        """
         x_centers = xywh[:, 0]
         y_centers = xywh[:, 1]
         heights = xywh[:, 3]
-
-
-        # create list of detections with [[ name, x_center, y_center, height ], ...]
-        detections: list[dict] = []
-        for i, cls_id in enumerate(cls_list):
-            detections.append({
-                "name": self.ocr_model.names[int(cls_id)],
-                "x": float(x_centers[i]),
-                "y": float(y_centers[i]),
-                "h": float(heights[i]),
-                "conf": float(confs[i]),
-            })
-        return detections
-
-    # 7
-    def group_and_sort_detections(self, detections: list[dict]) -> list[dict]:
-        # sort by Y center 
-        detections.sort(key=lambda k: k["y"])
-
-        sorted_detections: list[dict] = []
-        current_line: list[dict] = []
-
-        if not detections:
-            return sorted_detections
-
-        # First detection starts the first line
-        current_line.append(detections[0])
-
-        for det in detections[1:]:
-            prev = current_line[-1]
-            
-            # Calculate the difference in Y-axis between the current detection and the last one in the line
-            y_diff = abs(det["y"] - prev["y"])
-            
-            # Use average height to set a threshold (if Y difference is within 50% of height, consider it the same line)
-            threshold = max(det["h"], prev["h"]) * 0.5
-
-            if y_diff < threshold:
-                # same line: add to temporary list
-                current_line.append(det)
-            else:
-                # New line: 
-                # A. Sort the old line by X-axis (left to right)
-                current_line.sort(key=lambda k: k["x"])   
-                # B. Save the results
-                sorted_detections.extend(current_line)
-                # C. Start a new line
-                current_line = [det]
-
-        # last line Don't forget to save the last set (bottom line)
-        if current_line:
-            current_line.sort(key=lambda k: k["x"])
-            sorted_detections.extend(current_line)
-
-        return sorted_detections
+        
+        # sort by Y center (stable, ties keep detection order)
+        by_y = np.argsort(y_centers, kind="stable")
+        ys = y_centers[by_y]
+        hs = heights[by_y]
+        
+        # a new line starts where the Y gap to the previous detection is >= 50% of the taller one
+        new_line = np.abs(np.diff(ys)) >= np.maximum(hs[1:], hs[:-1]) * 0.5
+        line_ids = np.concatenate(([0], np.cumsum(new_line)))
+        
+        # lines in Y order, each line left to right (lexsort is stable)
+        return by_y[np.lexsort((x_centers[by_y], line_ids))]
     
     # 8
-    def decode_plate_text(self, sorted_detections: list[dict]) -> dict:
-        decoded = ""
-        province = ""
-
-        final_list = [(d["name"], d["x"], d["conf"]) for d in sorted_detections]
-        confs: list[float] = [] 
+    def decode_plate_text(self, cls_ids: np.ndarray, confs: np.ndarray, order: np.ndarray) -> dict:
+        ids = cls_ids[order]
+        chars = self.char_lut[ids]
+        is_province = self.province_mask[ids]
         
-        for name, _, conf in final_list:
-            if name in province_map:
-                province = label_dict.get(name, f"[{name}]")
-            else:
-                decoded += label_dict.get(name, f"[{name}]")
-                
-            confs.append(conf)
-
-        if confs:
-            avg_conf = sum(confs) / len(confs)
-        else:
-            avg_conf = 0.0
+        decoded = "".join(chars[~is_province])
+        # last province code in reading order wins
+        province = chars[is_province][-1] if is_province.any() else ""
         
-        logger.info("Decoded Text: %s", decoded)
-        logger.info("Province: %s", province)
-        logger.info("Avg Confidence: %.3f", avg_conf)
+        # plain Python sum in reading order, same rounding as before
+        ordered_confs = confs[order]
+        conf_list = ordered_confs.tolist()
+        avg_conf = sum(conf_list) / len(conf_list) if conf_list else 0.0
+        
+        logger.debug("Decoded text=%s province=%s avg_conf=%.3f", decoded, province, avg_conf)
 
-        return {"regNum": decoded, "Province": province, "confidence": avg_conf}
+        return {
+            "regNum": decoded,
+            "Province": province,
+            "confidence": avg_conf,
+            # per character, used to vote across burst frames
+            "chars": chars[~is_province].tolist(),
+            "charConfs": ordered_confs[~is_province].tolist(),
+        }
+    
+    def vote_plate_text(self, readings: list[dict | None]) -> tuple[dict, int] | None:
+        """
+        Combine readings of the same plate (burst frames) into one.
+        The plate length is picked by summed confidence, then every position
+        takes the character with the highest summed confidence among readings
+        of that length; readings of other lengths only count toward the length
+        vote. Returns (reading, index of the best supporting reading), or None.
+        """
+        candidates = [(i, r) for i, r in enumerate(readings) if r is not None and r["chars"]]
+        if not candidates:
+            return None
+        
+        length_votes: dict[int, float] = {}
+        for _, r in candidates:
+            length_votes[len(r["chars"])] = length_votes.get(len(r["chars"]), 0.0) + r["confidence"]
+        length = max(length_votes, key=length_votes.get)
+        voters = [(i, r) for i, r in candidates if len(r["chars"]) == length]
+        
+        chars, char_confs = [], []
+        for pos in range(length):
+            scores: dict[str, float] = {}
+            for _, r in voters:
+                scores[r["chars"][pos]] = scores.get(r["chars"][pos], 0.0) + r["charConfs"][pos]
+            best = max(scores, key=scores.get)
+            chars.append(best)
+            # dissenting frames pull the confidence down
+            char_confs.append(scores[best] / len(voters))
+        
+        province_votes: dict[str, float] = {}
+        for _, r in candidates:
+            if r["Province"]:
+                province_votes[r["Province"]] = province_votes.get(r["Province"], 0.0) + r["confidence"]
+        province = max(province_votes, key=province_votes.get) if province_votes else ""
+        
+        # frame to keep: most characters agreeing with the vote, then confidence
+        best_index, _ = max(
+            voters,
+            key=lambda item: (sum(c == v for c, v in zip(item[1]["chars"], chars)), item[1]["confidence"]),
+        )
+        
+        decoded = "".join(chars)
+        logger.debug("Voted Text: %s (%d/%d frames)", decoded, len(voters), len(readings))
+        return {
+            "regNum": decoded,
+            "Province": province,
+            "confidence": sum(char_confs) / len(char_confs),
+            "chars": chars,
+            "charConfs": char_confs,
+        }, best_index
     
-    def predict(self, img_base64: str,organize: str | None = None) -> dict:
+    def postprocess(self, boxes) -> dict:
+        xywh, cls_ids, confs = self.build_detections(boxes)
+        order = self.group_and_sort_detections(xywh)
+        return self.decode_plate_text(cls_ids, confs, order)
+    
+    def predict(self, img_base64: str,organize: str | None = None, cam_id: str | None = None,
+                roi: dict | None = None, quality: dict | None = None) -> dict:
         start_time = time.time()
+        
+        # 1 decode base64 image =======================================
+        decoded = self.decode_base64(img_base64)
+        logger.debug("Base64 decoding done.")
+        
+        if decoded is None:
+            # decoding failed ใช้งานได้
+            logger.warning("[OCR] invalid_image: base64 decode failed")
+            raise BusinessLogicError("Invalid base64 image")    
+        # ===========================================================
+        
+        return self.predict_bytes(decoded, start_time=start_time, cam_id=cam_id, roi=roi, quality=quality)
+    
+    def predict_bytes(self, img_bytes: bytes | memoryview, start_time: float | None = None,
+                      cam_id: str | None = None, roi: dict | None = None, quality: dict | None = None) -> dict:
+        """
+        Same as predict() for the encoded image file (JPEG/PNG bytes).
+        Accepts any buffer (bytes, memoryview, shared memory); it is read in place, not copied.
+        """
+        start_time = start_time or time.time()
+        # per-stage latency (ms), returned as result["stages"]
+        stages: dict[str, float] = {}
         try:
-            # 1 decode base64 image =======================================
-            decoded = self.decode_base64(img_base64)
-            logger.info("Base64 decoding done.")
-            
-            if decoded is None:
-                # decoding failed ใช้งานได้
-                logger.warning("[OCR] invalid_image: base64 decode failed")
-                raise BusinessLogicError("Invalid base64 image")    
-            
-            # ===========================================================
-            
-            
             # pre-process image =========================================
-            pre = self.preProcess(decoded)
-            logger.info("Pre-processing done.")
+            pre = self.preProcess(img_bytes, roi=roi, stages=stages)
+            logger.debug("Pre-processing done.")
             if pre is None:
                 logger.warning("[OCR] invalid_image: cv2.imdecode failed (unsupported format?)")
                 raise BusinessLogicError("Unsupported/invalid image format (please send JPEG/PNG)")
-            original_frame, resized_decoded = pre
+            original_frame, resized_decoded, pre_meta = pre
+            
+            # quality gate (dark / overexposed / flat / blurred frames never reach the models)
+            rejected = self.quality_gate(original_frame, quality, stages)
+            if rejected is not None:
+                return {
+                    "error": f"Low quality frame ({rejected['reason']})",
+                    "regNum": None,
+                    "province": None,
+                    "confidence": 0.0,
+                    "readStatus": "low_quality",
+                    "originalImage": None,
+                    "croppedPlateImage": None,
+                    "quality": rejected,
+                    "stages": stages,
+                    "latencyMs": (time.time() - start_time) * 1000
+                }
             
             # debug img
             # cv2.imwrite("debug_preprocessed.jpg", resized_decoded)
@@ -243,9 +543,16 @@ class OCRService:
 
 
             # detect plate ==============================================
-            plate_boxes = self.detect_plate(resized_decoded)
+            t0 = time.perf_counter()
+            plate_boxes = self.detect_plates(resized_decoded, pre_meta["imgsz"])
+            if plate_boxes is None and pre_meta["roi"]:
+                # nothing inside the camera ROI -> fall back to the whole frame
+                resized_decoded, full_meta = self.detector_input(original_frame, settings.YOLO_IMGSZ, 640)
+                pre_meta.update(full_meta, offset=(0, 0), roi=False)
+                plate_boxes = self.detect_plates(resized_decoded, pre_meta["imgsz"])
             
-            logger.info("Plate detection done.")
+            add_stage(stages, "detect_ms", t0)
+            logger.debug("Plate detection done.")
             if plate_boxes is None:
                 logger.error("[OCR] no_plate: YOLO plate detector found nothing")
                 # no plate detected return error with original image --> issuelog ใช้งานได้
@@ -255,17 +562,22 @@ class OCRService:
                     "province": None,
                     "confidence": 0.0,
                     "readStatus": "no_plate",   
-                    "originalImage": self.img_to_jpeg_bytes(original_frame),
+                    "originalImage": self.original_image(img_bytes, original_frame),
                     "croppedPlateImage": None,
+                    "stages": stages,
                     "latencyMs": (time.time() - start_time) * 1000
                 }
             plate_confidence = float(plate_boxes.conf[0]) 
+            plate_box = self.plate_box_in_frame(plate_boxes.xyxy[0], original_frame, pre_meta)
+            # letterbox: crop from the full-resolution frame, stretch: from the resized one
+            crop_source = pre_meta["source"]
             # ===========================================================
 
             
             # ************************************************
             # 3. crop plate image and resize ============================
-            crop_res = self.crop_plate(resized_decoded, plate_boxes)
+            t0 = time.perf_counter()
+            crop_res = self.crop_plate(crop_source, plate_boxes[0:1], pre_meta["transform"])
             if crop_res is None:
                 logger.error("[OCR] crop_plate failed")
                 return {
@@ -274,16 +586,42 @@ class OCRService:
                     "province": None,
                     "confidence": 0.0,
                     "readStatus": "no_plate",
-                    "originalImage": self.img_to_jpeg_bytes(original_frame),  # ถ้าจะเก็บไป DO
+                    "originalImage": self.original_image(img_bytes, original_frame),  # ถ้าจะเก็บไป DO
                     "croppedPlateImage": None,
+                    "stages": stages,
                     "latencyMs": (time.time() - start_time) * 1000
                 }
             cropped_plate, resized_cropped_plate = crop_res
             
-            boxes = self.run_ocr_model(resized_cropped_plate)
-            logger.info("Char detection done.")
+            # other vehicles in the frame are read in the same OCR batch
+            crops = [resized_cropped_plate]
+            crop_confs = [plate_confidence]
+            if settings.OCR_MULTI_PLATE:
+                for i in range(1, min(len(plate_boxes), settings.OCR_MAX_PLATES)):
+                    extra = self.crop_plate(crop_source, plate_boxes[i:i + 1], pre_meta["transform"])
+                    if extra is not None:
+                        crops.append(extra[1])
+                        crop_confs.append(float(plate_boxes.conf[i]))
+            
+            # same plate, same place, seconds ago on this camera -> reuse that reading
+            cache_key = None
+            cached = None
+            if self.crop_cache is not None and cam_id:
+                cache_key = (dhash(cropped_plate), self.crop_cache.box_geometry(plate_box, 1, 1))
+                cached = self.crop_cache.get(cam_id, *cache_key)
+            add_stage(stages, "crop_ms", t0)
+            
+            if cached is not None:
+                readings = [cached] + self.recognize_plates(crops[1:], stages)
+            else:
+                readings = self.recognize_plates(crops, stages)
+                # only complete reads, a short_text misread must not be replayed for the whole burst
+                if cache_key is not None and readings[0] is not None and len(readings[0]["regNum"]) >= 4:
+                    self.crop_cache.put(cam_id, *cache_key, readings[0])
+            result = readings[0]
+            logger.debug("Char detection done.")
 
-            if boxes is None:
+            if result is None:
                 logger.error("[OCR] no_text: OCR model found no characters")
                 # Plate detected but no text found ใช้งานได้
                 return {
@@ -293,24 +631,13 @@ class OCRService:
                     "confidence": 0.0,
                     "readStatus": "no_text",  
                     "originalImage": None,
-                    "croppedPlateImage": self.img_to_jpeg_bytes(cropped_plate),
+                    "croppedPlateImage": LazyImage.from_array(cropped_plate),
+                    "plateBox": plate_box,
+                    "stages": stages,
                     "latencyMs": (time.time() - start_time) * 1000
                 }
             # ===========================================================
             
-            # extract boxes and classes
-            detections = self.build_detections(boxes)
-            logger.info("extract boxes and classes done.")
-
-
-            # sort by y center first
-            sorted_detections = self.group_and_sort_detections(detections)
-            logger.info("Sort by y center done.")
-            
-            # decode plate text
-            result = self.decode_plate_text(sorted_detections)
-            logger.info("Decode plate text done.")
-            
             if len(result["regNum"]) < 4:
                 logger.error("[OCR] short_text: Decoded text too short <4 chars")
                 # plate text too short
@@ -321,16 +648,18 @@ class OCRService:
                     "confidence": result["confidence"],
                     "readStatus": "short_text",  
                     "originalImage": None,
-                    "croppedPlateImage": self.img_to_jpeg_bytes(cropped_plate),
+                    "croppedPlateImage": LazyImage.from_array(cropped_plate),
+                    "plateBox": plate_box,
+                    "stages": stages,
                     "latencyMs": (time.time() - start_time) * 1000
                 }
             
-            # format output images
-            original_img = self.img_to_jpeg_bytes(original_frame)
-            crop_img = self.img_to_jpeg_bytes(cropped_plate)
-            logger.info("Ocr Latency: %.2f ms", (time.time() - start_time) * 1000)
+            # output images, encoded only if they get uploaded
+            original_img = self.original_image(img_bytes, original_frame)
+            crop_img = LazyImage.from_array(cropped_plate)
+            logger.debug("Ocr Latency: %.2f ms", (time.time() - start_time) * 1000)
             
-            return {
+            response = {
                 "error": None,
                 "regNum": result["regNum"],
                 "province": result["Province"],
@@ -339,12 +668,183 @@ class OCRService:
                 "readStatus": 'complete' ,
                 "originalImage": original_img,
                 "croppedPlateImage": crop_img,
-                "latencyMs": (time.time() - start_time) * 1000
+                "plateBox": plate_box,
+                "stages": stages,
+                "latencyMs": (time.time() - start_time) * 1000,
+                "cacheHit": cached is not None,
+            }
+            if settings.OCR_MULTI_PLATE:
+                response["plates"] = [
+                    {
+                        "regNum": r["regNum"],
+                        "province": r["Province"],
+                        "plate_confidence": conf,
+                        "ocr_confidence": r["confidence"],
+                    }
+                    for r, conf in zip(readings, crop_confs)
+                    if r is not None
+                ]
+            return response
+        except BusinessLogicError:
+            raise
+        except Exception as e:
+            logger.exception("Unhandled OCR error")
+            raise OCRServiceError(f"OCR prediction failed: {e}") from e
+    
+    def predict_burst(self, frames: list[bytes | memoryview], cam_id: str | None = None,
+                      roi: dict | None = None, quality: dict | None = None) -> dict:
+        """
+        predict_bytes() over several frames of the same event: one detector batch,
+        one OCR batch, and the per-frame readings voted into one (vote_plate_text).
+        Images in the result come from the best frame, `bestFrame` is its index.
+        """
+        start_time = time.time()
+        try:
+            # 1 pre-process every frame ======================================
+            pres = [self.preProcess(f, roi=roi) for f in frames]
+            valid = [i for i, pre in enumerate(pres) if pre is not None]
+            if not valid:
+                logger.warning("[OCR] invalid_image: no frame of the burst could be decoded")
+                raise BusinessLogicError("Unsupported/invalid image format (please send JPEG/PNG)")
+            
+            rejected = {i: self.quality_gate(pres[i][0], quality) for i in valid}
+            if all(r is not None for r in rejected.values()):
+                return {
+                    "error": f"Low quality frames ({rejected[valid[0]]['reason']})",
+                    "regNum": None,
+                    "province": None,
+                    "confidence": 0.0,
+                    "readStatus": "low_quality",
+                    "originalImage": None,
+                    "croppedPlateImage": None,
+                    "quality": rejected[valid[0]],
+                    "bestFrame": valid[0],
+                    "latencyMs": (time.time() - start_time) * 1000
+                }
+            valid = [i for i in valid if rejected[i] is None]
+            
+            # 2 detect plates, all frames in one forward pass ==================
+            imgsz = pres[valid[0]][2]["imgsz"]
+            batch = self.detect_plate_batch([pres[i][1] for i in valid], imgsz)
+            plate_boxes = {i: self.sort_plate_boxes(b) for i, b in zip(valid, batch)}
+            
+            missed = [i for i in valid if plate_boxes[i] is None and pres[i][2]["roi"]]
+            if missed:
+                # nothing inside the camera ROI -> those frames again at full size
+                full = {}
+                for i in missed:
+                    frame, _, meta = pres[i]
+                    resized, full_meta = self.detector_input(frame, settings.YOLO_IMGSZ, 640)
+                    meta.update(full_meta, offset=(0, 0), roi=False)
+                    full[i] = resized
+                batch = self.detect_plate_batch(list(full.values()), settings.YOLO_IMGSZ)
+                plate_boxes.update({i: self.sort_plate_boxes(b) for i, b in zip(full, batch)})
+            
+            found = [i for i in valid if plate_boxes[i] is not None]
+            logger.debug("Plate detection done: %d/%d frames", len(found), len(frames))
+            if not found:
+                logger.error("[OCR] no_plate: YOLO plate detector found nothing in %d frames", len(frames))
+                frame, _, meta = pres[valid[0]]
+                return {
+                    "error": "No plate detected",
+                    "regNum": None,
+                    "province": None,
+                    "confidence": 0.0,
+                    "readStatus": "no_plate",
+                    "originalImage": self.original_image(frames[valid[0]], frame),
+                    "croppedPlateImage": None,
+                    "bestFrame": valid[0],
+                    "latencyMs": (time.time() - start_time) * 1000
+                }
+            
+            # 3 crop the best plate of every frame ===========================
+            crops: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+            for i in found:
+                meta = pres[i][2]
+                crop_res = self.crop_plate(meta["source"], plate_boxes[i][0:1], meta["transform"])
+                if crop_res is not None:
+                    crops[i] = crop_res
+            
+            # 4 read all crops in one OCR batch, then vote ===================
+            readings = dict(zip(crops, self.recognize_plates([c[1] for c in crops.values()])))
+            logger.debug("Char detection done.")
+            
+            def plate_conf(i: int) -> float:
+                return float(plate_boxes[i].conf[0])
+            
+            voted = self.vote_plate_text(list(readings.values()))
+            if voted is None:
+                logger.error("[OCR] no_text: OCR model found no characters in %d crops", len(crops))
+                best = max(crops or found, key=plate_conf)
+                frame, _, meta = pres[best]
+                if best not in crops:
+                    return {
+                        "error": "Cannot crop plate",
+                        "regNum": None,
+                        "province": None,
+                        "confidence": 0.0,
+                        "readStatus": "no_plate",
+                        "originalImage": self.original_image(frames[best], frame),
+                        "croppedPlateImage": None,
+                        "bestFrame": best,
+                        "latencyMs": (time.time() - start_time) * 1000
+                    }
+                return {
+                    "error": "No text detected",
+                    "regNum": None,
+                    "province": None,
+                    "confidence": 0.0,
+                    "readStatus": "no_text",
+                    "originalImage": None,
+                    "croppedPlateImage": LazyImage.from_array(crops[best][0]),
+                    "plateBox": self.plate_box_in_frame(plate_boxes[best].xyxy[0], frame, meta),
+                    "bestFrame": best,
+                    "latencyMs": (time.time() - start_time) * 1000
+                }
+            
+            result, best_pos = voted
+            best = list(readings)[best_pos]
+            frame, _, meta = pres[best]
+            plate_box = self.plate_box_in_frame(plate_boxes[best].xyxy[0], frame, meta)
+            burst = {
+                "frames": len(frames),
+                "plates": len(found),
+                "read": sum(r is not None for r in readings.values()),
+            }
+            
+            if len(result["regNum"]) < 4:
+                logger.error("[OCR] short_text: Voted text too short <4 chars")
+                return {
+                    "error": "Decoded text too short",
+                    "regNum": result["regNum"],
+                    "province": result["Province"],
+                    "confidence": result["confidence"],
+                    "readStatus": "short_text",
+                    "originalImage": None,
+                    "croppedPlateImage": LazyImage.from_array(crops[best][0]),
+                    "plateBox": plate_box,
+                    "bestFrame": best,
+                    "burst": burst,
+                    "latencyMs": (time.time() - start_time) * 1000
+                }
+            
+            logger.debug("Ocr Latency (burst of %d): %.2f ms", len(frames), (time.time() - start_time) * 1000)
+            return {
+                "error": None,
+                "regNum": result["regNum"],
+                "province": result["Province"],
+                "plate_confidence": plate_conf(best),
+                "ocr_confidence": result["confidence"],
+                "readStatus": 'complete',
+                "originalImage": self.original_image(frames[best], frame),
+                "croppedPlateImage": LazyImage.from_array(crops[best][0]),
+                "plateBox": plate_box,
+                "bestFrame": best,
+                "burst": burst,
+                "latencyMs": (time.time() - start_time) * 1000,
             }
         except BusinessLogicError:
             raise
         except Exception as e:
             logger.exception("Unhandled OCR error")
             raise OCRServiceError(f"OCR prediction failed: {e}") from e
-
-            
\ No newline at end of file
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from app.core import metrics
+from app.core.exceptions import AppError
+
+logger = logging.getLogger("snapshot_scheduler")
+
+
+class CameraQuarantinedError(AppError):
+    """The camera failed too often in a row and is skipped until its backoff ends."""
+    status_code = 503
+    code = "CAMERA_QUARANTINED"
+
+
+class CameraState:
+    """Queue, in-flight count, latency estimate and failure streak of one camera."""
+
+    def __init__(self):
+        self.waiting: deque[asyncio.Future] = deque()
+        self.in_flight = 0
+        # smoothed latency and its variation (seconds), as TCP does for its RTO
+        self.srtt: float | None = None
+        self.rttvar = 0.0
+        self.failures = 0
+        self.backoff = 0.0
+        self.quarantined_until = 0.0
+        self.last_used = time.monotonic()
+
+
+class SnapshotScheduler:
+    """
+    Fair access to the cameras for snapshot requests.
+
+    At most `global_limit` requests run at once over all cameras and at most
+    `per_camera_limit` per camera. Waiting requests queue per camera and free
+    slots go to the cameras round-robin, so a camera with a backlog (or one
+    that holds its slots until timeout) cannot starve the others.
+
+    Every camera gets its own timeout from its observed latency (srtt + 4 x
+    rttvar, within [min_timeout, max_timeout]; doubled after a timeout).
+    `quarantine_after` failures in a row quarantine the camera: requests fail
+    fast with CameraQuarantinedError for a backoff that doubles per further
+    failure, from `quarantine_sec` up to `quarantine_max_sec`.
+
+    A camera unused for `idle_sec`, with nothing queued or running and no
+    active quarantine, is forgotten (latency estimate included).
+
+    Like InferenceExecutor, all bookkeeping happens on the event loop.
+    """
+
+    def __init__(
+        self,
+        global_limit: int = 4,
+        per_camera_limit: int = 1,
+        min_timeout: float = 0.5,
+        max_timeout: float = 6.0,
+        quarantine_after: int = 3,
+        quarantine_sec: float = 5.0,
+        quarantine_max_sec: float = 120.0,
+        idle_sec: float = 600.0,
+    ):
+        self.global_limit = max(1, global_limit)
+        self.per_camera_limit = max(1, per_camera_limit)
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.quarantine_after = max(1, quarantine_after)
+        self.quarantine_sec = quarantine_sec
+        self.quarantine_max_sec = quarantine_max_sec
+        self.idle_sec = idle_sec
+
+        self._cameras: dict[str, CameraState] = {}
+        # cameras with queued requests, in round-robin order
+        self._ready: deque[str] = deque()
+        self._in_flight = 0
+        self._last_prune = time.monotonic()
+
+    def _camera(self, ip: str) -> CameraState:
+        cam = self._cameras.get(ip)
+        if cam is None:
+            cam = self._cameras[ip] = CameraState()
+        cam.last_used = time.monotonic()
+        return cam
+
+    def _prune(self) -> None:
+        """Forget idle cameras, at most once per `idle_sec`."""
+        now = time.monotonic()
+        if now - self._last_prune < self.idle_sec:
+            return
+        self._last_prune = now
+        idle = [
+            ip for ip, cam in self._cameras.items()
+            if not cam.waiting and not cam.in_flight and cam.quarantined_until <= now
+            and now - cam.last_used > self.idle_sec and ip not in self._ready
+        ]
+        for ip in idle:
+            del self._cameras[ip]
+        if idle:
+            logger.debug("forgot %d idle cameras", len(idle))
+
+    @property
+    def quarantined(self) -> int:
+        now = time.monotonic()
+        return sum(1 for cam in self._cameras.values() if cam.quarantined_until > now)
+
+    def timeout(self, ip: str) -> float:
+        cam = self._cameras.get(ip)
+        if cam is None or cam.srtt is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, cam.srtt + 4 * cam.rttvar))
+
+    def _check_quarantine(self, ip: str, cam: CameraState) -> None:
+        remaining = cam.quarantined_until - time.monotonic()
+        if remaining > 0:
+            raise CameraQuarantinedError(
+                f"Camera {ip} quarantined for {remaining:.1f}s after {cam.failures} failures",
+                extra={"ip": ip, "failures": cam.failures},
+            )
+
+    async def _acquire(self, ip: str) -> None:
+        self._prune()
+        cam = self._camera(ip)
+        self._check_quarantine(ip, cam)
+        # a free global slot means every queued camera is at its own limit, so no one is skipped
+        if self._in_flight < self.global_limit and cam.in_flight < self.per_camera_limit and not cam.waiting:
+            cam.in_flight += 1
+            self._in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        cam.waiting.append(waiter)
+        if ip not in self._ready:
+            self._ready.append(ip)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # a slot was handed to us, pass it on
+                self._release(ip)
+            elif waiter in cam.waiting:
+                cam.waiting.remove(waiter)
+            raise
+
+    def _release(self, ip: str) -> None:
+        cam = self._cameras[ip]
+        cam.in_flight -= 1
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued requests, one camera at a time in turn."""
+        skipped = 0
+        while self._ready and self._in_flight < self.global_limit and skipped < len(self._ready):
+            ip = self._ready.popleft()
+            cam = self._cameras[ip]
+            while cam.waiting and cam.waiting[0].done():
+                cam.waiting.popleft()
+            if not cam.waiting:
+                continue
+            if cam.quarantined_until > time.monotonic():
+                # quarantined while its requests were queued, fail them all now
+                while cam.waiting:
+                    waiter = cam.waiting.popleft()
+                    if not waiter.done():
+                        waiter.set_exception(CameraQuarantinedError(f"Camera {ip} quarantined", extra={"ip": ip}))
+                continue
+            if cam.in_flight >= self.per_camera_limit:
+                self._ready.append(ip)
+                skipped += 1
+                continue
+            cam.waiting.popleft().set_result(None)
+            cam.in_flight += 1
+            self._in_flight += 1
+            skipped = 0
+            if cam.waiting:
+                self._ready.append(ip)
+
+    @asynccontextmanager
+    async def slot(self, ip: str):
+        """Hold a request slot for camera `ip`; yields the timeout to use for the request."""
+        t0 = time.perf_counter()
+        await self._acquire(ip)
+        metrics.SNAPSHOT_WAIT_SECONDS.observe(time.perf_counter() - t0)
+        try:
+            yield self.timeout(ip)
+        finally:
+            self._release(ip)
+
+    def record(self, ip: str, ok: bool, seconds: float | None = None, timed_out: bool = False) -> None:
+        """Outcome of one request: ok with its latency, or a failure (timeout / connection error)."""
+        cam = self._camera(ip)
+        if ok:
+            if seconds is not None:
+                if cam.srtt is None:
+                    cam.srtt, cam.rttvar = seconds, seconds / 2
+                else:
+                    cam.rttvar = 0.75 * cam.rttvar + 0.25 * abs(cam.srtt - seconds)
+                    cam.srtt = 0.875 * cam.srtt + 0.125 * seconds
+            if cam.failures >= self.quarantine_after:
+                logger.info("camera ip=%s recovered", ip)
+            cam.failures = 0
+            cam.backoff = 0.0
+            return
+
+        if timed_out and cam.srtt is not None:
+            # maybe just slower than we thought: back the timeout off like TCP
+            cam.srtt = min(self.max_timeout, cam.srtt * 2)
+        cam.failures += 1
+        if cam.failures >= self.quarantine_after:
+            cam.backoff = min(self.quarantine_max_sec, cam.backoff * 2 if cam.backoff else self.quarantine_sec)
+            cam.quarantined_until = time.monotonic() + cam.backoff
+            logger.warning("camera ip=%s quarantined for %.1fs after %d failures", ip, cam.backoff, cam.failures)
+            self._dispatch()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "in_flight": self._in_flight,
+            "queued": sum(len(cam.waiting) for cam in self._cameras.values()),
+            "cameras": {
+                ip: {
+                    "in_flight": cam.in_flight,
+                    "queued": len(cam.waiting),
+                    "timeout_s": round(self.timeout(ip), 3),
+                    "latency_ms": round(cam.srtt * 1000, 1) if cam.srtt is not None else None,
+                    "failures": cam.failures,
+                    "quarantined_s": round(max(0.0, cam.quarantined_until - now), 1),
+                }
+                for ip, cam in self._cameras.items()
+            },
+        }
@@ -0,0 +1,159 @@
+"""
+Find the fastest CPU profile for the PyTorch models on this machine.
+
+    python -m app.tools.autotune_cpu ./samples --threads 1 2 4 --repeat 2
+
+Each candidate (intra-op threads x fuse / channels_last / torch.compile) runs
+in a fresh process pinned to that many CPUs: models are loaded, optimized,
+warmed up, and the folder is read sequentially. Candidates are ranked by
+core-ms per frame (p50 end-to-end latency x threads), i.e. the cost of one
+read on a host where every core is busy; --objective latency ranks by plain
+p50 instead. The winner is written to CPU_PROFILE_PATH (or --output), which
+OCRService and the inference workers pick up at startup; the full table goes
+to --report.
+
+Only MODEL=yolo has graph options; for exported engines only the thread
+count is tuned.
+"""
+# sets the dummy Spaces / Mongo / camera settings, before anything reads Settings
+from app.tools.benchmark import percentiles, read_one
+
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import sys
+import time
+from pathlib import Path
+
+from app.core.config import get_settings
+from app.core.logging_config import setup_logging
+from app.services.ocr_cpu import parse_cpus
+from app.tools.export_models import list_images
+
+logger = logging.getLogger("autotune_cpu")
+settings = get_settings()
+
+# (fuse, channels_last, compile)
+GRAPH_OPTIONS = (
+    (False, False, False),
+    (True, False, False),
+    (True, True, False),
+    (True, False, True),
+    (True, True, True),
+)
+
+
+def candidates(threads: list[int], cpus: list[int], engine: str, allow_compile: bool) -> list[dict]:
+    options = GRAPH_OPTIONS if engine == "yolo" else ((settings.CPU_FUSE, False, False),)
+    return [
+        {
+            "fuse": fuse,
+            "channels_last": channels_last,
+            "compile": compile_,
+            "intra_op_threads": n,
+            "interop_threads": 1,
+            "affinity": ",".join(map(str, cpus[:n])),
+        }
+        for n in threads if n <= len(cpus)
+        for fuse, channels_last, compile_ in options
+        if allow_compile or not compile_
+    ]
+
+
+def measure(profile: dict, paths: list[str], repeat: int, warmup: int) -> dict:
+    """One candidate, in its own process (threads / compile state are process-wide)."""
+    from app.services.ocr_cpu import apply_threads
+    from app.services.ocr_service import OCRService
+
+    setup_logging()
+    logging.getLogger("ocr_service").setLevel(logging.WARNING)
+    apply_threads(profile)
+
+    t0 = time.perf_counter()
+    svc = OCRService(cpu_profile=profile)
+    svc.warm_up()
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    images = [(Path(p).name, Path(p).read_bytes()) for p in paths]
+    for name, data in images[:warmup]:
+        read_one(svc, name, data, None)
+    records = [read_one(svc, name, data, None) for _ in range(repeat) for name, data in images]
+    return {
+        "load_ms": round(load_ms, 1),
+        "latency_ms": percentiles([r["latencyMs"] for r in records]),
+        "detect_ms": percentiles([r["stages"]["detect_ms"] for r in records if "detect_ms" in r["stages"]]),
+        "ocr_ms": percentiles([r["stages"]["ocr_ms"] for r in records if "ocr_ms" in r["stages"]]),
+        "errors": sum(1 for r in records if r["readStatus"] == "error"),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", metavar="IMAGES_DIR")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4], help="intra-op thread counts to try")
+    parser.add_argument("--cpus", default=settings.CPU_AFFINITY, help='CPUs to pin to, e.g. "0-7" (default: all)')
+    parser.add_argument("--no-compile", action="store_true", help="skip torch.compile candidates")
+    parser.add_argument("--objective", choices=("core", "latency"), default="core")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the folder per candidate")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed requests per candidate")
+    parser.add_argument("--output", default=settings.CPU_PROFILE_PATH, help="profile file to write")
+    parser.add_argument("--report", default="autotune_cpu_report.json")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+
+    paths = [str(p) for p in list_images(args.images)]
+    if not paths:
+        logger.error("No images found in %s", args.images)
+        return 1
+    cpus = parse_cpus(args.cpus)
+    if not cpus:
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+
+    results = []
+    # spawn: every candidate starts with untouched torch thread pools and no compiled graphs
+    ctx = mp.get_context("spawn")
+    for profile in candidates(args.threads, cpus, settings.MODEL, not args.no_compile):
+        with ctx.Pool(1) as proc:
+            try:
+                measured = proc.apply(measure, (profile, paths, args.repeat, args.warmup))
+            except Exception as e:
+                logger.warning("candidate %s failed: %s", profile, e)
+                continue
+        p50 = measured["latency_ms"].get("p50", float("inf"))
+        measured["core_ms"] = round(p50 * profile["intra_op_threads"], 3)
+        results.append({"profile": profile, **measured})
+        logger.info("%s: p50=%s ms, %s core-ms", profile, p50, measured["core_ms"])
+
+    if not results:
+        logger.error("No candidate finished")
+        return 1
+    if args.objective == "core":
+        results.sort(key=lambda r: r["core_ms"])
+    else:
+        results.sort(key=lambda r: r["latency_ms"].get("p50", float("inf")))
+    best = results[0]
+
+    Path(args.output).write_text(json.dumps({
+        **best["profile"],
+        # candidates were pinned to their first N CPUs; the service keeps the CPUs it was given
+        "affinity": args.cpus,
+        "tuned": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "engine": settings.MODEL,
+            "objective": args.objective,
+            "latency_ms": best["latency_ms"],
+            "core_ms": best["core_ms"],
+        },
+    }, indent=2), encoding="utf-8")
+    Path(args.report).write_text(json.dumps({
+        "objective": args.objective, "engine": settings.MODEL, "images": len(paths), "results": results,
+    }, indent=2), encoding="utf-8")
+    logger.info("Best profile %s written to %s (report: %s)", best["profile"], args.output, args.report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
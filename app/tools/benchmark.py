@@ -0,0 +1,253 @@
+"""
+Replay a folder of images through OCRService and report per-stage latency.
+
+    python -m app.tools.benchmark ./samples --labels ./samples/labels.csv \
+        --concurrency 1 4 8 --batch-sizes 1 8 --repeat 3 --report bench.json
+
+Every (OCR input size, batch size, concurrency) combination is one run. Batch
+size 1 disables the plate / OCR micro-batchers, >1 enables both with that
+maximum. --ocr-sizes ("WIDTHxHEIGHT", e.g. 640x640 320x160) with --ocr-mode
+sweeps the character model input for the accuracy / latency trade-off. Each run
+reports p50/p95/p99 for decode, preprocess, detect, crop, ocr, postprocess
+and encode (the upload encoding of the result images), end-to-end latency,
+throughput, RSS and, with --labels ("filename,regNum"), exact-match accuracy.
+
+Needs only the model files: no network, Mongo or Spaces. Settings that the
+app requires for those are filled with dummy values when unset. Compare
+two reports with any JSON diff.
+"""
+import os
+
+# the benchmark never talks to Spaces / Mongo / cameras, but Settings requires these
+for _name in (
+    "DO_SPACES_KEY", "DO_SPACES_SECRET", "DO_SPACES_ENDPOINT", "DO_SPACES_BUCKET",
+    "ORI_IMG_LOG_PATH_PREFIX", "PRO_IMG_LOG_PATH_PREFIX", "ISSUE_LOG_PATH_PREFIX",
+    "HIK_CAMERA_USER", "HIK_CAMERA_PASSWORD",
+):
+    os.environ.setdefault(_name, "benchmark")
+os.environ.setdefault("PLATE_MODEL_NAME", os.path.basename(os.environ.get("PLATE_MODEL_PATH", "plate")))
+os.environ.setdefault("OCR_MODEL_NAME", os.path.basename(os.environ.get("OCR_MODEL_PATH", "ocr")))
+
+import argparse
+import json
+import logging
+import platform
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.core.config import get_settings
+from app.core.logging_config import setup_logging
+from app.services.ocr_batching import BatchScheduler
+from app.services.ocr_service import OCRService
+from app.tools.export_models import list_images
+from app.tools.quantize_models import load_labels
+
+logger = logging.getLogger("benchmark")
+settings = get_settings()
+
+STAGES = ("decode_ms", "preprocess_ms", "detect_ms", "crop_ms", "ocr_ms", "postprocess_ms", "encode_ms")
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    n = len(ordered)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(n - 1, int(p * n))], 3)
+
+    return {
+        "mean": round(statistics.fmean(ordered), 3),
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def rss_mb() -> dict[str, float]:
+    """Current and peak resident set size of this process."""
+    current = 0.0
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    peak_mb = peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+    return {"current": round(current, 1), "peak": round(peak_mb, 1)}
+
+
+def configure_batching(svc: OCRService, batch_size: int) -> None:
+    """Swap the service's micro-batchers for ones with `batch_size` (1 = no batching)."""
+    for name in ("plate_batcher", "ocr_batcher"):
+        batcher = getattr(svc, name)
+        if batcher is not None:
+            batcher.close()
+        setattr(svc, name, None)
+
+    if batch_size > 1:
+        svc.plate_batcher = BatchScheduler(
+            "plate", svc.detect_plate_batch, max_batch=batch_size, window_ms=settings.PLATE_BATCH_WINDOW_MS,
+        )
+        svc.ocr_batcher = BatchScheduler(
+            "ocr", svc.run_ocr_model_batch, max_batch=batch_size, window_ms=settings.OCR_BATCH_WINDOW_MS,
+        )
+
+
+def read_one(svc: OCRService, name: str, data: bytes, cam_id: str | None) -> dict:
+    """One request; result images are encoded as they would be for the upload."""
+    t0 = time.perf_counter()
+    try:
+        result = svc.predict_bytes(data, cam_id=cam_id)
+    except Exception as e:
+        return {"file": name, "readStatus": "error", "error": str(e), "stages": {},
+                "latencyMs": (time.perf_counter() - t0) * 1000}
+
+    stages = dict(result.get("stages") or {})
+    t_enc = time.perf_counter()
+    for key in ("originalImage", "croppedPlateImage"):
+        if result.get(key) is not None:
+            result[key].encode()
+    stages["encode_ms"] = (time.perf_counter() - t_enc) * 1000
+    return {
+        "file": name,
+        "readStatus": result.get("readStatus"),
+        "regNum": result.get("regNum"),
+        "stages": stages,
+        "latencyMs": (time.perf_counter() - t0) * 1000,
+    }
+
+
+def parse_size(value: str) -> tuple[int, int]:
+    """"320x160" -> (320, 160); a single number is square."""
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height or width)
+
+
+def run(svc: OCRService, images: list[tuple[str, bytes]], concurrency: int, repeat: int,
+        labels: dict[str, str], cam_id: str | None) -> dict:
+    jobs = [item for _ in range(repeat) for item in images]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        records = list(pool.map(lambda item: read_one(svc, item[0], item[1], cam_id), jobs))
+    wall = time.perf_counter() - t0
+
+    statuses: dict[str, int] = {}
+    for r in records:
+        statuses[r["readStatus"]] = statuses.get(r["readStatus"], 0) + 1
+
+    report = {
+        "concurrency": concurrency,
+        "requests": len(records),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(records) / wall, 2) if wall > 0 else None,
+        "latency_ms": {
+            "total": percentiles([r["latencyMs"] for r in records]),
+            **{
+                stage.removesuffix("_ms"): percentiles([r["stages"][stage] for r in records if stage in r["stages"]])
+                for stage in STAGES
+            },
+        },
+        "read_status": dict(sorted(statuses.items())),
+        "rss_mb": rss_mb(),
+    }
+
+    if labels:
+        scored = [r for r in records if r["file"] in labels]
+        exact = sum(1 for r in scored if r["regNum"] == labels[r["file"]])
+        report["accuracy"] = {
+            "labelled": len(scored),
+            "exact_match_rate": round(exact / len(scored), 4) if scored else None,
+            "misreads": dict(sorted(
+                (r["file"], {"expected": labels[r["file"]], "got": r["regNum"]})
+                for r in scored if r["regNum"] != labels[r["file"]]
+            )[:50]),
+        }
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", metavar="IMAGES_DIR")
+    parser.add_argument("--labels", metavar="CSV", help='ground truth, "filename,regNum" per line')
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1])
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the folder per run")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed requests before each run")
+    parser.add_argument("--engine", help="override MODEL")
+    parser.add_argument("--precision", help="override MODEL_PRECISION")
+    parser.add_argument("--ocr-sizes", type=parse_size, nargs="+", metavar="WxH",
+                        help="character model input sizes to sweep (default YOLO_OCR_IMGSZ x YOLO_OCR_HEIGHT)")
+    parser.add_argument("--ocr-mode", choices=("stretch", "letterbox"), help="override OCR_INPUT_MODE")
+    parser.add_argument("--cam-id", help="pass a camId (enables the crop cache, if configured)")
+    parser.add_argument("--report", default="benchmark_report.json")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    # per-request INFO lines would dominate the timings
+    logging.getLogger("ocr_service").setLevel(logging.WARNING)
+
+    paths = list_images(args.images)
+    if not paths:
+        logger.error("No images found in %s", args.images)
+        return 1
+    images = [(p.name, p.read_bytes()) for p in paths]
+    labels = load_labels(args.labels)
+
+    rss_before = rss_mb()
+    svc = OCRService(engine=args.engine, precision=args.precision)
+    rss_models = rss_mb()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {
+            "engine": svc.engine,
+            "precision": svc.precision,
+            "preprocess_mode": settings.PREPROCESS_MODE,
+            "imgsz": settings.YOLO_IMGSZ,
+            "ocr_input_mode": svc.ocr_input_mode,
+            "jpeg_reduced_decode": settings.JPEG_REDUCED_DECODE,
+            "img_encode_format": settings.IMG_ENCODE_FORMAT,
+            "images": len(images),
+            "repeat": args.repeat,
+        },
+        "model_load": {**svc.timings, "rss_mb_delta": round(rss_models["current"] - rss_before["current"], 1)},
+        "runs": [],
+    }
+
+    ocr_mode = args.ocr_mode or svc.ocr_input_mode
+    ocr_sizes = args.ocr_sizes or [(svc.ocr_imgsz[1], svc.ocr_imgsz[0])]
+    for ocr_width, ocr_height in ocr_sizes:
+        svc.set_ocr_input(ocr_width, ocr_height, ocr_mode)
+        for batch_size in args.batch_sizes:
+            configure_batching(svc, batch_size)
+            for concurrency in args.concurrency:
+                for name, data in images[:args.warmup]:
+                    read_one(svc, name, data, args.cam_id)
+                result = run(svc, images, concurrency, args.repeat, labels, args.cam_id)
+                result = {"ocr_imgsz": f"{ocr_width}x{ocr_height}", "batch_size": batch_size, **result}
+                report["runs"].append(result)
+                logger.info(
+                    "ocr=%dx%d batch=%d concurrency=%d: %.2f req/s, total p50=%s p95=%s ms, accuracy=%s",
+                    ocr_width, ocr_height, batch_size, concurrency, result["throughput_rps"] or 0,
+                    result["latency_ms"]["total"].get("p50"), result["latency_ms"]["total"].get("p95"),
+                    result.get("accuracy", {}).get("exact_match_rate"),
+                )
+    configure_batching(svc, 1)
+
+    Path(args.report).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    logger.info("Report written to %s", args.report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Export the plate / OCR .pt weights to other inference engines and check they agree.
+
+    python -m app.tools.export_models --engine onnx openvino
+    python -m app.tools.export_models --check ./samples --engine onnx openvino
+
+The check runs every engine on the same images and compares the boxes against
+the PyTorch ("yolo") reference: same class, IoU >= --iou, |conf diff| <= --conf-tol.
+Frames and plate crops are prepared as in production (PREPROCESS_MODE, and
+OCRService.ocr_input at the YOLO_OCR_IMGSZ / OCR_INPUT_MODE input the OCR model
+is exported with); crops come from the reference detector.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.logging_config import setup_logging
+from app.services.ocr_engine import ENGINES, export_model, load_model
+from app.services.ocr_service import OCRService
+
+logger = logging.getLogger("export_models")
+settings = get_settings()
+
+IMG_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def list_images(folder: str) -> list[Path]:
+    return sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in IMG_EXTS)
+
+
+def _predict(model, img: np.ndarray, conf: float, imgsz: int | tuple[int, int]) -> np.ndarray:
+    """[N, 6] array of x1, y1, x2, y2, conf, cls sorted by conf desc."""
+    r = model.predict(img, conf=conf, imgsz=imgsz, save=False, verbose=False)[0]
+    if r.boxes is None or len(r.boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    data = r.boxes.data.cpu().numpy()[:, :6]
+    return data[np.argsort(-data[:, 4], kind="stable")]
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return float(inter / union) if union > 0 else 0.0
+
+
+def compare_boxes(ref: np.ndarray, other: np.ndarray, iou_thr: float, conf_tol: float) -> list[str]:
+    """Greedy one-to-one matching of `other` against `ref`; returns a list of problems."""
+    problems: list[str] = []
+    if len(ref) != len(other):
+        problems.append(f"box count {len(other)} != reference {len(ref)}")
+
+    used: set[int] = set()
+    for i, rb in enumerate(ref):
+        best_j, best_iou = -1, 0.0
+        for j, ob in enumerate(other):
+            if j in used or int(ob[5]) != int(rb[5]):
+                continue
+            iou = _iou(rb, ob)
+            if iou > best_iou:
+                best_j, best_iou = j, iou
+        if best_j < 0 or best_iou < iou_thr:
+            problems.append(f"ref box {i} cls={int(rb[5])} unmatched (best IoU {best_iou:.3f})")
+            continue
+        used.add(best_j)
+        diff = abs(float(rb[4]) - float(other[best_j][4]))
+        if diff > conf_tol:
+            problems.append(f"ref box {i} conf diff {diff:.3f}")
+    return problems
+
+
+def run_check(folder: str, engines: list[str], iou_thr: float, conf_tol: float) -> bool:
+    images = list_images(folder)
+    if not images:
+        logger.error("No images found in %s", folder)
+        return False
+
+    # the PyTorch reference, also prepares the inputs exactly like the service does
+    ref = OCRService(engine="yolo", precision="fp32")
+    models = {
+        engine: (
+            load_model(settings.PLATE_MODEL_PATH, engine),
+            load_model(settings.OCR_MODEL_PATH, engine),
+        )
+        for engine in engines if engine != "yolo"
+    }
+
+    ok = True
+    for path in images:
+        frame = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if frame is None:
+            logger.warning("skip unreadable image %s", path)
+            continue
+        # same path as OCRService.preProcess (full frame, no ROI)
+        frame, meta = ref.detector_input(frame, settings.YOLO_IMGSZ, 640)
+
+        ref_plates = _predict(ref.plate_model, frame, settings.YOLO_PLATE_CONF, settings.YOLO_IMGSZ)
+        crops = []
+        for box in ref_plates:
+            crop = ref.crop_plate(meta["source"], SimpleNamespace(xyxy=[box[:4]]), meta["transform"])
+            if crop is not None:
+                crops.append(crop[1])
+        ref_chars = [_predict(ref.ocr_model, c, settings.YOLO_OCR_CONF, ref.ocr_imgsz) for c in crops]
+
+        for engine, (plate_model, ocr_model) in models.items():
+            problems = [
+                f"plate: {p}"
+                for p in compare_boxes(
+                    ref_plates, _predict(plate_model, frame, settings.YOLO_PLATE_CONF, settings.YOLO_IMGSZ),
+                    iou_thr, conf_tol,
+                )
+            ]
+            for k, (crop, ref_boxes) in enumerate(zip(crops, ref_chars)):
+                problems += [
+                    f"ocr[{k}]: {p}"
+                    for p in compare_boxes(
+                        ref_boxes, _predict(ocr_model, crop, settings.YOLO_OCR_CONF, ref.ocr_imgsz),
+                        iou_thr, conf_tol,
+                    )
+                ]
+            if problems:
+                ok = False
+                logger.error("❌ %s %s: %s", engine, path.name, "; ".join(problems))
+            else:
+                logger.info("✅ %s %s: %d plates, boxes match", engine, path.name, len(ref_plates))
+    return ok
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", nargs="+", default=["onnx", "openvino"], choices=[e for e in ENGINES if e != "yolo"])
+    parser.add_argument("--check", metavar="IMAGES_DIR", help="only compare engines on these images, no export")
+    parser.add_argument("--iou", type=float, default=0.9)
+    parser.add_argument("--conf-tol", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    setup_logging()
+
+    if args.check:
+        return 0 if run_check(args.check, args.engine, args.iou, args.conf_tol) else 1
+
+    # (height, width) of the character model input, see OCRService.set_ocr_input
+    ocr_imgsz = (settings.YOLO_OCR_HEIGHT or settings.YOLO_OCR_IMGSZ, settings.YOLO_OCR_IMGSZ)
+    for engine in args.engine:
+        export_model(settings.PLATE_MODEL_PATH, engine, settings.YOLO_IMGSZ)
+        export_model(settings.OCR_MODEL_PATH, engine, ocr_imgsz)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+A local stand-in for a Hikvision camera, for trying the alarm / frame source
+paths without hardware.
+
+    python -m app.tools.fake_camera --port 8081 --images ./samples --fps 10 \
+        --user admin --password secret --alarm http://localhost:8000/api/v1/ocr-service/hik/alarm
+
+Serves
+    /ISAPI/Streaming/channels/101/picture      one JPEG (after --picture-delay-ms,
+                                               503 "busy" for --busy-rate of requests)
+    /ISAPI/Streaming/channels/102/httpPreview  MJPEG (multipart/x-mixed-replace) at --fps
+with digest auth when --user is given. Frames cycle through --images, or are
+generated (frame number + time) when no folder is given. With --alarm, a VMD
+MoveDetection.xml naming this server ("127.0.0.1:PORT") as the camera ip is
+posted every --alarm-every seconds.
+"""
+import argparse
+import hashlib
+import itertools
+import logging
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("fake_camera")
+
+ALARM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<EventNotificationAlert version="2.0" xmlns="http://www.hikvision.com/ver20/XMLSchema">
+<ipAddress>{ip}</ipAddress>
+<macAddress>{mac}</macAddress>
+<channelID>1</channelID>
+<dateTime>{time}</dateTime>
+<eventType>VMD</eventType>
+<eventState>active</eventState>
+<targetType>vehicle</targetType>
+</EventNotificationAlert>
+"""
+
+
+class Frames:
+    """JPEGs from a folder (cycled), or generated ones with the frame number and time."""
+
+    def __init__(self, folder: str | None, width: int = 1280, height: int = 720):
+        self.jpegs = []
+        if folder:
+            names = sorted(n for n in os.listdir(folder) if n.lower().endswith((".jpg", ".jpeg")))
+            self.jpegs = [open(os.path.join(folder, n), "rb").read() for n in names]
+        self.size = (height, width)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def next(self) -> bytes:
+        with self._lock:
+            n = next(self._counter)
+        if self.jpegs:
+            return self.jpegs[n % len(self.jpegs)]
+        img = np.full((*self.size, 3), 90, dtype=np.uint8)
+        text = f"#{n} {time.strftime('%H:%M:%S')}.{int(time.time() * 1000) % 1000:03d}"
+        cv2.putText(img, text, (40, self.size[0] // 2), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        return cv2.imencode(".jpg", img)[1].tobytes()
+
+
+class DigestCheck:
+    """Server side of RFC 2617 digest auth (MD5, qop=auth), as the cameras do it."""
+
+    realm = "fake-camera"
+
+    def __init__(self, user: str, password: str):
+        self.user = user
+        self.ha1 = hashlib.md5(f"{user}:{self.realm}:{password}".encode()).hexdigest()
+        self.nonces: set[str] = set()
+        self.challenges = 0
+
+    def challenge(self) -> str:
+        nonce = secrets.token_hex(16)
+        self.nonces.add(nonce)
+        self.challenges += 1
+        return f'Digest realm="{self.realm}", qop="auth", nonce="{nonce}", algorithm=MD5'
+
+    def ok(self, method: str, header: str | None) -> bool:
+        if not header or not header.startswith("Digest "):
+            return False
+        fields = {}
+        for part in header[7:].split(","):
+            key, _, value = part.strip().partition("=")
+            fields[key] = value.strip('"')
+        if fields.get("username") != self.user or fields.get("nonce") not in self.nonces:
+            return False
+        ha2 = hashlib.md5(f"{method}:{fields.get('uri')}".encode()).hexdigest()
+        expected = hashlib.md5(
+            f"{self.ha1}:{fields['nonce']}:{fields.get('nc')}:{fields.get('cnonce')}:{fields.get('qop')}:{ha2}".encode()
+        ).hexdigest()
+        return fields.get("response") == expected
+
+
+def make_handler(frames: Frames, auth: DigestCheck | None, args: argparse.Namespace):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *a):
+            logger.debug("%s " + fmt, self.address_string(), *a)
+
+        def _authorized(self) -> bool:
+            if auth is None or auth.ok(self.command, self.headers.get("Authorization")):
+                return True
+            self.send_response(401)
+            self.send_header("WWW-Authenticate", auth.challenge())
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return False
+
+        def do_GET(self):
+            if self.path.startswith("/ISAPI/Streaming/channels/101/picture"):
+                if self._authorized():
+                    self._picture()
+            elif self.path.startswith("/ISAPI/Streaming/channels/102/httpPreview"):
+                if self._authorized():
+                    self._mjpeg()
+            else:
+                self.send_error(404)
+
+        def _picture(self):
+            if random.random() < args.busy_rate:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            time.sleep(args.picture_delay_ms / 1000)
+            jpeg = frames.next()
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(jpeg)))
+            self.end_headers()
+            self.wfile.write(jpeg)
+
+        def _mjpeg(self):
+            boundary = "boundary"
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={boundary}")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                while True:
+                    t0 = time.perf_counter()
+                    jpeg = frames.next()
+                    self.wfile.write(
+                        f"--{boundary}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode()
+                    )
+                    self.wfile.write(jpeg + b"\r\n")
+                    self.wfile.flush()
+                    time.sleep(max(0.0, 1 / args.fps - (time.perf_counter() - t0)))
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return Handler
+
+
+def post_alarms(url: str, every: float, ip: str, mac: str) -> None:
+    while True:
+        xml = ALARM_XML.format(ip=ip, mac=mac, time=time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime()))
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="MoveDetection.xml"; filename="MoveDetection.xml"\r\n'
+            "Content-Type: application/xml\r\n\r\n"
+            f"{xml}\r\n--{boundary}--\r\n"
+        ).encode()
+        req = urllib.request.Request(url, data=body, headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        try:
+            with urllib.request.urlopen(req, timeout=5) as r:
+                logger.info("alarm -> %s %d", url, r.status)
+        except OSError as e:
+            logger.warning("alarm -> %s failed: %s", url, e)
+        time.sleep(every)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--images", metavar="DIR", help="JPEGs to serve (default: generated frames)")
+    parser.add_argument("--fps", type=float, default=10.0, help="MJPEG frame rate")
+    parser.add_argument("--picture-delay-ms", type=float, default=150.0, help="simulated JPEG encode time")
+    parser.add_argument("--busy-rate", type=float, default=0.0, help="fraction of picture requests answered 503")
+    parser.add_argument("--user", help="enable digest auth with this user")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--alarm", metavar="URL", help="post alarms to this /hik/alarm endpoint")
+    parser.add_argument("--alarm-every", type=float, default=5.0)
+    parser.add_argument("--mac", default="fa:ke:ca:me:ra:01")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    auth = DigestCheck(args.user, args.password) if args.user else None
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(Frames(args.images), auth, args))
+    server.daemon_threads = True
+    if args.alarm:
+        ip = f"{args.host}:{server.server_address[1]}"
+        threading.Thread(target=post_alarms, args=(args.alarm, args.alarm_every, ip, args.mac), daemon=True).start()
+
+    logger.info("📷 Fake camera on http://%s:%d (auth=%s)", args.host, server.server_address[1], bool(auth))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Build INT8 plate / OCR models and compare them with the FP32 models.
+
+    python -m app.tools.quantize_models --engine onnx --calib ./calib --eval ./eval \
+        --labels ./eval/labels.csv --report quant_report.json
+
+--calib   folder of full camera frames. The plate model is calibrated on them
+          directly. The OCR model is calibrated on the plate crops that the
+          FP32 detector finds in them.
+--labels  optional CSV "filename,regNum". Without it, the INT8 output is scored
+          against the FP32 output (agreement rate).
+
+Switch at startup with MODEL=<engine> MODEL_PRECISION=int8.
+"""
+import argparse
+import csv
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+
+from app.core.config import get_settings
+from app.core.logging_config import setup_logging
+from app.services.ocr_engine import quantize_model
+from app.services.ocr_service import OCRService
+from app.tools.export_models import list_images
+
+logger = logging.getLogger("quantize_models")
+settings = get_settings()
+
+
+def load_labels(path: str | None) -> dict[str, str]:
+    if not path:
+        return {}
+    labels: dict[str, str] = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or row[0] == "filename":
+                continue
+            labels[row[0].strip()] = row[1].strip()
+    return labels
+
+
+def write_plate_crops(svc: OCRService, images: list[Path], out_dir: Path) -> int:
+    """Save the detector's plate crops (OCR model input) for calibrating the OCR model."""
+    n = 0
+    for path in images:
+        pre = svc.preProcess(path.read_bytes())
+        if pre is None:
+            continue
+        _, resized, meta = pre
+        boxes = svc.detect_plates(resized)
+        for i in range(len(boxes) if boxes is not None else 0):
+            crop = svc.crop_plate(meta["source"], boxes[i:i + 1], meta["transform"])
+            if crop is not None:
+                cv2.imwrite(str(out_dir / f"{path.stem}_{i}.jpg"), crop[1])
+                n += 1
+    return n
+
+
+def read_plate(svc: OCRService, img_bytes: bytes) -> tuple[str | None, dict[str, float]]:
+    """Run the pipeline stage by stage, return regNum and per-stage latency (ms)."""
+    timings: dict[str, float] = {}
+
+    t0 = time.perf_counter()
+    pre = svc.preProcess(img_bytes)
+    timings["preprocess_ms"] = (time.perf_counter() - t0) * 1000
+    if pre is None:
+        return None, timings
+    _, resized, meta = pre
+
+    t0 = time.perf_counter()
+    boxes = svc.detect_plate(resized)
+    timings["detect_ms"] = (time.perf_counter() - t0) * 1000
+    if boxes is None:
+        return None, timings
+
+    crop = svc.crop_plate(meta["source"], boxes, meta["transform"])
+    if crop is None:
+        return None, timings
+
+    t0 = time.perf_counter()
+    reading = svc.recognize_plates([crop[1]])[0]
+    timings["ocr_ms"] = (time.perf_counter() - t0) * 1000
+    return (reading["regNum"] if reading else None), timings
+
+
+def _summary(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        "mean": round(statistics.fmean(ordered), 2),
+        "p50": round(ordered[len(ordered) // 2], 2),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+    }
+
+
+def evaluate(services: dict[str, OCRService], images: list[Path], labels: dict[str, str]) -> dict:
+    reads: dict[str, dict[str, str | None]] = {name: {} for name in services}
+    stages: dict[str, dict[str, list[float]]] = {name: {} for name in services}
+
+    for path in images:
+        data = path.read_bytes()
+        for name, svc in services.items():
+            reg, timings = read_plate(svc, data)
+            reads[name][path.name] = reg
+            for k, v in timings.items():
+                stages[name].setdefault(k, []).append(v)
+
+    report: dict = {"images": len(images), "ground_truth": bool(labels), "models": {}}
+    for name in services:
+        # without labels, FP32 output is the reference
+        truth = labels or reads["fp32"]
+        scored = [f for f in truth if f in reads[name]]
+        exact = sum(1 for f in scored if truth[f] and reads[name][f] == truth[f])
+        report["models"][name] = {
+            "exact_match_rate": round(exact / len(scored), 4) if scored else None,
+            "latency_ms": {k: _summary(v) for k, v in stages[name].items()},
+        }
+    report["changed_reads"] = {
+        f: {"fp32": reads["fp32"][f], "int8": reads["int8"][f]}
+        for f in reads["fp32"]
+        if reads["fp32"][f] != reads["int8"][f]
+    }
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", default="onnx", choices=["onnx", "openvino"])
+    parser.add_argument("--calib", required=True, metavar="DIR")
+    parser.add_argument("--eval", metavar="DIR", help="evaluation images (default: --calib)")
+    parser.add_argument("--labels", metavar="CSV")
+    parser.add_argument("--report", default="quant_report.json")
+    parser.add_argument("--baseline-engine", default="yolo", help="engine for the FP32 reference")
+    parser.add_argument("--skip-quantize", action="store_true", help="only build the report")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+
+    fp32 = OCRService(engine=args.baseline_engine, precision="fp32")
+
+    if not args.skip_quantize:
+        quantize_model(settings.PLATE_MODEL_PATH, args.engine, args.calib, settings.YOLO_IMGSZ)
+        with tempfile.TemporaryDirectory() as crops_dir:
+            n = write_plate_crops(fp32, list_images(args.calib), Path(crops_dir))
+            logger.info("OCR calibration set: %d plate crops", n)
+            quantize_model(settings.OCR_MODEL_PATH, args.engine, crops_dir, fp32.ocr_imgsz)
+
+    int8 = OCRService(engine=args.engine, precision="int8")
+    images = list_images(args.eval or args.calib)
+    report = evaluate({"fp32": fp32, "int8": int8}, images, load_labels(args.labels))
+    report["engine"] = args.engine
+    report["baseline_engine"] = args.baseline_engine
+
+    Path(args.report).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    logger.info("Report written to %s", args.report)
+    for name, m in report["models"].items():
+        logger.info("%s exact_match=%s latency=%s", name, m["exact_match_rate"], m["latency_ms"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
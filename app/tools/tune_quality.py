@@ -0,0 +1,146 @@
+"""
+Pick quality-gate thresholds from recorded camera frames.
+
+    python -m app.tools.tune_quality ./frames --per-camera --max-false-reject 0.01 \
+        --report quality_report.json
+
+Every frame is measured (brightness, contrast, sharpness at QUALITY_SAMPLE_SIZE,
+same as the gate) and read by the full pipeline with the gate off. A frame
+counts as readable when the read is "complete" (and matches --labels
+"filename,regNum" when given). Each threshold is set so that at most
+--max-false-reject of the readable frames would be rejected by it; the report
+shows how many unreadable frames the combined gate catches at that cost.
+
+With --per-camera, first-level subfolders are camera ids (cameras.camId) and
+each gets its own thresholds, ready for cameras.quality.
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.logging_config import setup_logging
+from app.services.ocr_quality import check_quality, default_thresholds
+from app.services.ocr_service import OCRService
+from app.tools.export_models import list_images
+from app.tools.quantize_models import load_labels
+from app.utils.image import frame_quality
+
+logger = logging.getLogger("tune_quality")
+settings = get_settings()
+
+
+def measure(svc: OCRService, paths: list[Path], labels: dict[str, str]) -> list[dict]:
+    samples = []
+    for path in paths:
+        data = path.read_bytes()
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            logger.warning("skip unreadable image %s", path)
+            continue
+        try:
+            result = svc.predict_bytes(data)
+        except Exception as e:
+            logger.warning("skip %s: %s", path.name, e)
+            continue
+        readable = result.get("readStatus") == "complete"
+        if readable and path.name in labels:
+            readable = result.get("regNum") == labels[path.name]
+        samples.append({"file": path.name, "readable": readable, **frame_quality(frame, settings.QUALITY_SAMPLE_SIZE)})
+    return samples
+
+
+def suggest(samples: list[dict], max_false_reject: float) -> dict[str, float]:
+    """Tightest thresholds that each reject at most `max_false_reject` of the readable frames."""
+    good = [s for s in samples if s["readable"]]
+    if not good:
+        return default_thresholds()
+
+    def q(metric: str, p: float) -> float:
+        return round(float(np.quantile([s[metric] for s in good], p)), 2)
+
+    return {
+        "min_brightness": q("brightness", max_false_reject),
+        "max_brightness": q("brightness", 1.0 - max_false_reject),
+        "min_contrast": q("contrast", max_false_reject),
+        "min_sharpness": q("sharpness", max_false_reject),
+    }
+
+
+def score(samples: list[dict], thresholds: dict[str, float]) -> dict:
+    good = [s for s in samples if s["readable"]]
+    bad = [s for s in samples if not s["readable"]]
+    reasons: dict[str, int] = {}
+    false_reject = caught = 0
+    for s in samples:
+        reason = check_quality(s, thresholds)
+        if reason is None:
+            continue
+        reasons[reason] = reasons.get(reason, 0) + 1
+        if s["readable"]:
+            false_reject += 1
+        else:
+            caught += 1
+    return {
+        "frames": len(samples),
+        "readable": len(good),
+        "unreadable": len(bad),
+        "false_reject_rate": round(false_reject / len(good), 4) if good else None,
+        "unreadable_caught_rate": round(caught / len(bad), 4) if bad else None,
+        # share of all frames that would skip the models (and the issue-log upload)
+        "gated_rate": round((false_reject + caught) / len(samples), 4) if samples else None,
+        "reasons": dict(sorted(reasons.items())),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", metavar="IMAGES_DIR")
+    parser.add_argument("--labels", metavar="CSV")
+    parser.add_argument("--per-camera", action="store_true", help="subfolders are camera ids")
+    parser.add_argument("--max-false-reject", type=float, default=0.01)
+    parser.add_argument("--report", default="quality_report.json")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    logging.getLogger("ocr_service").setLevel(logging.WARNING)
+
+    root = Path(args.images)
+    groups: dict[str, list[Path]] = {}
+    for path in list_images(args.images):
+        camera = path.relative_to(root).parts[0] if args.per_camera and len(path.relative_to(root).parts) > 1 else "*"
+        groups.setdefault(camera, []).append(path)
+    if not groups:
+        logger.error("No images found in %s", args.images)
+        return 1
+
+    svc = OCRService()
+    labels = load_labels(args.labels)
+    report: dict = {
+        "sample_size": settings.QUALITY_SAMPLE_SIZE,
+        "max_false_reject": args.max_false_reject,
+        "current": default_thresholds(),
+        "cameras": {},
+    }
+    for camera, paths in sorted(groups.items()):
+        samples = measure(svc, paths, labels)
+        thresholds = suggest(samples, args.max_false_reject)
+        report["cameras"][camera] = {
+            "suggested": thresholds,
+            "with_suggested": score(samples, thresholds),
+            "with_current": score(samples, default_thresholds()),
+        }
+        logger.info("%s: %s -> %s", camera, thresholds, report["cameras"][camera]["with_suggested"])
+
+    Path(args.report).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    logger.info("Report written to %s", args.report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
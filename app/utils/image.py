@@ -0,0 +1,122 @@
+import cv2
+import numpy as np
+
+# JPEG start-of-frame markers (baseline, progressive, ...) carry the image size
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def jpeg_size(data: bytes | memoryview) -> tuple[int, int] | None:
+    """(width, height) read from the JPEG header without decoding, None if not a JPEG."""
+    mv = memoryview(data)
+    n = len(mv)
+    if n < 4 or mv[0] != 0xFF or mv[1] != 0xD8:
+        return None
+
+    i = 2
+    while i + 9 < n:
+        if mv[i] != 0xFF:
+            return None
+        marker = mv[i + 1]
+        if marker == 0xFF:
+            # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            # markers without a length field
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            h = (mv[i + 5] << 8) | mv[i + 6]
+            w = (mv[i + 7] << 8) | mv[i + 8]
+            return w, h
+        i += 2 + ((mv[i + 2] << 8) | mv[i + 3])
+    return None
+
+
+def decode_image(data: bytes | memoryview, min_side: int | None = None) -> tuple[np.ndarray | None, int]:
+    """
+    cv2.imdecode the buffer in place. When `min_side` is set and the JPEG's long side is
+    at least 2x that, let libjpeg decode at 1/2, 1/4 or 1/8 scale (DCT scaling), keeping
+    the long side >= min_side. Returns (image, reduce_factor).
+    """
+    nparr = np.frombuffer(data, np.uint8)
+    flag, factor = cv2.IMREAD_COLOR, 1
+
+    if min_side:
+        size = jpeg_size(data)
+        if size:
+            long_side = max(size)
+            for f, reduced_flag in _REDUCED_FLAGS:
+                if long_side / f >= min_side:
+                    flag, factor = reduced_flag, f
+                    break
+
+    return cv2.imdecode(nparr, flag), factor
+
+
+def letterbox(img: np.ndarray, imgsz: int | tuple[int, int],
+              pad_value: int = 114) -> tuple[np.ndarray, float, tuple[int, int]]:
+    """
+    Aspect-preserving resize + pad to imgsz x imgsz, or (height, width) for a
+    rectangular target (same as ultralytics LetterBox).
+    Returns (image, scale, (pad_x, pad_y)); frame coords = (xy - pad) / scale.
+    """
+    out_h, out_w = (imgsz, imgsz) if isinstance(imgsz, int) else imgsz
+    h, w = img.shape[:2]
+    r = min(out_h / h, out_w / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    resized = img if (nh, nw) == (h, w) else cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    top, left = (out_h - nh) // 2, (out_w - nw) // 2
+    out = cv2.copyMakeBorder(
+        resized, top, out_h - nh - top, left, out_w - nw - left,
+        cv2.BORDER_CONSTANT, value=(pad_value, pad_value, pad_value),
+    )
+    return out, r, (left, top)
+
+
+def crop_region(frame: np.ndarray, rect: tuple[float, float, float, float],
+                polygon: list[list[float]] | None = None, pad_value: int = 114) -> tuple[np.ndarray, tuple[int, int]]:
+    """
+    Cut a region given in relative coords (x1, y1, x2, y2 in 0..1) out of `frame`.
+    With a polygon (relative points), pixels outside it are filled with `pad_value`.
+    Returns (region, (x_offset, y_offset)); a degenerate rect returns the whole frame.
+    """
+    h, w = frame.shape[:2]
+    x1, x2 = (int(round(min(max(v, 0.0), 1.0) * w)) for v in (rect[0], rect[2]))
+    y1, y2 = (int(round(min(max(v, 0.0), 1.0) * h)) for v in (rect[1], rect[3]))
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return frame, (0, 0)
+
+    region = frame[y1:y2, x1:x2]
+    if polygon and len(polygon) >= 3:
+        pts = np.array([[px * w - x1, py * h - y1] for px, py in polygon], dtype=np.int32)
+        mask = np.zeros(region.shape[:2], dtype=np.uint8)
+        cv2.fillPoly(mask, [pts], 255)
+        region = region.copy()
+        region[mask == 0] = pad_value
+    return region, (x1, y1)
+
+
+def frame_quality(img: np.ndarray, size: int = 256) -> dict[str, float]:
+    """
+    Brightness (mean), contrast (std) and sharpness (variance of the Laplacian)
+    of a grayscale thumbnail with long side `size`. Sharpness depends on `size`,
+    so thresholds are only comparable for the same thumbnail size.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    h, w = gray.shape[:2]
+    scale = size / max(h, w)
+    if scale < 1:
+        gray = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    mean, std = cv2.meanStdDev(gray)
+    return {
+        "brightness": float(mean[0][0]),
+        "contrast": float(std[0][0]),
+        "sharpness": float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+    }